@@ -0,0 +1,207 @@
+# encoding: utf-8
+
+"""
+Exposes run_pizza_async() for counting asynchronous sources with asyncio.
+
+This lets an asyncio application count records from many sockets or other
+asynchronous sources concurrently on one event loop, rather than running
+the synchronous run_pizza() in a thread per source.
+
+The functions here return asyncio futures, which can be awaited from a
+coroutine, for example--
+
+    count = await run_pizza_async(reader)
+    counts = await run_pizza_many_async(readers)
+
+This module requires asyncio (Python 3.4.4 or later).  It is written
+without the async and await keywords so that the package still compiles
+under Python 2, which means each chunk or item read costs a scheduled
+callback.  For a stream, use a large chunk size to keep this small.
+
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+
+import pizza.pizza as _pizza
+
+
+def _get_loop(loop):
+    return asyncio.get_event_loop() if loop is None else loop
+
+
+def _consume(get_next, feed, finish, loop):
+    """
+    Read an asynchronous source to its end, and return a future for a result.
+
+    Arguments:
+
+      get_next: a function returning an awaitable for the next item.  The
+        source ends when the awaitable raises StopAsyncIteration.
+      feed: a function called with each item.  Returning a false value
+        also ends the source.
+      finish: a function returning the result after the source ends.
+
+    """
+    result = loop.create_future()
+    # The future for the item currently being read.
+    pending = [None]
+
+    def step():
+        try:
+            pending[0] = asyncio.ensure_future(get_next(), loop=loop)
+        except Exception as err:
+            result.set_exception(err)
+            return
+        pending[0].add_done_callback(on_item)
+
+    def on_item(future):
+        pending[0] = None
+        if result.done():
+            # Then the caller cancelled the result.
+            return
+        if future.cancelled():
+            result.cancel()
+            return
+        err = future.exception()
+        if err is None:
+            try:
+                if feed(future.result()):
+                    step()
+                    return
+            except Exception as feed_err:
+                result.set_exception(feed_err)
+                return
+        elif not isinstance(err, StopAsyncIteration):
+            result.set_exception(err)
+            return
+        result.set_result(finish())
+
+    def on_result(future):
+        if future.cancelled() and pending[0] is not None:
+            pending[0].cancel()
+
+    result.add_done_callback(on_result)
+    step()
+
+    return result
+
+
+def _is_async_stream(values):
+    if isinstance(values, asyncio.StreamReader):
+        return True
+    read = getattr(values, 'read', None)
+    return read is not None and asyncio.iscoroutinefunction(read)
+
+
+def count_records_async(reader, chunk_size=None, loop=None):
+    """
+    Return a future for the number of newline-delimited records in a stream.
+
+    This is the asynchronous counterpart of pizza.pizza.count_records().
+
+    Arguments:
+
+      reader: an object whose read(n) method returns an awaitable for up to
+        n bytes, and for an empty bytes object at the end of the stream
+        (e.g. an asyncio.StreamReader).
+
+    """
+    if chunk_size is None:
+        chunk_size = _pizza.CHUNK_SIZE
+    counter = _pizza.RecordCounter()
+
+    def feed(chunk):
+        if not chunk:
+            return False
+        counter.feed(chunk)
+        return True
+
+    return _consume(lambda: reader.read(chunk_size), feed, counter.total,
+                    loop=_get_loop(loop))
+
+
+def count_items_async(values, loop=None):
+    """
+    Return a future for the number of items in an asynchronous iterable.
+
+    """
+    iterator = values.__aiter__()
+    counter = [0]
+
+    def feed(value):
+        counter[0] += 1
+        return True
+
+    return _consume(iterator.__anext__, feed, lambda: counter[0],
+                    loop=_get_loop(loop))
+
+
+def run_pizza_async(values, loop=None):
+    """
+    Return a future for the number of values.
+
+    Arguments:
+
+      values: an asynchronous stream (see count_records_async()), an
+        asynchronous iterable, or anything that run_pizza() accepts.
+        Asynchronous streams are counted as newline-delimited records.
+        Anything else is counted synchronously by run_pizza(), which
+        blocks the event loop while reading a synchronous stream.
+
+    """
+    loop = _get_loop(loop)
+    if _is_async_stream(values):
+        return count_records_async(values, loop=loop)
+    if hasattr(values, '__aiter__'):
+        return count_items_async(values, loop=loop)
+    result = loop.create_future()
+    result.set_result(_pizza.run_pizza(values))
+    return result
+
+
+def run_pizza_many_async(sources, loop=None):
+    """
+    Return a future for the list of the numbers of values in many sources.
+
+    The sources are read concurrently, and the counts are in the same order
+    as the sources.  If counting any source fails, the result fails with
+    the first error, and the sources still being read are cancelled.
+
+    Arguments:
+
+      sources: an iterable of objects that run_pizza_async() accepts.
+
+    """
+    loop = _get_loop(loop)
+    futures = [run_pizza_async(source, loop=loop) for source in sources]
+    result = loop.create_future()
+    remaining = [len(futures)]
+
+    def on_count(future):
+        if result.done():
+            return
+        if future.cancelled():
+            result.cancel()
+        elif future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            remaining[0] -= 1
+            if not remaining[0]:
+                result.set_result([f.result() for f in futures])
+
+    def on_result(future):
+        # Cancel any sources still being read.
+        for f in futures:
+            f.cancel()
+
+    if not futures:
+        result.set_result([])
+        return result
+
+    for future in futures:
+        future.add_done_callback(on_count)
+    result.add_done_callback(on_result)
+
+    return result
@@ -0,0 +1,558 @@
+# encoding: utf-8
+
+"""
+Supports benchmarking the counting functions and the console script.
+
+To run the benchmark suite and write the results as JSON--
+
+    $ python -m pizza.benchmark --output results.json
+
+To compare the results against a stored baseline and report regressions--
+
+    $ python -m pizza.benchmark compare baseline.json results.json
+
+To compare run_pizza_batch() with calling run_pizza() once per group--
+
+    $ python -m pizza.benchmark batch
+
+The suite counts synthetic inputs of several sizes through each input
+path: the run_pizza() API with a sequence, an iterator and a stream, the
+run_pizza_async() API with an asyncio stream, and the console script with
+command-line values, standard input, an input file, and an input file
+counted with several jobs, with --distinct, with --top and with
+--incremental.  The suite also times pizza-client counting an input file
+through a server that it starts with --serve.  Console script and client
+runs are timed end to end in a child process, so they include startup.
+
+The asyncio case is skipped where asyncio is not available (e.g. Python
+2).  The --incremental case counts the file once before it is timed, so
+it measures counting a file to which nothing was appended.  Child
+processes use a temporary cache directory, so the user's caches are left
+untouched.
+
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import pizza
+import pizza.cacheconfig as cacheconfig
+import pizza.pizza as _pizza
+
+GROUP_COUNT_DEFAULT = 100000
+GROUP_SIZE_DEFAULT = 5
+REPEAT_DEFAULT = 3
+
+# The numbers of records in the generated inputs.
+SIZES_DEFAULT = (1000, 100000, 1000000)
+# The most values to pass on the command line, to stay well within the
+# operating system's limit on the size of argv.
+ARGV_SIZE_MAX = 10000
+# The fraction by which a time or peak memory value may exceed its
+# baseline before it counts as a regression.
+THRESHOLD_DEFAULT = 0.2
+# Times below this number of seconds are too noisy to compare.
+MIN_COMPARE_SECONDS = 0.005
+
+RESULTS_FORMAT = 1
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(
+    pizza.__file__)))
+
+# The most seconds to wait for the benchmark server to start listening.
+SERVER_START_TIMEOUT = 30
+# How often, in seconds, to check whether the server is listening.
+SERVER_POLL_INTERVAL = 0.05
+
+_SCRIPT_MODULE = 'pizza.scripts.pizza'
+_CLIENT_MODULE = 'pizza.scripts.pizza.client'
+
+# The console script cases, as (name, arguments) pairs.  The string
+# "{path}" is replaced by the path to the input file.
+_COMMAND_CASES = (
+    ('cli-argv', None),
+    ('cli-stdin', ['-i', '-']),
+    ('cli-file', ['--no-cache', '-i', '{path}']),
+    ('cli-file-jobs', ['--no-cache', '-j', '2', '-i', '{path}']),
+    ('cli-file-distinct', ['--no-cache', '--distinct', '-i', '{path}']),
+    ('cli-file-top', ['--no-cache', '--top', '10', '-i', '{path}']),
+    ('cli-file-incremental', ['--no-cache', '--incremental', '-i',
+                              '{path}']),
+)
+# The pizza-client cases, which are like the console script cases, except
+# that "{socket}" is also replaced by the path of the server's socket.
+_CLIENT_CASES = (
+    ('client-file', ['--socket', '{socket}', '--no-cache', '-i', '{path}']),
+)
+_API_CASES = ('api-sequence', 'api-iterator', 'api-stream',
+              'api-async-stream')
+
+CASES = (_API_CASES + tuple(name for name, args in _COMMAND_CASES) +
+         tuple(name for name, args in _CLIENT_CASES))
+
+
+def make_groups(group_count, group_size):
+    """
+    Return a list of group_count lists of group_size values each.
+
+    """
+    group = ['value%d' % index for index in range(group_size)]
+    return [list(group) for index in range(group_count)]
+
+
+def make_values(size):
+    """
+    Return a list of size distinct string values.
+
+    """
+    return ['value%d' % index for index in range(size)]
+
+
+def _best_time(func, repeat):
+    """
+    Return the fastest of repeat calls to func, in seconds.
+
+    """
+    return min(_time_calls(func, repeat))
+
+
+def _time_calls(func, repeat):
+    """
+    Return a list of the times of repeat calls to func, in seconds.
+
+    """
+    timer = timeit.default_timer
+    times = []
+    for index in range(repeat):
+        start = timer()
+        func()
+        times.append(timer() - start)
+    return times
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _peak_memory_kib(func):
+    """
+    Return the peak memory in KiB allocated by a call to func.
+
+    Returns None if tracemalloc is not available (e.g. in Python 2).
+
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak // 1024
+
+
+# The code a child process runs to run the module named by sys.argv[2]
+# (e.g. the console script) and then write its peak resident set size in
+# KiB to the file at sys.argv[1].  The peak is read from /proc because, on
+# Linux, ru_maxrss also counts memory the child used before exec(), i.e.
+# the memory of the benchmark process.
+_COMMAND_BOOTSTRAP = """\
+import atexit, runpy, sys
+def write_peak(path=sys.argv[1]):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    with open(path, 'w') as out:
+                        out.write(line.split()[1])
+    except EnvironmentError:
+        pass
+atexit.register(write_peak)
+module_name = sys.argv[2]
+sys.argv = ['pizza'] + sys.argv[3:]
+runpy.run_module(module_name, run_name='__main__')
+"""
+
+
+def _make_env(cache_dir):
+    """
+    Return the environment for child processes.
+
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [_PACKAGE_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+    env[cacheconfig.ENV_CACHE_DIR] = cache_dir
+    return env
+
+
+def _run_command(args, env, stdin_path=None, module_name=None):
+    """
+    Run the console script in a child process.
+
+    Returns a pair (seconds, peak_memory_kib), where peak_memory_kib is the
+    child's peak resident set size, or None if it is not available (e.g.
+    the system does not have /proc).  Memory used by the child's own child
+    processes (e.g. with --jobs) is not included.
+
+    Arguments:
+
+      env: the environment for the child process (see _make_env()).
+      module_name: the name of the module to run as the main module.
+        Defaults to the console script.
+
+    """
+    if module_name is None:
+        module_name = _SCRIPT_MODULE
+    fd, peak_path = tempfile.mkstemp(prefix='pizza-benchmark-')
+    os.close(fd)
+    argv = ([sys.executable, '-c', _COMMAND_BOOTSTRAP, peak_path,
+             module_name] + args)
+    timer = timeit.default_timer
+    try:
+        with open(stdin_path or os.devnull, 'rb') as stdin:
+            with open(os.devnull, 'wb') as devnull:
+                start = timer()
+                status = subprocess.call(argv, stdin=stdin, stdout=devnull,
+                                         env=env)
+                seconds = timer() - start
+        if status:
+            raise Exception("command failed with status %d: %r" %
+                            (status, args))
+        with open(peak_path) as f:
+            peak = f.read()
+    finally:
+        os.remove(peak_path)
+    return seconds, int(peak) if peak else None
+
+
+def _make_result(case, size, data_size, times, peak_memory_kib):
+    best = min(times)
+    return {
+        'case': case,
+        'size': size,
+        'bytes': data_size,
+        'seconds': best,
+        'median_seconds': _median(times),
+        'records_per_second': size / best if best else None,
+        'peak_memory_kib': peak_memory_kib,
+    }
+
+
+def _count_async_stream(data):
+    """
+    Count the records in data with run_pizza_async() and an asyncio stream.
+
+    """
+    import asyncio
+    import pizza.aio as aio
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        reader = asyncio.StreamReader(loop=loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return loop.run_until_complete(aio.run_pizza_async(reader))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _bench_api(case, values, data, repeat):
+    """
+    Return a pair (times, peak_memory_kib), or None if case cannot run.
+
+    """
+    run_pizza = _pizza.run_pizza
+    if case == 'api-sequence':
+        func = lambda: run_pizza(values)
+    elif case == 'api-iterator':
+        func = lambda: run_pizza(iter(values))
+    elif case == 'api-stream':
+        func = lambda: run_pizza(io.BytesIO(data))
+    else:
+        try:
+            import asyncio
+        except ImportError:
+            # Then the Python version is 2.
+            return None
+        func = lambda: _count_async_stream(data)
+    times = _time_calls(func, repeat)
+    return times, _peak_memory_kib(func)
+
+
+def _bench_command(args, values, path, repeat, env, module_name=None,
+                   socket_path=None):
+    if args is None:
+        args, stdin_path = values, None
+    else:
+        stdin_path = path if '-' in args else None
+        replacements = {'{path}': path, '{socket}': socket_path}
+        args = [replacements.get(arg, arg) for arg in args]
+    if '--incremental' in args:
+        # Count the file once so the timed runs only check for new bytes.
+        _run_command(args, env, stdin_path, module_name)
+    runs = [_run_command(args, env, stdin_path, module_name) for index in
+            range(repeat)]
+    peaks = [peak for seconds, peak in runs if peak is not None]
+    return [seconds for seconds, peak in runs], max(peaks) if peaks else None
+
+
+def _start_server(socket_path, env):
+    """
+    Start `pizza --serve` in a child process, and return the Popen object.
+
+    """
+    with open(os.devnull, 'wb') as devnull:
+        process = subprocess.Popen([sys.executable, '-m', _SCRIPT_MODULE,
+                                    '--serve', '--socket', socket_path],
+                                   stdout=devnull, stderr=devnull, env=env)
+    timer = timeit.default_timer
+    deadline = timer() + SERVER_START_TIMEOUT
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or timer() > deadline:
+            _stop_server(process)
+            raise Exception("server did not start listening on: %s" %
+                            socket_path)
+        time.sleep(SERVER_POLL_INTERVAL)
+    return process
+
+
+def _stop_server(process):
+    if process.poll() is None:
+        process.terminate()
+    process.wait()
+
+
+def run_suite(sizes=None, repeat=None, cases=None, log=None):
+    """
+    Run the benchmark suite, and return the results as a JSON-ready dict.
+
+    Arguments:
+
+      sizes: the numbers of records in the inputs to count.  Defaults to
+        SIZES_DEFAULT.
+      cases: the names of the cases to run.  Defaults to CASES.
+      log: a function to call with a progress message for each case.
+
+    """
+    if sizes is None:
+        sizes = SIZES_DEFAULT
+    if repeat is None:
+        repeat = REPEAT_DEFAULT
+    if cases is None:
+        cases = CASES
+    command_args = dict(_COMMAND_CASES)
+    client_args = dict(_CLIENT_CASES)
+
+    results = []
+    temp_dir = tempfile.mkdtemp(prefix='pizza-benchmark-')
+    env = _make_env(os.path.join(temp_dir, 'cache'))
+    socket_path = os.path.join(temp_dir, 'server.sock')
+    server = None
+    try:
+        if any(case in client_args for case in cases):
+            server = _start_server(socket_path, env)
+        for size in sizes:
+            values = make_values(size)
+            data = ''.join(value + '\n' for value in values).encode('ascii')
+            path = os.path.join(temp_dir, 'input-%d.txt' % size)
+            with open(path, 'wb') as f:
+                f.write(data)
+            for case in cases:
+                if case in _API_CASES:
+                    measured = _bench_api(case, values, data, repeat)
+                    if measured is None:
+                        continue
+                    times, peak = measured
+                elif case in client_args:
+                    times, peak = _bench_command(
+                        client_args[case], values, path, repeat, env,
+                        module_name=_CLIENT_MODULE, socket_path=socket_path)
+                else:
+                    args = command_args[case]
+                    if args is None and size > ARGV_SIZE_MAX:
+                        continue
+                    times, peak = _bench_command(args, values, path, repeat,
+                                                 env)
+                result = _make_result(case, size, len(data), times, peak)
+                if log is not None:
+                    log("%(case)s size=%(size)d: %(seconds).4fs" % result)
+                results.append(result)
+    finally:
+        if server is not None:
+            _stop_server(server)
+        shutil.rmtree(temp_dir)
+
+    return {
+        'format': RESULTS_FORMAT,
+        'pizza_version': pizza.__version__,
+        'python_version': sys.version.split()[0],
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=None):
+    """
+    Compare two results dicts returned by run_suite().
+
+    Returns a pair (lines, regressions) of lists of strings.  The lines
+    describe every case measured in both, and the regressions describe the
+    times and peak memory values that grew by more than threshold.
+
+    """
+    if threshold is None:
+        threshold = THRESHOLD_DEFAULT
+    baseline_results = dict(((result['case'], result['size']), result)
+                            for result in baseline['results'])
+    lines = []
+    regressions = []
+    for result in current['results']:
+        key = (result['case'], result['size'])
+        old = baseline_results.get(key)
+        if old is None:
+            continue
+        label = "%s size=%d" % key
+        for field, min_value in (('seconds', MIN_COMPARE_SECONDS),
+                                 ('peak_memory_kib', 0)):
+            old_value, new_value = old[field], result[field]
+            if not old_value or new_value is None:
+                continue
+            ratio = float(new_value) / old_value
+            line = "%s %s: %s -> %s (%+.0f%%)" % (label, field, old_value,
+                                                 new_value,
+                                                 100 * (ratio - 1))
+            lines.append(line)
+            if (ratio > 1 + threshold and
+                max(old_value, new_value) >= min_value):
+                regressions.append(line)
+    return lines, regressions
+
+
+def read_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_results(results, stream):
+    json.dump(results, stream, indent=2, sort_keys=True)
+    stream.write('\n')
+
+
+def bench_batch(group_count=None, group_size=None, repeat=None):
+    """
+    Time run_pizza_batch() against a loop calling run_pizza().
+
+    Returns a dict of results, with times in seconds.
+
+    """
+    if group_count is None:
+        group_count = GROUP_COUNT_DEFAULT
+    if group_size is None:
+        group_size = GROUP_SIZE_DEFAULT
+    if repeat is None:
+        repeat = REPEAT_DEFAULT
+
+    groups = make_groups(group_count, group_size)
+    run_pizza = _pizza.run_pizza
+
+    def per_call():
+        return [run_pizza(group) for group in groups]
+
+    def batch():
+        return _pizza.run_pizza_batch(groups, use_numpy=False)
+
+    if list(batch()) != per_call():
+        raise Exception("run_pizza_batch() disagrees with run_pizza()")
+
+    per_call_time = _best_time(per_call, repeat)
+    batch_time = _best_time(batch, repeat)
+
+    return {
+        'group_count': group_count,
+        'group_size': group_size,
+        'per_call_seconds': per_call_time,
+        'batch_seconds': batch_time,
+        'speedup': per_call_time / batch_time if batch_time else None,
+    }
+
+
+def _main_batch():
+    result = bench_batch()
+    sys.stdout.write("""\
+groups: %(group_count)d of %(group_size)d values
+run_pizza() loop: %(per_call_seconds).4fs
+run_pizza_batch(): %(batch_seconds).4fs
+speedup: %(speedup).1fx
+""" % result)
+    return 0
+
+
+def _main_compare(baseline_path, current_path, threshold):
+    lines, regressions = compare(read_results(baseline_path),
+                                 read_results(current_path),
+                                 threshold=threshold)
+    for line in lines:
+        sys.stdout.write("%s\n" % line)
+    for line in regressions:
+        sys.stderr.write("regression: %s\n" % line)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['batch']:
+        return _main_batch()
+    if argv[:1] == ['compare']:
+        parser = argparse.ArgumentParser(prog='python -m pizza.benchmark '
+                                         'compare')
+        parser.add_argument('baseline_path')
+        parser.add_argument('current_path')
+        parser.add_argument('--threshold', type=float)
+        ns = parser.parse_args(argv[1:])
+        return _main_compare(ns.baseline_path, ns.current_path, ns.threshold)
+
+    parser = argparse.ArgumentParser(prog='python -m pizza.benchmark')
+    parser.add_argument('--output', help='the path to which to write JSON '
+                        'results.  Defaults to stdout.')
+    parser.add_argument('--sizes', type=int, nargs='+')
+    parser.add_argument('--repeat', type=int)
+    parser.add_argument('--case', dest='cases', action='append',
+                        choices=CASES)
+    ns = parser.parse_args(argv)
+
+    def log(message):
+        sys.stderr.write("%s\n" % message)
+
+    results = run_suite(sizes=ns.sizes, repeat=ns.repeat, cases=ns.cases,
+                        log=log)
+    if ns.output is None:
+        write_results(results, sys.stdout)
+    else:
+        with open(ns.output, 'w') as f:
+            write_results(results, f)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+# encoding: utf-8
+
+"""
+Supports caching the results of counting files in a local database.
+
+Results are keyed on the identity of a file--its device, inode, size and
+modification time--or optionally on a hash of its contents.  An unchanged
+file therefore does not need to be read again.  The database is an SQLite
+file, which makes it safe to use from several pizza processes at once, and
+holds at most a configurable number of results, evicting the least recently
+used results first.
+
+The same database also stores the byte offsets up to which append-only
+files were last counted (see pizza.incremental), and it evicts the least
+recently counted files' offsets in the same way.
+
+"""
+
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+import pizza.cacheconfig as cacheconfig
+import pizza.general.common as common
+
+ENV_CACHE_DIR = cacheconfig.ENV_CACHE_DIR
+CACHE_FILE_NAME = 'results.sqlite'
+
+MAX_ENTRIES_DEFAULT = cacheconfig.MAX_ENTRIES_DEFAULT
+# Files smaller than this number of bytes are not cached because counting
+# them is cheaper than a cache lookup.
+MIN_FILE_SIZE_DEFAULT = 1024 * 1024
+# The number of seconds to wait for another process to release a lock on
+# the database.
+LOCK_TIMEOUT = 30
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+log = logging.getLogger("pizza.cache")
+
+_SCHEMA = (
+    """\
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)""",
+    """\
+CREATE TABLE IF NOT EXISTS offsets (
+    path TEXT PRIMARY KEY,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    newline_count INTEGER NOT NULL,
+    tail_digest TEXT NOT NULL,
+    last_used REAL NOT NULL
+)""",
+)
+_TABLES = ('results', 'offsets')
+
+
+def get_cache_dir():
+    """
+    Return the directory in which to store the cache database.
+
+    """
+    path = os.environ.get(ENV_CACHE_DIR)
+    if path:
+        return path
+    base_dir = (os.environ.get('XDG_CACHE_HOME') or
+                os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base_dir, 'pizza')
+
+
+def file_identity(path):
+    """
+    Return a (device, inode, size, mtime_ns) tuple identifying a file.
+
+    """
+    st = os.stat(path)
+    # The st_mtime_ns attribute is only available in Python 3.3 and later.
+    mtime_ns = getattr(st, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 10 ** 9)
+    return (st.st_dev, st.st_ino, st.st_size, mtime_ns)
+
+
+def content_digest(path):
+    """
+    Return the hex SHA-1 digest of the contents of a file.
+
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _make_dirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        # Another process may have created the directory first.
+        if err.errno != errno.EEXIST:
+            raise
+
+
+class _Database(object):
+
+    """
+    Base class for stores kept in the cache database.
+
+    A database error while getting or storing a value (e.g. an unwritable
+    or corrupt database file) is logged as a warning and disables the store
+    for the rest of the process rather than failing the count.
+
+    Each store keeps at most max_entries rows in its table, evicting the
+    least recently used rows first.
+
+    """
+
+    # A description of the store for messages.
+    description = 'cache database'
+    # The store's table, and the column that is the table's primary key.
+    _table = None
+    _key_column = None
+
+    def __init__(self, db_path=None, max_entries=None):
+        """
+        Arguments:
+
+          db_path: the path to the database file.  Defaults to a file in
+            the directory returned by get_cache_dir().
+          max_entries: the most rows to keep.  Defaults to
+            MAX_ENTRIES_DEFAULT.
+
+        """
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), CACHE_FILE_NAME)
+        if max_entries is None:
+            max_entries = MAX_ENTRIES_DEFAULT
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._conn = None
+        self._is_disabled = False
+
+    def _disable(self, err):
+        log.warning("disabling %s after error: %s\n-->%s" %
+                    (self.description, self.db_path, err))
+        self._is_disabled = True
+        self.close()
+
+    def _evict(self, conn):
+        """
+        Delete the least recently used rows beyond max_entries.
+
+        """
+        count = conn.execute("SELECT COUNT(*) FROM %s" % self._table
+                             ).fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM %(table)s WHERE %(key)s IN "
+                         "(SELECT %(key)s FROM %(table)s "
+                         "ORDER BY last_used LIMIT ?)" %
+                         {'table': self._table, 'key': self._key_column},
+                         (excess, ))
+
+    def _connect(self):
+        if self._conn is None:
+            _make_dirs(os.path.dirname(os.path.abspath(self.db_path)))
+            conn = sqlite3.connect(self.db_path, timeout=LOCK_TIMEOUT)
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def info(self):
+        """
+        Return a dict describing the database.
+
+        The dict includes the number of rows in each table.
+
+        """
+        info = {'path': self.db_path}
+        try:
+            conn = self._connect()
+            for table in _TABLES:
+                info[table] = conn.execute("SELECT COUNT(*) FROM %s" %
+                                           table).fetchone()[0]
+            info['bytes'] = os.path.getsize(self.db_path)
+        except (sqlite3.Error, EnvironmentError) as err:
+            raise common.Error("error reading %s: %s\n-->%s" %
+                               (self.description, self.db_path, err))
+        info['max_entries'] = self.max_entries
+        return info
+
+    def clear(self):
+        """
+        Remove everything stored in the database.
+
+        """
+        try:
+            conn = self._connect()
+            with conn:
+                for table in _TABLES:
+                    conn.execute("DELETE FROM %s" % table)
+            conn.execute("VACUUM")
+        except (sqlite3.Error, EnvironmentError) as err:
+            raise common.Error("error clearing %s: %s\n-->%s" %
+                               (self.description, self.db_path, err))
+
+
+class ResultCache(_Database):
+
+    """
+    A store of counting results with least-recently-used eviction.
+
+    """
+
+    description = 'result cache'
+    _table = 'results'
+    _key_column = 'key'
+
+    def __init__(self, db_path=None, max_entries=None, use_content_hash=False,
+                 min_file_size=None):
+        """
+        Arguments:
+
+          db_path: see _Database.
+          max_entries: the most results to keep (see _Database).
+          use_content_hash: whether to key results on a hash of each file's
+            contents instead of on the file's identity.  This lets copies of
+            a file share a result but requires reading the file to look it
+            up, so it only pays off when counting costs more than hashing.
+          min_file_size: the smallest file size in bytes to cache.
+
+        """
+        super(ResultCache, self).__init__(db_path, max_entries=max_entries)
+        if min_file_size is None:
+            min_file_size = MIN_FILE_SIZE_DEFAULT
+
+        self.use_content_hash = use_content_hash
+        self.min_file_size = min_file_size
+
+    def make_key(self, path, kind='count', identity=None):
+        """
+        Return the cache key for a file, or None if it should not be cached.
+
+        Arguments:
+
+          kind: a string describing the kind of result (e.g. the counting
+            mode), so that different results for a file do not collide.
+          identity: the file's file_identity(), if already known.
+
+        """
+        if identity is None:
+            identity = file_identity(path)
+        if identity[2] < self.min_file_size:
+            return None
+        if self.use_content_hash:
+            file_key = "sha1:%s" % content_digest(path)
+        else:
+            file_key = "stat:%d:%d:%d:%d" % identity
+        return "%s:%s" % (kind, file_key)
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if there is none.
+
+        """
+        if self._is_disabled:
+            return None
+        try:
+            conn = self._connect()
+            with conn:
+                # Updating first takes the write lock before reading, which
+                # avoids a deadlock between two processes upgrading read
+                # locks.
+                cursor = conn.execute("UPDATE results SET last_used = ? "
+                                      "WHERE key = ?", (time.time(), key))
+                if not cursor.rowcount:
+                    return None
+                row = conn.execute("SELECT value FROM results WHERE key = ?",
+                                   (key, )).fetchone()
+        except (sqlite3.Error, EnvironmentError) as err:
+            self._disable(err)
+            return None
+        return row[0]
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entries if needed.
+
+        """
+        if self._is_disabled:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO results "
+                             "(key, value, last_used) VALUES (?, ?, ?)",
+                             (key, value, time.time()))
+                self._evict(conn)
+        except (sqlite3.Error, EnvironmentError) as err:
+            self._disable(err)
+
+
+class OffsetStore(_Database):
+
+    """
+    A store of the offsets up to which files were last counted.
+
+    Storing a file's offset marks it as used, so the files evicted are
+    those least recently counted.
+
+    """
+
+    description = 'offset store'
+    _table = 'offsets'
+    _key_column = 'path'
+
+    def get(self, path):
+        """
+        Return the state stored for path as a dict, or None if there is none.
+
+        The dict has keys: device, inode, offset, newline_count and
+        tail_digest.
+
+        """
+        if self._is_disabled:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT device, inode, offset, newline_count, "
+                               "tail_digest FROM offsets WHERE path = ?",
+                               (path, )).fetchone()
+        except (sqlite3.Error, EnvironmentError) as err:
+            self._disable(err)
+            return None
+        if row is None:
+            return None
+        keys = ('device', 'inode', 'offset', 'newline_count', 'tail_digest')
+        return dict(zip(keys, row))
+
+    def put(self, path, device, inode, offset, newline_count, tail_digest):
+        """
+        Store the state for path, replacing any previous state.
+
+        """
+        if self._is_disabled:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO offsets (path, device, "
+                             "inode, offset, newline_count, tail_digest, "
+                             "last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (path, device, inode, offset, newline_count,
+                              tail_digest, time.time()))
+                self._evict(conn)
+        except (sqlite3.Error, EnvironmentError) as err:
+            self._disable(err)
@@ -0,0 +1,16 @@
+# encoding: utf-8
+
+"""
+Contains the result cache settings that are needed without the cache.
+
+Importing pizza.cache imports sqlite3, which is slow to import and may be
+missing, so the console script's option parser and other modules that
+only need these settings import this module instead.
+
+"""
+
+# The environment variable that overrides the default cache directory.
+ENV_CACHE_DIR = 'PIZZA_CACHE_DIR'
+
+# The most entries a store in the cache database keeps by default.
+MAX_ENTRIES_DEFAULT = 10000
@@ -0,0 +1,186 @@
+# encoding: utf-8
+
+"""
+Supports counting the records in regular files using memory mapping.
+
+The functions in this module count newline bytes directly on a memory-mapped
+file in large chunks.  This avoids creating a Python object per record and
+avoids decoding, which makes it much faster than reading a large file line
+by line.  Counts agree with pizza.pizza.count_records().
+
+"""
+
+import mmap
+import os
+import stat
+
+# The number of mapped bytes to count at a time.  Each chunk is copied once
+# into a bytes object, so this bounds the memory used beyond the mapping.
+MAP_CHUNK_SIZE = 16 * 1024 * 1024
+
+NEWLINE = b'\n'
+
+
+def is_regular_file(path):
+    """
+    Return whether path is a regular file (e.g. not a pipe or device).
+
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISREG(mode)
+
+
+def count_newlines(buf, start=0, end=None, chunk_size=None):
+    """
+    Return the number of newline bytes in buf[start:end].
+
+    Arguments:
+
+      buf: a bytes-like object supporting slicing (e.g. an mmap object).
+
+    """
+    if end is None:
+        end = len(buf)
+    if chunk_size is None:
+        chunk_size = MAP_CHUNK_SIZE
+    count = 0
+    for chunk_start in range(start, end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end)
+        count += buf[chunk_start:chunk_end].count(NEWLINE)
+    return count
+
+
+def open_map(f):
+    """
+    Return a read-only mmap of the given open file, or None if it is empty.
+
+    """
+    size = os.fstat(f.fileno()).st_size
+    if not size:
+        # Zero-length files cannot be mapped.
+        return None
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The madvise() method is only available in Python 3.8 and later.
+    if hasattr(mapped, 'madvise'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+
+def find_shard_ranges(buf, shard_count):
+    """
+    Split buf into at most shard_count byte ranges aligned to records.
+
+    Returns a list of (start, end) pairs covering buf in order.  Every range
+    but the last ends just after a newline, so no record spans two ranges.
+    Ranges are roughly equal in size, but there may be fewer than
+    shard_count of them (e.g. if buf contains few newlines).
+
+    Arguments:
+
+      buf: a bytes-like object with a find() method (e.g. an mmap object).
+
+    """
+    size = len(buf)
+    ranges = []
+    start = 0
+    for index in range(1, shard_count):
+        nominal = size * index // shard_count
+        if nominal <= start:
+            continue
+        # Searching from the byte before the nominal boundary lets a
+        # boundary that already follows a newline stay where it is.
+        newline_index = buf.find(NEWLINE, nominal - 1)
+        if newline_index < 0:
+            break
+        end = newline_index + 1
+        if end >= size:
+            break
+        ranges.append((start, end))
+        start = end
+    ranges.append((start, size))
+    return ranges
+
+
+def ends_with_newline(path):
+    """
+    Return whether the file at path is empty or ends with a newline.
+
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == NEWLINE
+
+
+def count_file_range(path, start, end, chunk_size=None):
+    """
+    Return the number of newline bytes in the byte range [start, end) of a file.
+
+    """
+    with open(path, 'rb') as f:
+        mapped = open_map(f)
+        if mapped is None:
+            return 0
+        try:
+            return count_newlines(mapped, start, end, chunk_size=chunk_size)
+        finally:
+            mapped.close()
+
+
+def iter_file_records(path, start=0, end=None):
+    """
+    Return a generator over the records in the byte range [start, end) of a file.
+
+    Each record is yielded as bytes without its trailing newline.  The
+    range should be aligned to records (see find_shard_ranges()).
+
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        if end is None:
+            lines = f
+        else:
+            lines = _iter_lines(f, end - start)
+        for line in lines:
+            if line.endswith(NEWLINE):
+                line = line[:-1]
+            yield line
+
+
+def _iter_lines(f, size):
+    """
+    Return a generator over the lines in the next size bytes of a file.
+
+    """
+    readline = f.readline
+    while size > 0:
+        line = readline(size)
+        if not line:
+            return
+        size -= len(line)
+        yield line
+
+
+def count_file(path, chunk_size=None):
+    """
+    Return the number of newline-delimited records in a regular file.
+
+    A final record without a trailing newline is counted.
+
+    """
+    with open(path, 'rb') as f:
+        mapped = open_map(f)
+        if mapped is None:
+            return 0
+        try:
+            count = count_newlines(mapped, chunk_size=chunk_size)
+            if mapped[-1:] != NEWLINE:
+                count += 1
+        finally:
+            mapped.close()
+    return count
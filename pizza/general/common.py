@@ -1,3 +1,7 @@
+# The type of text strings: unicode in Python 2 and str in Python 3.
+TEXT_TYPE = type(u'')
+
+
 
 class Error(Exception):
     """
@@ -32,7 +32,9 @@ Supports logging configuration.
 
 """
 
+import collections
 import logging
+import threading
 
 
 class RememberingStream(object):
@@ -83,3 +85,171 @@ class NewlineStreamHandler(logging.StreamHandler):
             self.stream.write("\n")
 
         super(NewlineStreamHandler, self).emit(record)
+
+
+class ThreadFilter(object):
+
+    """
+    A log filter that passes only records logged from a single thread.
+
+    The thread is the thread that creates the filter.
+
+    """
+
+    def __init__(self):
+        self.thread_id = threading.current_thread().ident
+
+    def filter(self, record):
+        return record.thread == self.thread_id
+
+
+class QueueHandler(logging.Handler):
+
+    """
+    A log handler that puts records on a queue for a QueueListener.
+
+    This lets the thread that logs a record return without formatting it
+    or writing it to a stream.  (The standard library has a similar class
+    only in Python 3.2 and later.)
+
+    """
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+
+    def prepare(self, record):
+        """
+        Return the record with its message and any traceback rendered.
+
+        The message arguments and traceback might not be safe to render
+        later (e.g. if an argument is mutated after the call to log).
+
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(
+                    record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+
+    """
+    Passes records from a queue to handlers on a background thread.
+
+    The records are passed to the handlers in the order they were queued.
+    Each handler's filters apply as usual, but its level does not: only
+    the level of the QueueHandler applies.
+
+    """
+
+    # The object put on the queue to stop the thread.
+    _sentinel = None
+
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self._thread = None
+
+    def start(self):
+        thread = threading.Thread(target=self._monitor,
+                                  name='pizza-log-listener')
+        # A daemon thread does not prevent the process from exiting if
+        # stop() is never called (e.g. after an unexpected exception).
+        thread.daemon = True
+        thread.start()
+        self._thread = thread
+
+    def handle(self, record):
+        for handler in self.handlers:
+            handler.handle(record)
+
+    def _monitor(self):
+        get = self.queue.get
+        while True:
+            record = get()
+            if record is self._sentinel:
+                return
+            self.handle(record)
+
+    def stop(self):
+        """
+        Handle any queued records, and stop the background thread.
+
+        """
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+
+def start_queue_logging(handler):
+    """
+    Return a started QueueListener for handler, and a QueueHandler for it.
+
+    Records passed to the returned QueueHandler are handled by handler on a
+    background thread.
+
+    """
+    import Queue
+    queue = Queue.Queue()
+    listener = QueueListener(queue, handler)
+    listener.start()
+    return listener, QueueHandler(queue)
+
+
+# Pass as the extra argument of a logging call to keep the record out of a
+# RingBufferHandler, e.g. if it is long and of little use after an error.
+EXTRA_UNBUFFERED = {'is_unbuffered': True}
+
+
+class RingBufferHandler(logging.Handler):
+
+    """
+    A log handler that keeps the most recent records in memory.
+
+    Records are neither formatted nor written until dump() is called, so
+    keeping them costs little more than creating them.  This is useful
+    for keeping debug messages to write only if an error occurs.  Records
+    logged with EXTRA_UNBUFFERED are not kept.
+
+    """
+
+    def __init__(self, capacity, target):
+        """
+        Arguments:
+
+          capacity: the number of records to keep.
+          target: the handler to which dump() passes the records.
+
+        """
+        logging.Handler.__init__(self)
+        self.records = collections.deque(maxlen=capacity)
+        self.target = target
+
+    def emit(self, record):
+        if not getattr(record, 'is_unbuffered', False):
+            self.records.append(record)
+
+    def dump(self):
+        """
+        Pass the kept records to the target handler, and forget them.
+
+        Return the number of records passed.
+
+        """
+        count = len(self.records)
+        while self.records:
+            self.target.handle(self.records.popleft())
+        return count
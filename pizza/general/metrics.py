@@ -0,0 +1,201 @@
+# encoding: utf-8
+
+"""
+Supports recording counters and histograms and exporting them.
+
+A Registry holds named metrics and can export them either as a text file
+in the Prometheus exposition format (e.g. for the node exporter's textfile
+collector) or as statsd datagrams.
+
+"""
+
+import os
+import time
+
+# The default histogram bucket upper bounds, in seconds (the same as the
+# Prometheus client libraries' defaults).
+BUCKETS_DEFAULT = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+# The time.perf_counter() function is only available in Python 3.3 and
+# later.
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+
+    """
+    A value that only increases, e.g. a number of records.
+
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def prometheus_samples(self):
+        return [(self.name, '', self.value)]
+
+    def statsd_lines(self):
+        return ["%s:%s|c" % (self.name, self.value)]
+
+
+class Histogram(object):
+
+    """
+    Counts observed values (e.g. durations) in cumulative buckets.
+
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=None):
+        if buckets is None:
+            buckets = BUCKETS_DEFAULT
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(float(bound) for bound in buckets)) + (
+            float('inf'), )
+        self.bucket_counts = [0] * len(self.buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def prometheus_samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            samples.append(("%s_bucket" % self.name,
+                            '{le="%s"}' % _format_value(bound), cumulative))
+        samples.append(("%s_sum" % self.name, '', self.sum))
+        samples.append(("%s_count" % self.name, '', self.count))
+        return samples
+
+    def statsd_lines(self):
+        # Since the individual observations are not kept, we send the sum
+        # and count rather than one timing per observation.
+        return ["%s_sum:%s|g" % (self.name, _format_value(self.sum)),
+                "%s_count:%d|c" % (self.name, self.count)]
+
+
+class Registry(object):
+
+    """
+    A collection of metrics, keyed by name.
+
+    """
+
+    timer = staticmethod(timer)
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _get(self, metric_class, name, help, **kwargs):
+        try:
+            metric = self._metrics[name]
+        except KeyError:
+            metric = metric_class(name, help, **kwargs)
+            self._metrics[name] = metric
+        else:
+            if not isinstance(metric, metric_class):
+                raise ValueError("metric %r is a %s" % (name, metric.kind))
+        return metric
+
+    def counter(self, name, help):
+        """
+        Return the Counter with the given name, creating it if necessary.
+
+        """
+        return self._get(Counter, name, help)
+
+    def histogram(self, name, help, buckets=None):
+        """
+        Return the Histogram with the given name, creating it if necessary.
+
+        """
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def _sorted_metrics(self):
+        return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def format_prometheus(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+
+        """
+        lines = []
+        for metric in self._sorted_metrics():
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            for name, labels, value in metric.prometheus_samples():
+                lines.append("%s%s %s" % (name, labels,
+                                          _format_value(value)))
+        return "".join("%s\n" % line for line in lines)
+
+    def format_statsd(self):
+        """
+        Return the metrics as a list of lines in the statsd format.
+
+        """
+        lines = []
+        for metric in self._sorted_metrics():
+            lines.extend(metric.statsd_lines())
+        return lines
+
+    def write_textfile(self, path):
+        """
+        Write the metrics to a file in the Prometheus exposition format.
+
+        The file is written atomically (by renaming a temporary file), so a
+        collector never reads a partially written file.
+
+        """
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, 'w') as f:
+            f.write(self.format_prometheus())
+        os.rename(temp_path, path)
+
+    def send_statsd(self, address):
+        """
+        Send the metrics to a statsd server in one datagram.
+
+        Arguments:
+
+          address: a "host:port" string for a UDP server, or the path to a
+            Unix domain datagram socket.
+
+        """
+        import socket
+
+        data = "\n".join(self.format_statsd()).encode('utf-8')
+        if os.sep in address or ':' not in address:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            target = address
+        else:
+            host, port = address.rsplit(':', 1)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            target = (host, int(port))
+        try:
+            sock.sendto(data, target)
+        finally:
+            sock.close()
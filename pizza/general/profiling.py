@@ -0,0 +1,106 @@
+# encoding: utf-8
+
+"""
+Supports profiling a function call with cProfile or tracemalloc.
+
+Each function here calls a function under a profiler, optionally writes the
+full results to a file, and logs a short summary of the top entries.  The
+results are written and logged even if the function raises, and an error
+writing the file is logged rather than raised, so it never hides the
+function's own exception.
+
+"""
+
+import StringIO
+
+import pizza.general.common as common
+
+# The number of entries to include in a logged summary.
+SUMMARY_SIZE = 20
+# The number of stack frames tracemalloc stores per allocation.
+TRACE_FRAME_COUNT = 1
+
+
+def _write_results(write, path, log, description):
+    """
+    Call write(path), and log any EnvironmentError as a warning.
+
+    """
+    try:
+        write(path)
+    except EnvironmentError as err:
+        log.warning("error writing %s: %r\n-->%s" % (description, path, err))
+        return
+    log.info("wrote %s to: %s" % (description, path))
+
+
+def call_with_profile(func, log, path=None, summary_size=None):
+    """
+    Call func with cProfile, and return its return value.
+
+    Arguments:
+
+      log: the logger to which to log a summary of the functions with the
+        highest cumulative time.
+      path: a path to which to write the profile in pstats format, or None
+        to write no file.
+
+    """
+    import cProfile
+    import pstats
+
+    if summary_size is None:
+        summary_size = SUMMARY_SIZE
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func)
+    finally:
+        if path:
+            _write_results(profile.dump_stats, path, log, 'profile')
+        stream = StringIO.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(summary_size)
+        log.info("profile (top %d functions by cumulative time):\n%s" %
+                 (summary_size, stream.getvalue().strip('\n')))
+
+
+def call_with_trace_malloc(func, log, path=None, summary_size=None):
+    """
+    Call func with tracemalloc, and return its return value.
+
+    Arguments:
+
+      log: the logger to which to log the peak traced memory and a summary
+        of the lines that allocated the most memory still in use when func
+        returns.
+      path: a path to which to write the tracemalloc snapshot (readable with
+        tracemalloc.Snapshot.load()), or None to write no file.
+
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        # Then the Python version is earlier than 3.4.
+        raise common.Error("tracing memory allocations requires Python 3.4 "
+                           "or later")
+
+    if summary_size is None:
+        summary_size = SUMMARY_SIZE
+
+    tracemalloc.start(TRACE_FRAME_COUNT)
+    try:
+        return func()
+    finally:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if path:
+            _write_results(snapshot.dump, path, log, 'tracemalloc snapshot')
+        lines = ["%s" % stat for stat in
+                 snapshot.statistics('lineno')[:summary_size]]
+        log.info("traced memory: %d KiB current, %d KiB peak\n"
+                 "top %d allocating lines:\n%s" %
+                 (current // 1024, peak // 1024, summary_size,
+                  "\n".join(lines)))
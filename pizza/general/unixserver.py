@@ -0,0 +1,134 @@
+# encoding: utf-8
+
+"""
+Supports serving JSON requests over a Unix domain socket.
+
+Each connection carries exactly one request and one response, each of which
+is a JSON object encoded as a single line of UTF-8 text.
+
+"""
+
+import json
+import logging
+import os
+import socket
+import SocketServer
+import stat
+import threading
+
+import pizza.general.common as common
+
+
+log = logging.getLogger(__name__)
+
+ENCODING = 'utf-8'
+# The umask with which to create the socket file, so that only the user can
+# connect.  Requests make the server read files as the user.
+SOCKET_UMASK = 0o077
+
+
+def encode_message(obj):
+    """
+    Return the bytes to send for a JSON-serializable message object.
+
+    """
+    return json.dumps(obj).encode(ENCODING) + b'\n'
+
+
+def decode_message(line):
+    """
+    Return the message object encoded by the given line of bytes.
+
+    """
+    return json.loads(line.decode(ENCODING))
+
+
+def _remove_stale_socket(path):
+    """
+    Remove the socket file at path if no server is listening on it.
+
+    Raises common.Error if a server is already listening, or if the path
+    is not a socket (e.g. a regular file given by mistake).
+
+    """
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise common.Error("path exists and is not a socket: %s" % path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        # Then the socket file was left behind by a server that exited.
+        os.remove(path)
+        return
+    finally:
+        sock.close()
+    raise common.Error("a server is already listening on: %s" % path)
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Then the client closed the connection without sending a
+            # request (e.g. to check whether the server is listening).
+            return
+        request = decode_message(line)
+        # Wait for a free slot so that at most max_clients requests are
+        # processed at a time.
+        with self.server.slots:
+            response = self.server.respond(request)
+        self.wfile.write(encode_message(response))
+
+
+class JsonServer(SocketServer.ThreadingUnixStreamServer):
+
+    """
+    A threaded Unix domain socket server that answers JSON requests.
+
+    """
+
+    # Do not wait for in-progress requests when the server exits.
+    daemon_threads = True
+
+    def __init__(self, path, respond, max_clients):
+        """
+        Arguments:
+
+          path: the path at which to create the socket file.
+          respond: a function that accepts a request object and returns
+            a JSON-serializable response object.  It is called from
+            multiple threads at once.
+          max_clients: the maximum number of requests to process at once.
+            Other requests wait until a slot is free.
+
+        """
+        _remove_stale_socket(path)
+        # The base classes are old-style classes in Python 2, so we cannot
+        # use super() here.
+        SocketServer.ThreadingUnixStreamServer.__init__(self, path,
+                                                         _RequestHandler)
+        self.path = path
+        self.respond = respond
+        self.slots = threading.BoundedSemaphore(max_clients)
+
+    def server_bind(self):
+        old_umask = os.umask(SOCKET_UMASK)
+        try:
+            SocketServer.ThreadingUnixStreamServer.server_bind(self)
+        finally:
+            os.umask(old_umask)
+
+    def handle_error(self, request, client_address):
+        # The base class prints the stack trace to stderr.  The client sees
+        # the connection close without a reply and runs the command itself.
+        log.exception("error handling request")
+
+    def server_close(self):
+        SocketServer.ThreadingUnixStreamServer.server_close(self)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
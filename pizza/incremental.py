@@ -0,0 +1,96 @@
+# encoding: utf-8
+
+"""
+Supports counting the records in growing, append-only files incrementally.
+
+For each file, the byte offset up to which it was counted and the number of
+newlines before that offset are stored (in a pizza.cache.OffsetStore).  The
+next count then only scans the bytes appended since.  The file is scanned
+from the beginning instead if it was rotated or truncated, which is
+detected by a change in its device or inode, by its size dropping below the
+stored offset, or by a change in the bytes just before the stored offset.
+
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+
+import pizza.cache as cache_mod
+import pizza.filecount as filecount
+
+# The number of bytes before the stored offset to compare between runs.
+# This catches a file that was truncated and then grew past the offset.
+TAIL_SIZE = 64
+
+
+def _read_tail(path, offset):
+    """
+    Return the (up to) TAIL_SIZE bytes of a file before offset.
+
+    """
+    start = max(0, offset - TAIL_SIZE)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(offset - start)
+
+
+def _digest(tail):
+    return hashlib.sha1(tail).hexdigest()
+
+
+def _get_start(path, state, identity):
+    """
+    Return the offset and newline count from which to resume counting.
+
+    Returns (0, 0) if the file must be scanned from the beginning.
+
+    """
+    if state is None:
+        return 0, 0
+    device, inode, size = identity[:3]
+    offset = state['offset']
+    if (state['device'] != device or state['inode'] != inode or
+        size < offset):
+        # Then the file was rotated or truncated.
+        return 0, 0
+    if _digest(_read_tail(path, offset)) != state['tail_digest']:
+        # Then the file was rewritten.
+        return 0, 0
+    return offset, state['newline_count']
+
+
+def count_file(path, store):
+    """
+    Return the number of records in a regular file, counting incrementally.
+
+    A final record without a trailing newline is counted, as with
+    pizza.filecount.count_file().  If the record is completed later, the
+    newline that completes it is counted then.
+
+    Returns a pair (count, scanned), where scanned is the number of bytes
+    read from the file.
+
+    Arguments:
+
+      store: a pizza.cache.OffsetStore.
+
+    """
+    path = os.path.abspath(path)
+    identity = cache_mod.file_identity(path)
+    size = identity[2]
+    start, newline_count = _get_start(path, store.get(path), identity)
+
+    newline_count += filecount.count_file_range(path, start, size)
+    # We read the tail at the size from the start of the count rather than
+    # at the current end of the file, in case the file has grown since.
+    tail = _read_tail(path, size)
+    count = newline_count
+    if tail and not tail.endswith(filecount.NEWLINE):
+        count += 1
+
+    store.put(path, device=identity[0], inode=identity[1], offset=size,
+              newline_count=newline_count, tail_digest=_digest(tail))
+
+    return count, size - start
@@ -0,0 +1,142 @@
+# encoding: utf-8
+
+"""
+Supports counting records in many files at once using a process pool.
+
+Each file is counted as one or more byte ranges ("shards") aligned to record
+boundaries, so a single large file can also be spread over several processes.
+The per-shard newline counts are merged per file, which gives the same
+result as counting each file serially.  Shards can also be summarized with
+mergeable sketches (see pizza.sketches), which are merged across all files.
+
+"""
+
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+
+import pizza.filecount as filecount
+
+# The smallest number of bytes a file is split into when sharding.
+SHARD_SIZE_MIN = 64 * 1024 * 1024
+
+
+def _count_task(task):
+    """
+    Return the number of newlines in a shard (for use in a worker process).
+
+    """
+    index, path, start, end = task
+    return filecount.count_file_range(path, start, end)
+
+
+def _sketch_task(task):
+    """
+    Return a sketch of the records in a shard (for use in a worker process).
+
+    """
+    (index, path, start, end), (sketch_class, kwargs) = task
+    sketch = sketch_class(**kwargs)
+    sketch.update(filecount.iter_file_records(path, start, end))
+    return sketch
+
+
+def shard_file(path, shard_count):
+    """
+    Return a list of record-aligned (start, end) byte ranges covering a file.
+
+    """
+    with open(path, 'rb') as f:
+        mapped = filecount.open_map(f)
+        if mapped is None:
+            return [(0, 0)]
+        try:
+            return filecount.find_shard_ranges(mapped, shard_count)
+        finally:
+            mapped.close()
+
+
+def make_tasks(paths, jobs, shard_size=None):
+    """
+    Return a list of (index, path, start, end) tuples to count.
+
+    The index is the position of the path in paths.
+
+    """
+    if shard_size is None:
+        shard_size = SHARD_SIZE_MIN
+    tasks = []
+    for index, path in enumerate(paths):
+        size = os.path.getsize(path)
+        shard_count = max(1, min(jobs, size // shard_size))
+        for start, end in shard_file(path, shard_count):
+            tasks.append((index, path, start, end))
+    return tasks
+
+
+def count_files(paths, jobs, shard_size=None):
+    """
+    Count the records in regular files using a pool of jobs processes.
+
+    Returns a list of counts, one for each path in paths.
+
+    Arguments:
+
+      paths: a list of paths to regular files.
+      jobs: the number of worker processes.
+      shard_size: files at least twice this many bytes are split into
+        shards of about this size (up to one shard per job).  Defaults to
+        SHARD_SIZE_MIN.
+
+    """
+    tasks = make_tasks(paths, jobs, shard_size=shard_size)
+    pool = multiprocessing.Pool(processes=jobs)
+    try:
+        # A chunksize of 1 spreads large shards evenly across workers.
+        results = pool.map(_count_task, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    counts = [0] * len(paths)
+    for task, newline_count in zip(tasks, results):
+        counts[task[0]] += newline_count
+    # Count a final record without a trailing newline, as is done serially.
+    for index, path in enumerate(paths):
+        if not filecount.ends_with_newline(path):
+            counts[index] += 1
+    return counts
+
+
+def sketch_files(paths, jobs, sketch_class, shard_size=None, **kwargs):
+    """
+    Summarize the records in regular files using a pool of jobs processes.
+
+    Returns one sketch of the records in all of the files, made by merging
+    the sketches of the shards.
+
+    Arguments:
+
+      sketch_class: the class of the sketch to make (e.g.
+        pizza.sketches.DistinctCounter).  Each process calls this with
+        kwargs to make a sketch for each shard.
+
+    See count_files() for the other arguments.
+
+    """
+    tasks = make_tasks(paths, jobs, shard_size=shard_size)
+    sketch_args = (sketch_class, kwargs)
+    pool = multiprocessing.Pool(processes=jobs)
+    try:
+        sketches = pool.map(_sketch_task,
+                            [(task, sketch_args) for task in tasks],
+                            chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    sketch = sketch_class(**kwargs)
+    for shard_sketch in sketches:
+        sketch.merge(shard_sketch)
+    return sketch
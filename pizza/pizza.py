@@ -2,14 +2,277 @@
 # Project auto-generated at: ...
 # Copyright (C) 2012 Mustachioed Maven.
 
+"""
+Exposes run_pizza() and supporting record-counting functions.
 
-# TODO: replace this placeholder docstring and function body with the
-# real implementation.
+"""
+
+from __future__ import absolute_import
+
+import array
+
+import pizza.general.common as common
+
+# The number of bytes (or characters) to read from a stream at a time.
+CHUNK_SIZE = 64 * 1024
+
+# The array type code for the counts returned by run_pizza_batch().
+try:
+    array.array('q')
+    COUNT_TYPECODE = 'q'
+except ValueError:
+    # Python 2 does not support type code 'q' (signed long long).
+    COUNT_TYPECODE = 'l'
+
+# A pizza.general.metrics.Registry in which run_pizza() records what it
+# counts, or None to not record metrics.
+metrics_registry = None
+
+# The names of the metrics that run_pizza() records.
+METRIC_RECORDS = 'pizza_records_total'
+METRIC_BYTES = 'pizza_bytes_total'
+METRIC_RUN_PIZZA_SECONDS = 'pizza_run_pizza_seconds'
+
+
+def _newline(chunk):
+    """
+    Return a newline of the same string type as the given chunk.
+
+    """
+    return u'\n' if isinstance(chunk, common.TEXT_TYPE) else b'\n'
+
+
+def iter_chunks(stream, chunk_size=None):
+    """
+    Return a generator over fixed-size chunks read from a readable stream.
+
+    """
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    read = stream.read
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class RecordCounter(object):
+
+    """
+    Counts newline-delimited records in data fed to it in chunks.
+
+    This lets callers that receive data piecemeal (e.g. from a socket)
+    count records without buffering, with the same result as passing the
+    concatenated chunks to count_records().
+
+    """
+
+    def __init__(self):
+        self.newline_count = 0
+        # The number of bytes (or characters) fed.
+        self.size = 0
+        self._last_chunk = None
+
+    def feed(self, chunk):
+        """
+        Count the records in the next chunk of data.
+
+        """
+        if chunk:
+            self.newline_count += chunk.count(_newline(chunk))
+            self.size += len(chunk)
+            self._last_chunk = chunk
+
+    def total(self):
+        """
+        Return the number of records in the data fed so far.
+
+        A final record without a trailing newline is counted.
+
+        """
+        last_chunk = self._last_chunk
+        if last_chunk and not last_chunk.endswith(_newline(last_chunk)):
+            return self.newline_count + 1
+        return self.newline_count
+
+
+def _count_stream(stream, chunk_size=None):
+    """
+    Return a RecordCounter fed with the contents of a stream.
+
+    """
+    counter = RecordCounter()
+    feed = counter.feed
+    for chunk in iter_chunks(stream, chunk_size=chunk_size):
+        feed(chunk)
+    return counter
+
+
+def count_records(stream, chunk_size=None):
+    """
+    Return the number of newline-delimited records in a readable stream.
+
+    The stream is read in fixed-size chunks rather than line by line, so
+    memory use does not depend on the size of the input or the length of
+    its lines.  A final record without a trailing newline is counted.
+
+    Arguments:
+
+      stream: an object with a read() method returning bytes or text.
+
+    """
+    return _count_stream(stream, chunk_size=chunk_size).total()
+
+
+def iter_records(stream):
+    """
+    Return a generator over the newline-delimited records in a stream.
+
+    Each record is yielded without its trailing newline.  The records are
+    the ones that count_records() counts.
+
+    Arguments:
+
+      stream: an iterable over lines (e.g. a file object opened for reading).
+
+    """
+    for line in stream:
+        if line.endswith(_newline(line)):
+            line = line[:-1]
+        yield line
+
+
+# TODO: replace this placeholder docstring with the real documentation.
 def run_pizza(values):
     """
     Return the number of values.
 
     This function executes the Pizza package's main command-line functionality.
 
+    Arguments:
+
+      values: a sized sequence, an arbitrary iterable, or a readable stream
+        (an object with a read() method).  A stream is counted as
+        newline-delimited records.  Iterables and streams are consumed
+        incrementally and are never materialized as a list.
+
+    """
+    registry = metrics_registry
+    if registry is None:
+        return _run_pizza(values)[0]
+    start = registry.timer()
+    count, size = _run_pizza(values)
+    registry.histogram(METRIC_RUN_PIZZA_SECONDS,
+                       "Time spent in run_pizza().").observe(
+                           registry.timer() - start)
+    registry.counter(METRIC_RECORDS, "Records counted.").inc(count)
+    if size is not None:
+        registry.counter(METRIC_BYTES, "Bytes counted.").inc(size)
+    return count
+
+
+def _run_pizza(values):
+    """
+    Return a pair (count, size) for run_pizza().
+
+    The size is the number of bytes (or characters) read if values is a
+    stream, and None otherwise.
+
+    """
+    if hasattr(values, 'read'):
+        counter = _count_stream(values)
+        return counter.total(), counter.size
+    try:
+        return len(values), None
+    except TypeError:
+        # Then values is an iterable without a length (e.g. a generator).
+        pass
+    count = 0
+    for count, value in enumerate(values, 1):
+        pass
+    return count, None
+
+
+def _count_delimited(buf):
+    """
+    Return the number of newline-delimited records in a bytes-like object.
+
+    """
+    if not buf:
+        return 0
+    newline = _newline(buf)
+    count = buf.count(newline)
+    if not buf.endswith(newline):
+        count += 1
+    return count
+
+
+def _to_numpy(counts, use_numpy):
     """
-    return len(values)
+    Return counts as a NumPy array if requested and available.
+
+    Arguments:
+
+      counts: an array.array of type COUNT_TYPECODE.
+      use_numpy: True to require NumPy, False to never use it, or None
+        to use it if it is installed.
+
+    """
+    if use_numpy is False:
+        return counts
+    try:
+        import numpy
+    except ImportError:
+        if use_numpy:
+            raise
+        return counts
+    # This uses the buffer protocol rather than iterating over counts.
+    return numpy.array(counts, dtype=numpy.int64)
+
+
+def run_pizza_batch(groups, delimited=False, use_numpy=None):
+    """
+    Return the number of values in each of many groups as a compact array.
+
+    This is equivalent to calling run_pizza() once per group but avoids
+    a Python function call and a list entry per group.  The counts are
+    stored in an array.array of type COUNT_TYPECODE (signed 64-bit integers
+    on most platforms), or in a NumPy int64 array if NumPy is used.
+
+    If groups is a list or tuple whose groups all support len(), every
+    group is counted with len(), including any sized streams (e.g. mmap
+    objects), which run_pizza() would count as records.
+
+    Arguments:
+
+      groups: an iterable of groups.  By default, each group can be
+        anything that run_pizza() accepts.
+      delimited: whether each group is instead a bytes-like buffer (e.g.
+        bytes or bytearray) of newline-delimited records, counted like
+        count_records() counts a stream.
+      use_numpy: True to return a NumPy array, False to return an
+        array.array, or None (the default) to return a NumPy array if
+        NumPy is installed.
+
+    """
+    if delimited:
+        count = _count_delimited
+    elif isinstance(groups, (list, tuple)):
+        try:
+            # This counts every group in C rather than in a Python loop.
+            counts = array.array(COUNT_TYPECODE, map(len, groups))
+        except TypeError:
+            # Then some group does not support len() (e.g. a stream).
+            count = run_pizza
+        else:
+            return _to_numpy(counts, use_numpy)
+    else:
+        count = run_pizza
+
+    counts = array.array(COUNT_TYPECODE)
+    append = counts.append
+    for group in groups:
+        append(count(group))
+
+    return _to_numpy(counts, use_numpy)
@@ -3,23 +3,79 @@
 """
 Contains argument-parsing code and command-line documentation.
 
+To keep startup fast, the most common command lines are parsed without
+building an argument parser: command lines consisting only of values, and
+the help, version and license modes.  The --help text is prebuilt in the
+helptext module, which can be regenerated by running this module as a
+script.  Otherwise, a single parser is built and cached for the process.
+
 """
 
 import argparse
+import os
 import sys
 
 import pizza
+import pizza.cacheconfig as cacheconfig
 import pizza.general.optionparser as _parsing
+import pizza.scripts.pizza.client as client
 
 METAVAR_ARG_VALUE = 'VALUE'
+METAVAR_COUNT = 'N'
 METAVAR_INPUT_DIR = 'DIRECTORY'
-
+METAVAR_INPUT_FILE = 'FILE'
+METAVAR_OUTPUT_FILE = 'FILE'
+METAVAR_STATSD_ADDRESS = 'ADDRESS'
+METAVAR_SOCKET_PATH = 'PATH'
+METAVAR_TOP = 'K'
+
+# The --input value that means to read from standard input.
+INPUT_PATH_STDIN = '-'
+
+OPTION_ASYNC_LOGGING = _parsing.Option(('--async-logging',))
+OPTION_CACHE_HASH = _parsing.Option(('--cache-hash',))
+OPTION_CACHE_SIZE = _parsing.Option(('--cache-size',))
+OPTION_CACHED = _parsing.Option(('--cached',))
+OPTION_DISTINCT = _parsing.Option(('--distinct',))
+OPTION_EXACT = _parsing.Option(('--exact',))
+OPTION_EXITFIRST = _parsing.Option(('--exitfirst',))
+OPTION_FAILED_FIRST = _parsing.Option(('--failed-first',))
+OPTION_INCREMENTAL = _parsing.Option(('--incremental',))
+OPTION_INPUT = _parsing.Option(('-i', '--input'))
+OPTION_JOBS = _parsing.Option(('-j', '--jobs'))
+OPTION_LOG_BUFFER = _parsing.Option(('--log-buffer',))
 OPTION_MODE_HELP = _parsing.Option(('-h', '--help'))
+OPTION_MAX_CLIENTS = _parsing.Option(('--max-clients',))
+OPTION_METRICS_FILE = _parsing.Option(('--metrics-file',))
+OPTION_MODE_CACHE_CLEAR = _parsing.Option(('--cache-clear',))
+OPTION_MODE_CACHE_INFO = _parsing.Option(('--cache-info',))
 OPTION_MODE_LICENSE = _parsing.Option(('--license',))
+OPTION_MODE_SERVE = _parsing.Option(('--serve',))
 OPTION_MODE_TESTS = _parsing.Option(('-T', '--run-tests',))
 OPTION_MODE_VERSION = _parsing.Option(('-V', '--version'))
+OPTION_NO_CACHE = _parsing.Option(('--no-cache',))
+OPTION_PRECISION = _parsing.Option(('--precision',))
+OPTION_PROFILE = _parsing.Option(('--profile',))
 OPTION_SDIST_DIR = _parsing.Option(('--sdist',))
+OPTION_SLOWEST = _parsing.Option(('--slowest',))
+OPTION_SOCKET_PATH = _parsing.Option((client.OPTION_SOCKET_PATH,))
+OPTION_STATSD = _parsing.Option(('--statsd',))
+OPTION_STREAM = _parsing.Option(('--stream',))
+OPTION_TOP = _parsing.Option(('--top',))
+OPTION_TRACE_MALLOC = _parsing.Option(('--trace-malloc',))
 OPTION_VERBOSE = _parsing.Option(('-v', '--verbose'))
+OPTION_WATCH = _parsing.Option(('--watch',))
+
+LOG_BUFFER_DEFAULT = 200
+MAX_CLIENTS_DEFAULT = 8
+PRECISION_DEFAULT = 12
+SLOWEST_DEFAULT = 10
+
+# The program name to display in help output.  We use a fixed name (rather
+# than argparse's default of the basename of sys.argv[0]) and a fixed width
+# so that the help text can be prebuilt.
+PROG_NAME = 'pizza'
+HELP_WIDTH = 79
 
 # XXX: populate with sample.json description and URL.
 DESCRIPTION = """\
@@ -61,6 +117,99 @@ POSSIBILITY OF SUCH DAMAGE.
 HELP_STRINGS = {
     'args': """\
 zero more input values.
+""",
+    OPTION_ASYNC_LOGGING: """\
+format and write log messages on a background thread, so that logging (e.g.
+with %(verbose)s) does not slow down counting.  Messages are written in the
+same order and format as usual, and all are written before the program
+exits.  This has no effect with %(tests)s.
+""" % {'verbose': OPTION_VERBOSE.display(),
+       'tests': OPTION_MODE_TESTS.display()},
+    OPTION_CACHE_HASH: """\
+key cached results on a hash of each file's contents rather than on the
+file's device, inode, size and modification time.  This lets copies of a file
+share results, but looking up a result requires reading the file.
+""",
+    OPTION_CACHE_SIZE: """\
+the maximum number of results to keep in the result cache.  The least
+recently used results are evicted first.  Defaults to %(default)d.
+""" % {'default': cacheconfig.MAX_ENTRIES_DEFAULT},
+    OPTION_CACHED: """\
+with %(tests)s, do not run the tests that passed last time if neither their
+module nor the pizza modules it imports have changed.  Failed tests always
+run again.  Code run in child processes and data files are not checked for
+changes, so test modules that depend on them set never_cached = True to
+always run.  The results are kept in the temp directory of the project with
+%(sdist)s and in the cache directory otherwise.
+""" % {'tests': OPTION_MODE_TESTS.display(),
+       'sdist': OPTION_SDIST_DIR.display()},
+    OPTION_DISTINCT: """\
+count the distinct values rather than all values.  Up to 1024 distinct
+values are counted exactly.  Beyond that, the count is estimated with a
+HyperLogLog sketch of fixed size (see %(precision)s), so memory use does not
+grow with the input.  With %(jobs)s, each process builds its own sketch, and
+the sketches are merged.
+""" % {'precision': OPTION_PRECISION.display(),
+       'jobs': OPTION_JOBS.display()},
+    OPTION_EXACT: """\
+with %(distinct)s, always count distinct values exactly.  This uses memory
+proportional to the number of distinct values.
+""" % {'distinct': OPTION_DISTINCT.display()},
+    OPTION_EXITFIRST: """\
+with %(tests)s, stop at the first failing test.
+""" % {'tests': OPTION_MODE_TESTS.display()},
+    OPTION_FAILED_FIRST: """\
+with %(tests)s, run the test modules with tests that failed last time
+before the others.  The ids of the failing tests of each run are kept in the
+same directory as the results of %(cached)s.  Combine with %(exitfirst)s to
+learn quickly whether the tests being fixed pass.  This cannot be combined
+with %(stream)s.
+""" % {'tests': OPTION_MODE_TESTS.display(),
+       'cached': OPTION_CACHED.display(),
+       'exitfirst': OPTION_EXITFIRST.display(),
+       'stream': OPTION_STREAM.display()},
+    OPTION_INCREMENTAL: """\
+count %(input)s files incrementally.  For each regular file, the byte offset
+up to which it was counted is remembered, and the next run only reads the
+bytes appended since.  A file that was rotated or truncated is counted from
+the beginning.  This is useful for counting growing log files.
+""" % {'input': OPTION_INPUT.display()},
+    OPTION_INPUT: """\
+read newline-delimited values from the file at path %(metavar)s instead of
+from the command line.  Pass %(stdin)s to read from standard input.  This
+option can be provided more than once, in which case the counts are summed.
+Input is read incrementally, so its size is not limited by available memory.
+""" % {'metavar': METAVAR_INPUT_FILE, 'stdin': INPUT_PATH_STDIN},
+    OPTION_JOBS: """\
+the number of processes to use when counting %(input)s files.  With more
+than one process, files are counted at the same time, and large files are
+split into record-aligned byte ranges that are counted separately.  The
+result is the same as with one process.  Defaults to 1.
+""" % {'input': OPTION_INPUT.display()},
+    OPTION_LOG_BUFFER: """\
+keep the last %(metavar)s debug log messages in memory, and write them only if
+the command fails.  This gives context for errors without the cost of
+%(verbose)s.  The parsed arguments are left out, and no messages are kept
+with %(tests)s.  Pass 0 to keep none.  Defaults to %(default)d.
+""" % {'metavar': METAVAR_COUNT, 'verbose': OPTION_VERBOSE.display(),
+       'tests': OPTION_MODE_TESTS.display(), 'default': LOG_BUFFER_DEFAULT},
+    OPTION_MAX_CLIENTS: """\
+the maximum number of requests a server started with %(serve)s processes at
+once.  Other requests wait until one finishes.  Defaults to %(default)d.
+""" % {'serve': OPTION_MODE_SERVE.display(),
+       'default': MAX_CLIENTS_DEFAULT},
+    OPTION_METRICS_FILE: """\
+after the command finishes, write metrics for the run to %(metavar)s in the
+Prometheus text format (e.g. for the node exporter's textfile collector).
+The metrics are the numbers of records and bytes counted and histograms of
+the time spent parsing arguments, running the command and in total.  The
+file is replaced atomically.
+""" % {'metavar': METAVAR_OUTPUT_FILE},
+    OPTION_MODE_CACHE_CLEAR: """\
+remove all results from the result cache and exit.
+""",
+    OPTION_MODE_CACHE_INFO: """\
+print the location and size of the result cache to stdout.
 """,
     OPTION_MODE_HELP: """\
 show this help message and exit.
@@ -71,8 +220,77 @@ Running this command is for the most part equivalent to running unittest's
 command-line discover command with an appropriate -t/--start-directory value.
 Option values are passed along as is to the discover command.  For info on
 the discovery options, consult the Python documentation or pass -h or --help
-as an option to this value.
+as an option to this value.  To run the tests in %(metavar)s processes, pass
+%(jobs)s %(metavar)s before this option (e.g. "pizza -j 4 -T").
+""" % {'jobs': OPTION_JOBS.display(), 'metavar': METAVAR_COUNT},
+    OPTION_NO_CACHE: """\
+do not look up or store results in the result cache.  By default, the
+counts of %(input)s files of at least 1 MiB are cached in a local database
+(in the directory given by the %(env)s environment variable, if set) and
+reused until the file changes.
+""" % {'input': OPTION_INPUT.display(), 'env': 'PIZZA_CACHE_DIR'},
+    OPTION_PRECISION: """\
+the precision of the sketch used to estimate a large number of distinct
+values, from 4 to 16.  The sketch takes 2**%(metavar)s bytes, and estimates
+have a relative standard error of about 1.04/sqrt(2**%(metavar)s).  Defaults
+to %(default)d, which takes 4 KiB and gives an error of about 1.6 percent.
+""" % {'metavar': METAVAR_COUNT, 'default': PRECISION_DEFAULT},
+    OPTION_PROFILE: """\
+run the command under cProfile, and log the functions with the highest
+cumulative time to stderr.  If %(metavar)s is given (as %(option)s=%(metavar)s),
+also write the full profile to %(metavar)s in pstats format.
+""" % {'metavar': METAVAR_OUTPUT_FILE, 'option': '--profile'},
+    OPTION_MODE_SERVE: """\
+run a server that keeps a warm process listening on a Unix domain socket.
+The pizza-client command sends its arguments to the server and prints the
+same output and exits with the same status as the pizza command would.  This
+avoids paying the program's startup cost on every call.
 """,
+    OPTION_SLOWEST: """\
+with %(tests)s, report the %(metavar)s slowest tests after running them.  Test
+durations are also kept in the cache directory, and later runs use them to
+run the longest tests first.  Defaults to %(default)d.
+""" % {'tests': OPTION_MODE_TESTS.display(), 'metavar': METAVAR_COUNT,
+       'default': SLOWEST_DEFAULT},
+    OPTION_SOCKET_PATH: """\
+the path of the Unix domain socket for %(serve)s.  Defaults to the value of
+the %(env)s environment variable or else a per-user path in the temp
+directory.  pizza-client also sends its command to the server on this path.
+""" % {'serve': OPTION_MODE_SERVE.display(),
+       'env': client.ENV_SOCKET_PATH},
+    OPTION_STATSD: """\
+after the command finishes, send the metrics described under %(metrics)s to
+a statsd server.  %(metavar)s is either HOST:PORT for UDP or the path to a
+Unix domain datagram socket.
+""" % {'metrics': OPTION_METRICS_FILE.display(),
+       'metavar': METAVAR_STATSD_ADDRESS},
+    OPTION_STREAM: """\
+with %(tests)s, run each test module as soon as it is loaded rather than
+loading all tests first.  This shortens the time to the first result and
+keeps memory use flat for large suites, but the tests run in discovery order.
+This cannot be combined with %(jobs)s.
+""" % {'tests': OPTION_MODE_TESTS.display(), 'jobs': OPTION_JOBS.display()},
+    OPTION_TOP: """\
+print the %(metavar)s most frequent values rather than the count, one per line
+as the value's estimated count, a tab and the value.  Counts are estimated
+with a Space-Saving sketch that tracks a bounded number of values, so memory
+use does not grow with the number of distinct values.  Estimated counts are
+never too low.  With %(jobs)s, each process builds its own sketch, and the
+sketches are merged.
+""" % {'metavar': METAVAR_TOP, 'jobs': OPTION_JOBS.display()},
+    OPTION_TRACE_MALLOC: """\
+run the command with tracemalloc, and log the peak traced memory and the
+lines that allocated the most memory to stderr.  If %(metavar)s is given (as
+%(option)s=%(metavar)s), also write a tracemalloc snapshot to %(metavar)s.
+Requires Python 3.4 or later.
+""" % {'metavar': METAVAR_OUTPUT_FILE, 'option': '--trace-malloc'},
+    OPTION_WATCH: """\
+with %(tests)s, keep running after the tests finish, and watch the project's
+source files for changes (with inotify where available and by polling
+otherwise).  After each change, reload the changed modules and the test
+modules that import them, and run the affected tests again.  Press Ctrl-C to
+stop.
+""" % {'tests': OPTION_MODE_TESTS.display()},
     OPTION_SDIST_DIR: """\
 whether to assume the command is being run from a source distribution
 (e.g. an sdist or Git repository).  Running with this option may look, for
@@ -96,6 +314,84 @@ def get_license_string():
     return s
 
 
+# The Namespace attribute values when an option is not provided.  The
+# parser uses these, too, so that fast-parsed and fully parsed Namespace
+# objects agree.
+NAMESPACE_DEFAULTS = {
+    'async_logging': False,
+    'cache_clear_mode': False,
+    'cache_hash': False,
+    'cache_info_mode': False,
+    'cache_size': cacheconfig.MAX_ENTRIES_DEFAULT,
+    'cached': False,
+    'distinct': False,
+    'exact': False,
+    'exitfirst': False,
+    'failed_first': False,
+    'help': False,
+    'incremental': False,
+    'input_paths': None,
+    'is_sdist': False,
+    'jobs': 1,
+    'license_mode': False,
+    'log_buffer': LOG_BUFFER_DEFAULT,
+    'max_clients': MAX_CLIENTS_DEFAULT,
+    'metrics_path': None,
+    'precision': PRECISION_DEFAULT,
+    'profile_path': None,
+    'run_tests': None,
+    'serve_mode': False,
+    'slowest': SLOWEST_DEFAULT,
+    'socket_path': None,
+    'statsd_address': None,
+    'stream': False,
+    'top': None,
+    'trace_malloc_path': None,
+    'use_cache': True,
+    'verbose': False,
+    'version_mode': False,
+    'watch': False,
+}
+
+# The command lines consisting of a single option that can be parsed
+# without a parser, and the Namespace attribute each sets to True.
+_SINGLE_OPTION_MODES = {}
+for _option, _dest in ((OPTION_MODE_HELP, 'help'),
+                       (OPTION_MODE_LICENSE, 'license_mode'),
+                       (OPTION_MODE_VERSION, 'version_mode')):
+    for _option_string in _option:
+        _SINGLE_OPTION_MODES[_option_string] = _dest
+del _option, _dest, _option_string
+
+_parser = None
+
+
+def make_namespace(args, **kwargs):
+    """
+    Return a Namespace object with default values except as given.
+
+    """
+    attrs = dict(NAMESPACE_DEFAULTS)
+    attrs.update(kwargs)
+    return argparse.Namespace(args=args, **attrs)
+
+
+def _fast_parse_args(args):
+    """
+    Parse the most common command lines without a parser.
+
+    Returns a Namespace object, or None if args needs a full parse.
+
+    """
+    if len(args) == 1 and args[0] in _SINGLE_OPTION_MODES:
+        return make_namespace([], **{_SINGLE_OPTION_MODES[args[0]]: True})
+    for arg in args:
+        if arg.startswith('-'):
+            return None
+    # Then every argument is a value.
+    return make_namespace(list(args))
+
+
 def preparse_args(sys_argv):
     """
     Parse command arguments without raising an exception (or exiting).
@@ -107,35 +403,68 @@ def preparse_args(sys_argv):
 
     """
     try:
-        # Suppress the help option to prevent exiting.
-        ns = parse_args(sys_argv, suppress_help_exit=True)
+        ns = parse_args(sys_argv)
     except _parsing.UsageError:
         # Any usage error will occur again during the real parse.
         return None
     return ns
 
 
-def parse_args(sys_argv, suppress_help_exit=False):
+def parse_args(sys_argv):
     """
     Parse arguments and return a Namespace object.
 
     Raises UsageError on command-line usage error.
 
     """
-    parser = _create_parser(suppress_help_exit=suppress_help_exit)
-    return parser.parse_args(sys_argv[1:])
+    args = sys_argv[1:]
+    ns = _fast_parse_args(args)
+    if ns is None:
+        ns = get_parser().parse_args(args)
+    return ns
+
+
+def get_parser():
+    """
+    Return the ArgParser for the program, creating it if necessary.
+
+    """
+    global _parser
+    if _parser is None:
+        _parser = _create_parser()
+    return _parser
 
 
-def _create_parser(suppress_help_exit=False):
+def format_help():
+    """
+    Return the --help text, as generated by the parser.
+
+    """
+    return get_parser().format_help()
+
+
+class _HelpFormatter(argparse.RawDescriptionHelpFormatter):
+
+    """
+    A help formatter that preserves the formatting of the description and
+    epilog and uses a fixed width (rather than the terminal width).
+
+    """
+
+    def __init__(self, prog):
+        super(_HelpFormatter, self).__init__(prog, width=HELP_WIDTH)
+
+
+def _create_parser():
     """
     Return an ArgParser for the program.
 
     """
-    parser = _parsing.ArgParser(description=DESCRIPTION,
+    parser = _parsing.ArgParser(prog=PROG_NAME,
+                       description=DESCRIPTION,
                        epilog=EPILOG,
                        add_help=False,
-                       # Preserves formatting of the description and epilog.
-                       formatter_class=argparse.RawDescriptionHelpFormatter)
+                       formatter_class=_HelpFormatter)
 
     def add_arg(obj, option, help=None, **kwargs):
         """
@@ -154,10 +483,49 @@ def _create_parser(suppress_help_exit=False):
     # as appropriate.
     # XXX: fix the help message.
     add_arg(parser, 'args', metavar=METAVAR_ARG_VALUE, nargs='*')
-    add_arg(parser, OPTION_SDIST_DIR, dest='is_sdist', action='store_true',
-            default=False)
+    add_arg(parser, OPTION_INPUT, metavar=METAVAR_INPUT_FILE,
+            dest='input_paths', action='append')
+    add_arg(parser, OPTION_JOBS, metavar=METAVAR_COUNT, dest='jobs', type=int)
+    add_arg(parser, OPTION_SDIST_DIR, dest='is_sdist', action='store_true')
+    add_arg(parser, OPTION_SLOWEST, metavar=METAVAR_COUNT, dest='slowest',
+            type=int)
+    add_arg(parser, OPTION_CACHED, dest='cached', action='store_true')
+    add_arg(parser, OPTION_STREAM, dest='stream', action='store_true')
+    add_arg(parser, OPTION_FAILED_FIRST, dest='failed_first',
+            action='store_true')
+    add_arg(parser, OPTION_EXITFIRST, dest='exitfirst', action='store_true')
+    add_arg(parser, OPTION_WATCH, dest='watch', action='store_true')
     add_arg(parser, OPTION_VERBOSE, dest='verbose', action='store_true',
             help='log verbosely.')
+    add_arg(parser, OPTION_ASYNC_LOGGING, dest='async_logging',
+            action='store_true')
+    add_arg(parser, OPTION_LOG_BUFFER, metavar=METAVAR_COUNT,
+            dest='log_buffer', type=int)
+    add_arg(parser, OPTION_SOCKET_PATH, metavar=METAVAR_SOCKET_PATH,
+            dest='socket_path')
+    add_arg(parser, OPTION_MAX_CLIENTS, metavar=METAVAR_COUNT,
+            dest='max_clients', type=int)
+    add_arg(parser, OPTION_NO_CACHE, dest='use_cache', action='store_false')
+    add_arg(parser, OPTION_CACHE_SIZE, metavar=METAVAR_COUNT,
+            dest='cache_size', type=int)
+    add_arg(parser, OPTION_CACHE_HASH, dest='cache_hash', action='store_true')
+    add_arg(parser, OPTION_INCREMENTAL, dest='incremental',
+            action='store_true')
+    add_arg(parser, OPTION_DISTINCT, dest='distinct', action='store_true')
+    add_arg(parser, OPTION_PRECISION, metavar=METAVAR_COUNT,
+            dest='precision', type=int)
+    add_arg(parser, OPTION_EXACT, dest='exact', action='store_true')
+    add_arg(parser, OPTION_TOP, metavar=METAVAR_TOP, dest='top', type=int)
+    # These options take an optional value, which is the empty string if
+    # the option is provided without one.
+    add_arg(parser, OPTION_PROFILE, metavar=METAVAR_OUTPUT_FILE,
+            dest='profile_path', nargs='?', const='')
+    add_arg(parser, OPTION_TRACE_MALLOC, metavar=METAVAR_OUTPUT_FILE,
+            dest='trace_malloc_path', nargs='?', const='')
+    add_arg(parser, OPTION_METRICS_FILE, metavar=METAVAR_OUTPUT_FILE,
+            dest='metrics_path')
+    add_arg(parser, OPTION_STATSD, metavar=METAVAR_STATSD_ADDRESS,
+            dest='statsd_address')
 
     # This group corresponds to the possible "modes" or "commands".
     # We do not use a subparsers for this because of CPython issue #17050:
@@ -166,12 +534,61 @@ def _create_parser(suppress_help_exit=False):
     # run_tests is None if not provided, otherwise a list.
     add_arg(group, OPTION_MODE_TESTS, dest='run_tests',
             nargs=argparse.REMAINDER)
+    add_arg(group, OPTION_MODE_SERVE, dest='serve_mode', action='store_true')
+    add_arg(group, OPTION_MODE_CACHE_INFO, dest='cache_info_mode',
+            action='store_true')
+    add_arg(group, OPTION_MODE_CACHE_CLEAR, dest='cache_clear_mode',
+            action='store_true')
     add_arg(group, OPTION_MODE_LICENSE, dest='license_mode',
             action='store_true', help='print license info to stdout.')
     add_arg(group, OPTION_MODE_VERSION, dest='version_mode',
             action='store_true', help='print version info to stdout.')
-    # We add help manually for more control.
-    help_action = "store_true" if suppress_help_exit else "help"
-    add_arg(group, OPTION_MODE_HELP, action=help_action)
+    # We add help manually for more control.  Also, the help option does
+    # not exit because the prebuilt help text is written by the caller.
+    add_arg(group, OPTION_MODE_HELP, dest='help', action='store_true')
+
+    parser.set_defaults(**NAMESPACE_DEFAULTS)
 
     return parser
+
+
+def write_help_module(path=None):
+    """
+    Regenerate the helptext module from the parser.
+
+    """
+    if path is None:
+        path = os.path.join(os.path.dirname(__file__), 'helptext.py')
+    text = format_help()
+    # Otherwise the text cannot go verbatim in a triple-quoted string.
+    assert '"""' not in text and '\\' not in text
+    with open(path, 'w') as f:
+        f.write(HELP_MODULE_TEMPLATE % {'text': text,
+                                        'version': sys.version_info[:2]})
+
+
+HELP_MODULE_TEMPLATE = '''\
+# encoding: utf-8
+#
+# This file is generated.  Do not edit it by hand.  To regenerate it after
+# changing the program's options or help strings, run--
+#
+#     $ python -m pizza.scripts.pizza.argparsing
+#
+
+"""
+Contains the prebuilt --help text.
+
+"""
+
+# The Python version that generated HELP_TEXT.  The output of argparse
+# differs slightly across Python versions.
+PYTHON_VERSION = %(version)r
+
+HELP_TEXT = """\\
+%(text)s"""
+'''
+
+
+if __name__ == '__main__':
+    write_help_module()
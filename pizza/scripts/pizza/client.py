@@ -0,0 +1,125 @@
+"""
+Provides a thin client for a server started with `pizza --serve`.
+
+The client forwards its command-line arguments to the server and reproduces
+the server's output and exit status, which avoids the cost of importing and
+configuring the full console script on every call.  If no server is
+listening, or the command is one the server does not run (e.g. --run-tests),
+the client runs the command in-process instead, so the result is always the
+same as running `pizza` directly.  The client talks to the server at the
+path given by a --socket option in its arguments, if any, and otherwise at
+default_socket_path().
+
+This module deliberately imports only a few standard library modules to
+keep its startup time low.  The modules needed to talk to the server are
+imported inside send_request() so that other modules can import this one
+for its constants (e.g. ENV_SOCKET_PATH) without paying for them.
+
+"""
+
+import os
+import sys
+
+ENCODING = 'utf-8'
+
+# The environment variable that overrides the default socket path.
+ENV_SOCKET_PATH = 'PIZZA_SOCKET'
+# The option that sets the socket path, for both the server and the client.
+OPTION_SOCKET_PATH = '--socket'
+
+
+def default_socket_path():
+    """
+    Return the socket path to use if none is provided explicitly.
+
+    """
+    path = os.environ.get(ENV_SOCKET_PATH)
+    if path:
+        return path
+    temp_dir = os.environ.get('TMPDIR', '/tmp')
+    return os.path.join(temp_dir, 'pizza-%d.sock' % os.getuid())
+
+
+def find_socket_path(argv):
+    """
+    Return the value of the socket path option in argv, or None if absent.
+
+    This looks for the option without parsing the other options, so as not
+    to import the argument parser.
+
+    """
+    prefix = OPTION_SOCKET_PATH + '='
+    for index, arg in enumerate(argv[1:], 1):
+        if arg == '--':
+            break
+        if arg == OPTION_SOCKET_PATH and index + 1 < len(argv):
+            return argv[index + 1]
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return None
+
+
+def send_request(argv, socket_path=None):
+    """
+    Send argv to the server, and return the response object.
+
+    Returns None if no server is listening on the socket path, or if the
+    reply is empty or not a JSON object (e.g. if the server failed while
+    handling the request), in which case the caller should run the
+    command itself.
+
+    """
+    import errno
+    import json
+    import socket
+
+    if socket_path is None:
+        socket_path = default_socket_path()
+    request = {'argv': list(argv), 'cwd': os.getcwd()}
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(socket_path)
+        except socket.error as err:
+            if err.errno in (errno.ENOENT, errno.ECONNREFUSED):
+                return None
+            raise
+        sock.sendall(json.dumps(request).encode(ENCODING) + b'\n')
+        f = sock.makefile('rb')
+        try:
+            line = f.readline()
+        finally:
+            f.close()
+    finally:
+        sock.close()
+
+    try:
+        response = json.loads(line.decode(ENCODING))
+    except ValueError:
+        # This includes the UnicodeDecodeError for bytes that are not
+        # UTF-8, and the error for an empty line.
+        return None
+    if not isinstance(response, dict):
+        return None
+    return response
+
+
+def main(argv=None, from_source=False):
+    if argv is None:
+        argv = sys.argv
+
+    response = send_request(argv, socket_path=find_socket_path(argv))
+
+    if response is None or response.get('local') or 'status' not in response:
+        # Then run the command in this process.
+        import pizza.scripts.pizza.main as main_mod
+        main_mod.main(argv, from_source=from_source)
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['status'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# encoding: utf-8
+#
+# This file is generated.  Do not edit it by hand.  To regenerate it after
+# changing the program's options or help strings, run--
+#
+#     $ python -m pizza.scripts.pizza.argparsing
+#
+
+"""
+Contains the prebuilt --help text.
+
+"""
+
+# The Python version that generated HELP_TEXT.  The output of argparse
+# differs slightly across Python versions.
+PYTHON_VERSION = (2, 7)
+
+HELP_TEXT = """\
+usage: pizza [-i FILE] [-j N] [--sdist] [--slowest N] [--cached] [--stream]
+             [--failed-first] [--exitfirst] [--watch] [-v] [--async-logging]
+             [--log-buffer N] [--socket PATH] [--max-clients N] [--no-cache]
+             [--cache-size N] [--cache-hash] [--incremental] [--distinct]
+             [--precision N] [--exact] [--top K] [--profile [FILE]]
+             [--trace-malloc [FILE]] [--metrics-file FILE] [--statsd ADDRESS]
+             [-T ... | --serve | --cache-info | --cache-clear | --license | -V | -h]
+             [VALUE [VALUE ...]]
+
+Make a pizza!
+
+positional arguments:
+  VALUE                 zero more input values.
+
+optional arguments:
+  -i FILE, --input FILE
+                        read newline-delimited values from the file at path
+                        FILE instead of from the command line. Pass - to read
+                        from standard input. This option can be provided more
+                        than once, in which case the counts are summed. Input
+                        is read incrementally, so its size is not limited by
+                        available memory.
+  -j N, --jobs N        the number of processes to use when counting -i/--input
+                        files. With more than one process, files are counted at
+                        the same time, and large files are split into record-
+                        aligned byte ranges that are counted separately. The
+                        result is the same as with one process. Defaults to 1.
+  --sdist               whether to assume the command is being run from a
+                        source distribution (e.g. an sdist or Git repository).
+                        Running with this option may look, for example, for
+                        certain resources available only in a source checkout.
+                        Defaults to false.
+  --slowest N           with -T/--run-tests, report the N slowest tests after
+                        running them. Test durations are also kept in the cache
+                        directory, and later runs use them to run the longest
+                        tests first. Defaults to 10.
+  --cached              with -T/--run-tests, do not run the tests that passed
+                        last time if neither their module nor the pizza modules
+                        it imports have changed. Failed tests always run again.
+                        Code run in child processes and data files are not
+                        checked for changes, so test modules that depend on
+                        them set never_cached = True to always run. The results
+                        are kept in the temp directory of the project with
+                        --sdist and in the cache directory otherwise.
+  --stream              with -T/--run-tests, run each test module as soon as it
+                        is loaded rather than loading all tests first. This
+                        shortens the time to the first result and keeps memory
+                        use flat for large suites, but the tests run in
+                        discovery order. This cannot be combined with
+                        -j/--jobs.
+  --failed-first        with -T/--run-tests, run the test modules with tests
+                        that failed last time before the others. The ids of the
+                        failing tests of each run are kept in the same
+                        directory as the results of --cached. Combine with
+                        --exitfirst to learn quickly whether the tests being
+                        fixed pass. This cannot be combined with --stream.
+  --exitfirst           with -T/--run-tests, stop at the first failing test.
+  --watch               with -T/--run-tests, keep running after the tests
+                        finish, and watch the project's source files for
+                        changes (with inotify where available and by polling
+                        otherwise). After each change, reload the changed
+                        modules and the test modules that import them, and run
+                        the affected tests again. Press Ctrl-C to stop.
+  -v, --verbose         log verbosely.
+  --async-logging       format and write log messages on a background thread,
+                        so that logging (e.g. with -v/--verbose) does not slow
+                        down counting. Messages are written in the same order
+                        and format as usual, and all are written before the
+                        program exits. This has no effect with -T/--run-tests.
+  --log-buffer N        keep the last N debug log messages in memory, and write
+                        them only if the command fails. This gives context for
+                        errors without the cost of -v/--verbose. The parsed
+                        arguments are left out, and no messages are kept with
+                        -T/--run-tests. Pass 0 to keep none. Defaults to 200.
+  --socket PATH         the path of the Unix domain socket for --serve.
+                        Defaults to the value of the PIZZA_SOCKET environment
+                        variable or else a per-user path in the temp directory.
+                        pizza-client also sends its command to the server on
+                        this path.
+  --max-clients N       the maximum number of requests a server started with
+                        --serve processes at once. Other requests wait until
+                        one finishes. Defaults to 8.
+  --no-cache            do not look up or store results in the result cache. By
+                        default, the counts of -i/--input files of at least 1
+                        MiB are cached in a local database (in the directory
+                        given by the PIZZA_CACHE_DIR environment variable, if
+                        set) and reused until the file changes.
+  --cache-size N        the maximum number of results to keep in the result
+                        cache. The least recently used results are evicted
+                        first. Defaults to 10000.
+  --cache-hash          key cached results on a hash of each file's contents
+                        rather than on the file's device, inode, size and
+                        modification time. This lets copies of a file share
+                        results, but looking up a result requires reading the
+                        file.
+  --incremental         count -i/--input files incrementally. For each regular
+                        file, the byte offset up to which it was counted is
+                        remembered, and the next run only reads the bytes
+                        appended since. A file that was rotated or truncated is
+                        counted from the beginning. This is useful for counting
+                        growing log files.
+  --distinct            count the distinct values rather than all values. Up to
+                        1024 distinct values are counted exactly. Beyond that,
+                        the count is estimated with a HyperLogLog sketch of
+                        fixed size (see --precision), so memory use does not
+                        grow with the input. With -j/--jobs, each process
+                        builds its own sketch, and the sketches are merged.
+  --precision N         the precision of the sketch used to estimate a large
+                        number of distinct values, from 4 to 16. The sketch
+                        takes 2**N bytes, and estimates have a relative
+                        standard error of about 1.04/sqrt(2**N). Defaults to
+                        12, which takes 4 KiB and gives an error of about 1.6
+                        percent.
+  --exact               with --distinct, always count distinct values exactly.
+                        This uses memory proportional to the number of distinct
+                        values.
+  --top K               print the K most frequent values rather than the count,
+                        one per line as the value's estimated count, a tab and
+                        the value. Counts are estimated with a Space-Saving
+                        sketch that tracks a bounded number of values, so
+                        memory use does not grow with the number of distinct
+                        values. Estimated counts are never too low. With
+                        -j/--jobs, each process builds its own sketch, and the
+                        sketches are merged.
+  --profile [FILE]      run the command under cProfile, and log the functions
+                        with the highest cumulative time to stderr. If FILE is
+                        given (as --profile=FILE), also write the full profile
+                        to FILE in pstats format.
+  --trace-malloc [FILE]
+                        run the command with tracemalloc, and log the peak
+                        traced memory and the lines that allocated the most
+                        memory to stderr. If FILE is given (as --trace-
+                        malloc=FILE), also write a tracemalloc snapshot to
+                        FILE. Requires Python 3.4 or later.
+  --metrics-file FILE   after the command finishes, write metrics for the run
+                        to FILE in the Prometheus text format (e.g. for the
+                        node exporter's textfile collector). The metrics are
+                        the numbers of records and bytes counted and histograms
+                        of the time spent parsing arguments, running the
+                        command and in total. The file is replaced atomically.
+  --statsd ADDRESS      after the command finishes, send the metrics described
+                        under --metrics-file to a statsd server. ADDRESS is
+                        either HOST:PORT for UDP or the path to a Unix domain
+                        datagram socket.
+  -T ..., --run-tests ...
+                        discover and run project tests. Tests include unit
+                        tests and doctests. Running this command is for the
+                        most part equivalent to running unittest's command-line
+                        discover command with an appropriate -t/--start-
+                        directory value. Option values are passed along as is
+                        to the discover command. For info on the discovery
+                        options, consult the Python documentation or pass -h or
+                        --help as an option to this value. To run the tests in
+                        N processes, pass -j/--jobs N before this option (e.g.
+                        "pizza -j 4 -T").
+  --serve               run a server that keeps a warm process listening on a
+                        Unix domain socket. The pizza-client command sends its
+                        arguments to the server and prints the same output and
+                        exits with the same status as the pizza command would.
+                        This avoids paying the program's startup cost on every
+                        call.
+  --cache-info          print the location and size of the result cache to
+                        stdout.
+  --cache-clear         remove all results from the result cache and exit.
+  --license             print license info to stdout.
+  -V, --version         print version info to stdout.
+  -h, --help            show this help message and exit.
+
+This is version 0.1.1 of Pizza.
+"""
@@ -3,18 +3,27 @@ Provides the function for the main setup.py console_script.
 
 """
 
+# To keep startup fast for the common case of counting values, modules
+# needed only by less common modes or error paths (e.g. running tests,
+# serving, or counting with a process pool) are imported inside the
+# functions that use them rather than here.  In particular, only the
+# --run-tests path should import unittest.  See also test_startup.py.
 import logging
 import os
 import sys
+# The traceback module is imported eagerly because it is already loaded
+# at startup by site (Python 2) or by logging (Python 3).
 import traceback
 
+import pizza.filecount as filecount
 import pizza.pizza as _pizza
 import pizza.general.common as _common
 import pizza.general.logconfig as logconfig
+import pizza.general.metrics as metrics
 import pizza.general.optionparser as _parsing
 import pizza.scripts
 import pizza.scripts.pizza.argparsing as argparsing
-import pizza.test.harness.main as harness
+import pizza.scripts.pizza.client as client
 
 EXIT_STATUS_SUCCESS = 0
 EXIT_STATUS_FAIL = 1
@@ -22,11 +31,23 @@ EXIT_STATUS_USAGE_ERROR = 2
 
 LOGGING_LEVEL_DEFAULT = logging.INFO
 
+# The names of the metrics recorded for --metrics-file and --statsd, in
+# addition to those recorded by run_pizza().
+METRIC_PARSE_SECONDS = 'pizza_parse_seconds'
+METRIC_COUNT_SECONDS = 'pizza_count_seconds'
+METRIC_WALL_SECONDS = 'pizza_wall_seconds'
+
 # XXX: should this be made public with a better name?
 log = logging.getLogger("pizza.script")
-# Loggers that should display during testing.
+# The QueueListener writing log messages for --async-logging, if started.
+_log_listener = None
+# The RingBufferHandler keeping debug messages for --log-buffer, if any.
+_log_buffer = None
+# Loggers that should display during testing.  We use the name of
+# pizza.test.harness.main.log rather than the logger itself to avoid
+# importing the test harness (and unittest) outside of --run-tests.
 # XXX: make this test_loggers instead of test_logger_names.
-test_logger_names = [logger.name for logger in (log, harness.log)]
+test_logger_names = [log.name, "pizza.test"]
 
 
 def error(msg, add_trace=False):
@@ -35,23 +56,34 @@ def error(msg, add_trace=False):
     log.error(msg)
 
 
-# XXX: make this testable.
-# XXX: finish documenting this method.
-# XXX: improve parameter names.
-def _configure_logging(level=None, stream=None, is_testing=False,
-                       is_verbose=False):
-    """
-    Arguments:
+# A cache of the return values of _truncate_name(), since there are only
+# a few logger names.
+_truncated_names = {}
 
-      level: lowest logging level to log.
-      stream: the stream to which to log (e.g. sys.stderr).
 
+def _truncate_name(name):
     """
-    if stream is None:
-        stream = sys.stderr
+    Return a logger name shortened for display if long.
 
-    level = logging.DEBUG if is_verbose else LOGGING_LEVEL_DEFAULT
+    """
+    try:
+        return _truncated_names[name]
+    except KeyError:
+        pass
+    parts = name.split(".")
+    if len(parts) <= 3:
+        truncated_name = name
+    else:
+        truncated_name = '.'.join(parts[:2] + ['.', parts[-1]])
+    _truncated_names[name] = truncated_name
+    return truncated_name
 
+
+def _create_log_handler(stream, is_testing=False, is_verbose=False):
+    """
+    Return a log handler that writes formatted log messages to a stream.
+
+    """
     # We pass a newline as last_text to prevent a newline from being added
     # before the first log message.
     rstream = logconfig.RememberingStream(stream, last_text='\n')
@@ -68,12 +100,7 @@ def _configure_logging(level=None, stream=None, is_testing=False,
         class Filter(object):
             def filter(self, record):
                 """Set record.truncated_name."""
-                parts = record.name.split(".")
-                if len(parts) <= 3:
-                    truncated_name = record.name
-                else:
-                    truncated_name = '.'.join(parts[:2] + ['.', parts[-1]])
-                record.truncated_name = truncated_name
+                record.truncated_name = _truncate_name(record.name)
                 return True
         handler.addFilter(Filter())
 
@@ -84,6 +111,41 @@ def _configure_logging(level=None, stream=None, is_testing=False,
 
     formatter = logging.Formatter(format_string)
     handler.setFormatter(formatter)
+    # The root logger's level can be lower (see _configure_logging()).
+    handler.setLevel(logging.DEBUG if is_verbose else LOGGING_LEVEL_DEFAULT)
+
+    return handler
+
+
+# XXX: make this testable.
+# XXX: finish documenting this method.
+# XXX: improve parameter names.
+def _configure_logging(level=None, stream=None, is_testing=False,
+                       is_verbose=False, use_queue=False, buffer_size=0):
+    """
+    Arguments:
+
+      level: lowest logging level to log.
+      stream: the stream to which to log (e.g. sys.stderr).
+      use_queue: whether to format and write log messages on a background
+        thread.  Call stop_log_thread() to write any pending messages.
+      buffer_size: the number of unlogged debug messages to keep in
+        memory for dump_log_buffer() to write.  Ignored if verbose.
+
+    """
+    global _log_buffer
+    global _log_listener
+
+    if stream is None:
+        stream = sys.stderr
+
+    level = logging.DEBUG if is_verbose else LOGGING_LEVEL_DEFAULT
+
+    handler = _create_log_handler(stream, is_testing=is_testing,
+                                  is_verbose=is_verbose)
+    if use_queue:
+        _log_listener, handler = logconfig.start_queue_logging(handler)
+    handler.setLevel(level)
 
     root = logging.getLogger()
     root.setLevel(level)
@@ -92,48 +154,550 @@ def _configure_logging(level=None, stream=None, is_testing=False,
     # "No handlers could be found for logger..."
     root.addHandler(handler)
 
-    log.debug("debug logging enabled")
+    if buffer_size > 0 and not is_verbose:
+        # Then also keep the messages below the level in a ring buffer.
+        class Filter(object):
+            def filter(self, record):
+                return record.levelno < level
+        _log_buffer = logconfig.RingBufferHandler(buffer_size, handler)
+        _log_buffer.addFilter(Filter())
+        root.setLevel(logging.DEBUG)
+        root.addHandler(_log_buffer)
+
+    if is_verbose:
+        log.debug("debug logging enabled")
 
 
-def configure_logging(argv, stream=None):
+def configure_logging(ns, stream=None):
     """
     Configure logging and return whether to run in verbose mode.
 
+    Arguments:
+
+      ns: the Namespace object returned by argparsing.preparse_args(),
+        or None if the command line has a usage error.
+
     """
-    if argv is None:
-        argv = sys.argv
     if stream is None:
         stream = sys.stderr
 
     is_testing = False
     is_verbose = False
 
-    # Configure logging before parsing arguments for real.
-    ns = argparsing.preparse_args(argv)
+    use_queue = False
+    buffer_size = 0
 
     if ns is not None:
         # Then args parsed without error.
         is_verbose = ns.verbose
-        if ns.run_tests:
+        # The value is an empty list for a bare --run-tests.
+        if ns.run_tests is not None:
             is_testing = True
+        # Test output shares the log stream, so we log from the test
+        # thread to keep log messages from landing mid-line.
+        use_queue = ns.async_logging and not is_testing
+        if not is_testing:
+            buffer_size = ns.log_buffer
 
     # XXX: reconsider the argument names here.
     _configure_logging(stream=stream, is_testing=is_testing,
-                       is_verbose=is_verbose)
+                       is_verbose=is_verbose, use_queue=use_queue,
+                       buffer_size=buffer_size)
 
     return is_verbose
 
 
-def _main_inner(argv, from_source):
-    """Run the program and return the status code."""
+def dump_log_buffer():
+    """
+    Write the debug messages kept by the log buffer, if any.
+
+    """
+    if _log_buffer is None or not _log_buffer.records:
+        return
+    log.info("the last %d debug log messages:" % len(_log_buffer.records))
+    _log_buffer.dump()
+
+
+def stop_log_thread():
+    """
+    Write any pending log messages, and stop the logging thread if started.
+
+    """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def _count_input(path):
+    """
+    Return the number of records in the input at the given --input path.
+
+    """
+    if path == argparsing.INPUT_PATH_STDIN:
+        # In Python 3, sys.stdin is a text stream wrapping a binary buffer.
+        stream = getattr(sys.stdin, 'buffer', sys.stdin)
+        return _pizza.run_pizza(stream)
+    try:
+        if filecount.is_regular_file(path):
+            return filecount.count_file(path)
+        # Then the path is something like a named pipe or device, which
+        # cannot be memory-mapped.
+        with open(path, 'rb') as f:
+            return _pizza.run_pizza(f)
+    except EnvironmentError as err:
+        raise _common.Error("error reading input file: %r\n-->%s" %
+                            (path, err))
+
+
+def _count_files_parallel(paths, jobs):
+    """
+    Return a dict mapping the regular files among paths to their counts.
+
+    """
+    file_paths = [path for path in paths if
+                  path != argparsing.INPUT_PATH_STDIN and
+                  filecount.is_regular_file(path)]
+    if not file_paths:
+        return {}
+    import pizza.parallel as parallel
+    log.debug("counting %d files with %d jobs" % (len(file_paths), jobs))
+    try:
+        counts = parallel.count_files(file_paths, jobs)
+    except EnvironmentError as err:
+        raise _common.Error("error reading input files: %r\n-->%s" %
+                            (file_paths, err))
+    return dict(zip(file_paths, counts))
+
+
+def _open_cache(ns):
+    """
+    Return the ResultCache to use for the command, or None if not caching.
+
+    """
+    if ns.cache_size < 1:
+        raise _parsing.UsageError("%s must be at least 1: %d" %
+                                  (argparsing.OPTION_CACHE_SIZE.display(),
+                                   ns.cache_size))
+    try:
+        import pizza.cache as cache_mod
+    except ImportError as err:
+        # Then Python was probably built without sqlite3.
+        log.debug("result cache unavailable: %s" % err)
+        return None
+    return cache_mod.ResultCache(max_entries=ns.cache_size,
+                                 use_content_hash=ns.cache_hash)
+
+
+def _open_offset_store():
+    """
+    Return the OffsetStore to use for --incremental.
+
+    """
+    try:
+        import pizza.cache as cache_mod
+    except ImportError as err:
+        raise _common.Error("%s requires the sqlite3 module: %s" %
+                            (argparsing.OPTION_INCREMENTAL.display(), err))
+    return cache_mod.OffsetStore()
+
+
+def _count_incremental(store, paths):
+    """
+    Count the given regular files incrementally.
+
+    Returns a pair (counts, scanned) of dicts mapping path to count and to
+    the number of bytes read, respectively.
+
+    """
+    import pizza.incremental as incremental
+    counts = {}
+    scanned_sizes = {}
+    for path in paths:
+        try:
+            count, scanned = incremental.count_file(path, store)
+        except EnvironmentError as err:
+            raise _common.Error("error reading input file: %r\n-->%s" %
+                                (path, err))
+        log.debug("scanned %d new bytes of: %r" % (scanned, path))
+        counts[path] = count
+        scanned_sizes[path] = scanned
+    return counts, scanned_sizes
+
+
+def _get_cached_counts(cache, paths):
+    """
+    Look up the given regular files in the result cache.
+
+    Returns a pair (counts, misses).  The counts value is a dict mapping
+    path to cached count.  The misses value is a dict mapping each other
+    cacheable path to a pair (identity, key) for storing its count later.
+
+    """
+    import pizza.cache as cache_mod
+    counts = {}
+    misses = {}
+    for path in paths:
+        try:
+            identity = cache_mod.file_identity(path)
+            key = cache.make_key(path, identity=identity)
+        except EnvironmentError as err:
+            raise _common.Error("error reading input file: %r\n-->%s" %
+                                (path, err))
+        if key is None:
+            continue
+        count = cache.get(key)
+        if count is None:
+            misses[path] = (identity, key)
+        else:
+            log.debug("using cached count for: %r" % path)
+            counts[path] = count
+    return counts, misses
+
+
+def _store_counts(cache, counts, misses):
+    """
+    Store the counts of the files that missed the result cache.
+
+    """
+    import pizza.cache as cache_mod
+    for path, (identity, key) in misses.items():
+        try:
+            is_changed = cache_mod.file_identity(path) != identity
+        except EnvironmentError:
+            is_changed = True
+        if is_changed:
+            # Then the count may not correspond to the key.
+            log.debug("not caching count of changed file: %r" % path)
+            continue
+        cache.put(key, counts[path])
+
+
+def _record_file_metrics(path, count, size=None):
+    """
+    Record the metrics for a regular file counted without run_pizza().
+
+    Arguments:
+
+      size: the number of bytes read to count the file, or None if the
+        whole file was read.  This is less than the file's size for a
+        cached or incremental count.
+
+    """
+    registry = _pizza.metrics_registry
+    if registry is None:
+        return
+    registry.counter(_pizza.METRIC_RECORDS, "Records counted.").inc(count)
+    if size is None:
+        try:
+            size = os.path.getsize(path)
+        except EnvironmentError:
+            return
+    registry.counter(_pizza.METRIC_BYTES, "Bytes counted.").inc(size)
+
+
+def _count_inputs(paths, jobs=1, cache=None, offset_store=None):
+    """
+    Return the total number of records in the given --input paths.
+
+    Arguments:
+
+      cache: a ResultCache in which to look up and store the counts of
+        regular files, or None to not use a cache.
+      offset_store: an OffsetStore with which to count regular files
+        incrementally, or None to count them in full.  If provided, the
+        cache and jobs arguments do not apply to regular files.
+
+    """
+    file_paths = []
+    for path in set(paths):
+        if (path != argparsing.INPUT_PATH_STDIN and
+            filecount.is_regular_file(path)):
+            file_paths.append(path)
+    misses = {}
+    # Maps path to the number of bytes read to count it, for the files
+    # not read in full.
+    scanned_sizes = {}
+    if offset_store is not None:
+        file_counts, scanned_sizes = _count_incremental(offset_store,
+                                                        file_paths)
+    elif cache is None:
+        file_counts = {}
+    else:
+        file_counts, misses = _get_cached_counts(cache, file_paths)
+        scanned_sizes = dict.fromkeys(file_counts, 0)
+    if jobs > 1:
+        # Inputs that are not regular files are counted serially below.
+        uncounted = [path for path in file_paths if path not in file_counts]
+        file_counts.update(_count_files_parallel(uncounted, jobs))
+    total = 0
+    for path in paths:
+        try:
+            count = file_counts[path]
+        except KeyError:
+            count = _count_input(path)
+            if path in file_paths:
+                file_counts[path] = count
+        if path in file_paths:
+            # Other inputs are counted by run_pizza(), which records its
+            # own metrics.
+            _record_file_metrics(path, count, scanned_sizes.get(path))
+            # A path given more than once is only read once.
+            scanned_sizes[path] = 0
+        log.debug("counted %d records in: %r" % (count, path))
+        total += count
+    if misses:
+        _store_counts(cache, file_counts, misses)
+    return total
+
+
+def _get_sketch_args(ns):
+    """
+    Return the sketch class and keyword arguments to use for the command.
+
+    """
+    import pizza.sketches as sketches
+    if ns.top is not None:
+        if ns.top < 1:
+            raise _parsing.UsageError("%s must be at least 1: %d" %
+                                      (argparsing.OPTION_TOP.display(),
+                                       ns.top))
+        return sketches.SpaceSaving, {'capacity':
+                                      sketches.top_capacity(ns.top)}
+    if not sketches.PRECISION_MIN <= ns.precision <= sketches.PRECISION_MAX:
+        raise _parsing.UsageError("%s must be between %d and %d: %d" %
+                                  (argparsing.OPTION_PRECISION.display(),
+                                   sketches.PRECISION_MIN,
+                                   sketches.PRECISION_MAX, ns.precision))
+    kwargs = {'precision': ns.precision}
+    if ns.exact:
+        kwargs['exact_limit'] = None
+    return sketches.DistinctCounter, kwargs
+
+
+def _sketch_inputs(paths, sketch_class, kwargs, jobs=1):
+    """
+    Return a sketch of the records in the given --input paths.
+
+    """
+    sketch = sketch_class(**kwargs)
+    if jobs > 1:
+        file_paths = [path for path in paths if
+                      path != argparsing.INPUT_PATH_STDIN and
+                      filecount.is_regular_file(path)]
+    else:
+        file_paths = []
+    if file_paths:
+        import pizza.parallel as parallel
+        log.debug("sketching %d files with %d jobs" % (len(file_paths), jobs))
+        try:
+            sketch = parallel.sketch_files(file_paths, jobs, sketch_class,
+                                           **kwargs)
+        except EnvironmentError as err:
+            raise _common.Error("error reading input files: %r\n-->%s" %
+                                (file_paths, err))
+    for path in paths:
+        if path in file_paths:
+            continue
+        if path == argparsing.INPUT_PATH_STDIN:
+            stream = getattr(sys.stdin, 'buffer', sys.stdin)
+            sketch.update(_pizza.iter_records(stream))
+            continue
+        try:
+            with open(path, 'rb') as f:
+                sketch.update(_pizza.iter_records(f))
+        except EnvironmentError as err:
+            raise _common.Error("error reading input file: %r\n-->%s" %
+                                (path, err))
+    return sketch
+
+
+def _write_sketch(ns, sketch, stdout):
+    """
+    Write the result of a --distinct or --top command.
+
+    """
+    if ns.top is None:
+        stdout.write("%s\n" % sketch.count())
+        return
+    for value, count in sketch.top(ns.top):
+        if not isinstance(value, str):
+            # Then value is bytes in Python 3.
+            value = value.decode('utf-8', 'replace')
+        stdout.write("%d\t%s\n" % (count, value))
+
+
+def _show_cache_info(cache, stdout):
+    info = cache.info()
+    stdout.write("""\
+path: %(path)s
+results: %(results)d (max %(max_entries)d)
+offsets: %(offsets)d
+bytes: %(bytes)d
+""" % info)
+
+
+def _serve(socket_path, max_clients, from_source):
+    """
+    Serve requests from pizza-client until interrupted.
+
+    """
+    if socket_path is None:
+        socket_path = client.default_socket_path()
+    if max_clients < 1:
+        raise _parsing.UsageError("%s must be at least 1: %d" %
+                                  (argparsing.OPTION_MAX_CLIENTS.display(),
+                                   max_clients))
+
+    import pizza.general.unixserver as unixserver
+
+    def respond(request):
+        return _handle_request(request, from_source=from_source)
+
+    server = unixserver.JsonServer(socket_path, respond,
+                                   max_clients=max_clients)
+    log.info("serving on: %s (max clients: %d)" % (socket_path, max_clients))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("stopping server")
+    finally:
+        server.server_close()
+
+
+def _is_served(ns):
+    """
+    Return whether a server can run the command for a pizza-client.
+
+    Arguments:
+
+      ns: the Namespace object for the command, or None if the command
+        has a usage error.
+
+    """
+    if ns is None:
+        # The server reports usage errors like any other error.
+        return True
+    # The version info describes the Python running the command, so we
+    # let the client report its own.
+    if ns.run_tests is not None or ns.serve_mode or ns.version_mode:
+        return False
+    # Profiling should measure a normal run, and tracemalloc and metrics
+    # would include every thread of the server.
+    if (ns.profile_path is not None or ns.trace_malloc_path is not None or
+        ns.metrics_path is not None or ns.statsd_address is not None):
+        return False
+    # The server cannot read the client's standard input.
+    return argparsing.INPUT_PATH_STDIN not in (ns.input_paths or [])
+
+
+def _to_native_str(text):
+    """
+    Return text as a native str.
+
+    JSON decodes strings to unicode, which Python 2 would display as
+    u'...' in the log messages of a served command.
+
+    """
+    if isinstance(text, str):
+        return text
+    return text.encode(client.ENCODING)
+
+
+def _resolve_input_paths(paths, cwd):
+    """
+    Return input paths resolved relative to cwd, if cwd is not None.
+
+    """
+    if cwd is None:
+        return paths
+    return [path if path == argparsing.INPUT_PATH_STDIN else
+            os.path.join(cwd, path) for path in paths]
+
+
+def _handle_request(request, from_source):
+    """
+    Return the response object for a request, even if the request is bad.
+
+    """
+    try:
+        return _respond(request, from_source=from_source)
+    except Exception:
+        # Then the request is malformed (e.g. it has no "cwd"), since
+        # _respond() reports the command's own errors in the response.
+        msg = "error handling request: %r\n-->%s" % (request,
+                                                      traceback.format_exc())
+        log.error(msg)
+        return {'status': EXIT_STATUS_FAIL, 'stdout': '', 'stderr': msg}
+
+
+def _respond(request, from_source):
+    """
+    Run a command for a pizza-client and return the response object.
+
+    The response contains the command's exit status and the text it wrote
+    to stdout and stderr.  If the command cannot be run in the server, the
+    response instead tells the client to run it locally.
+
+    """
+    argv = [_to_native_str(arg) for arg in request['argv']]
+    cwd = _to_native_str(request['cwd'])
+    ns = argparsing.preparse_args(argv)
+    if not _is_served(ns):
+        return {'local': True}
+    verbose = ns is not None and ns.verbose
+
+    import StringIO
+    stdout = StringIO.StringIO()
+    stderr = StringIO.StringIO()
+    # Only capture log messages from the thread handling this request.
+    handler = _create_log_handler(stderr, is_verbose=verbose)
+    handler.addFilter(logconfig.ThreadFilter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        status = _call_main_inner(argv, from_source, verbose, ns=ns,
+                                  stdout=stdout, cwd=cwd)
+    finally:
+        root.removeHandler(handler)
+
+    stderr_text = stderr.getvalue()
+    if ns is not None and ns.input_paths:
+        # Show the input paths as given, as in a local run.
+        resolved = _resolve_input_paths(ns.input_paths, cwd)
+        for path, resolved_path in zip(ns.input_paths, resolved):
+            if path != resolved_path:
+                stderr_text = stderr_text.replace(repr(resolved_path),
+                                                  repr(path))
+
+    return {'status': status, 'stdout': stdout.getvalue(),
+            'stderr': stderr_text}
+
+
+def _main_inner(argv, from_source, ns=None, stdout=None, cwd=None):
+    """
+    Run the program.
+
+    Arguments:
+
+      ns: the Namespace object for argv, or None to parse argv.
+      stdout: the stream to which to write results.  Defaults to sys.stdout.
+      cwd: the directory relative to which to resolve input paths.
+        Defaults to the current working directory.
+
+    """
     argv = list(argv)  # since we'll be modifying this.
+    if stdout is None:
+        stdout = sys.stdout
 
     pizza_dir = os.path.dirname(pizza.__file__)
 
     log.debug("argv: %r" % argv)
-    ns = argparsing.parse_args(argv)
-    log.debug("parsed args: %r" % ns)
-    log.debug("cwd: %r" % os.getcwd())
+    if ns is None:
+        ns = argparsing.parse_args(argv)
+    # The Namespace is long, and the argv above has the same information.
+    log.debug("parsed args: %r" % ns, extra=logconfig.EXTRA_UNBUFFERED)
+    log.debug("cwd: %r" % (os.getcwd() if cwd is None else cwd))
 
     if from_source:
         ns.is_dist = True
@@ -147,31 +711,154 @@ def _main_inner(argv, from_source):
     else:
         start_dir = pizza_dir
 
+    if ns.jobs < 1:
+        raise _parsing.UsageError("%s must be at least 1: %d" %
+                                  (argparsing.OPTION_JOBS.display(), ns.jobs))
+    use_sketch = ns.distinct or ns.top is not None
+    if ns.distinct and ns.top is not None:
+        raise _parsing.UsageError("%s cannot be combined with %s" %
+                                  (argparsing.OPTION_DISTINCT.display(),
+                                   argparsing.OPTION_TOP.display()))
+    if ns.incremental and use_sketch:
+        option = (argparsing.OPTION_DISTINCT if ns.distinct else
+                  argparsing.OPTION_TOP)
+        raise _parsing.UsageError("%s cannot be combined with %s" %
+                                  (option.display(),
+                                   argparsing.OPTION_INCREMENTAL.display()))
+
     if ns.run_tests is not None:  # Then the value is a list.
+        if ns.stream and ns.jobs > 1:
+            raise _parsing.UsageError("%s cannot be combined with %s" %
+                                      (argparsing.OPTION_STREAM.display(),
+                                       argparsing.OPTION_JOBS.display()))
+        if ns.stream and ns.failed_first:
+            raise _parsing.UsageError(
+                "%s cannot be combined with %s" %
+                (argparsing.OPTION_STREAM.display(),
+                 argparsing.OPTION_FAILED_FIRST.display()))
+        import pizza.test.harness.main as harness
         test_argv = ([argv[0], 'discover', '--start-directory', start_dir] +
                      ns.run_tests)
-        harness.run_tests(test_argv)
+        project_dir = start_dir if ns.is_sdist else None
+        results_path = None
+        if ns.cached:
+            results_path = harness.get_results_path(project_dir)
+        harness.run_tests(test_argv, jobs=ns.jobs, slowest=ns.slowest,
+                          results_path=results_path,
+                          index_path=harness.get_index_path(project_dir),
+                          stream=ns.stream,
+                          failures_path=harness.get_failures_path(project_dir),
+                          failed_first=ns.failed_first,
+                          exitfirst=ns.exitfirst,
+                          watch_dir=start_dir if ns.watch else None)
+    elif ns.serve_mode:
+        _serve(ns.socket_path, ns.max_clients, from_source)
+    elif ns.help:
+        import pizza.scripts.pizza.helptext as helptext
+        stdout.write(helptext.HELP_TEXT)
+    elif ns.license_mode:
+        stdout.write("%s\n" % argparsing.get_license_string())
+    elif ns.version_mode:
+        stdout.write("%s\n" % argparsing.get_version_string())
+    elif ns.cache_info_mode or ns.cache_clear_mode:
+        cache = _open_cache(ns)
+        if cache is None:
+            raise _common.Error("the result cache requires the sqlite3 module")
+        try:
+            if ns.cache_clear_mode:
+                cache.clear()
+                log.info("cleared result cache: %s" % cache.db_path)
+            else:
+                _show_cache_info(cache, stdout)
+        finally:
+            cache.close()
+    elif ns.input_paths is not None:
+        if ns.args:
+            raise _parsing.UsageError("%s cannot be combined with %s "
+                                      "arguments" %
+                                      (argparsing.OPTION_INPUT.display(),
+                                       argparsing.METAVAR_ARG_VALUE))
+        paths = _resolve_input_paths(ns.input_paths, cwd)
+        if use_sketch:
+            sketch_class, kwargs = _get_sketch_args(ns)
+            sketch = _sketch_inputs(paths, sketch_class, kwargs, jobs=ns.jobs)
+            _write_sketch(ns, sketch, stdout)
+            return
+        cache = _open_cache(ns) if ns.use_cache else None
+        offset_store = _open_offset_store() if ns.incremental else None
+        try:
+            result = _count_inputs(paths, jobs=ns.jobs, cache=cache,
+                                   offset_store=offset_store)
+        finally:
+            for store in (cache, offset_store):
+                if store is not None:
+                    store.close()
+        stdout.write("%s\n" % result)
+    elif use_sketch:
+        sketch_class, kwargs = _get_sketch_args(ns)
+        sketch = sketch_class(**kwargs)
+        sketch.update(ns.args)
+        _write_sketch(ns, sketch, stdout)
     else:
         values = ns.args
         result = _pizza.run_pizza(values)
-        print(result)
+        stdout.write("%s\n" % result)
 
 
-def _main(argv=None, from_source=False):
-    if argv is None:
-        argv = sys.argv
+def _call_profiled(func, ns):
+    """
+    Call func, profiling it as requested by the command-line options.
+
+    Arguments:
+
+      ns: the Namespace object for the command, or None.
+
+    """
+    if ns is None:
+        return func()
+    if ns.profile_path is None and ns.trace_malloc_path is None:
+        return func()
+    import functools
+    import pizza.general.profiling as profiling
+    if ns.trace_malloc_path is not None:
+        func = functools.partial(profiling.call_with_trace_malloc, func, log,
+                                 path=ns.trace_malloc_path)
+    if ns.profile_path is not None:
+        func = functools.partial(profiling.call_with_profile, func, log,
+                                 path=ns.profile_path)
+    return func()
+
+
+def _call_main_inner(argv, from_source, verbose, ns=None, stdout=None,
+                     cwd=None, dump_log=False):
+    """
+    Call _main_inner(), log any error, and return the exit status.
+
+    Arguments:
+
+      dump_log: whether to call dump_log_buffer() before logging an error.
+        This should be false when handling a request in a server, since
+        the buffer holds the server's messages.
+
+    """
+    def run():
+        try:
+            _main_inner(argv, from_source, ns=ns, stdout=stdout, cwd=cwd)
+        except Exception:
+            if dump_log:
+                dump_log_buffer()
+            raise
 
-    verbose = configure_logging(argv, stream=sys.stderr)
     # XXX: also handle KeyboardInterrupt?
     try:
-        _main_inner(argv, from_source)
+        _call_profiled(run, ns)
         status = EXIT_STATUS_SUCCESS
     except _parsing.UsageError as err:
         details = """\
 Usage error: %s
 -->argv: %r
 Pass %s for help documentation and available options.""" % (
-            err, sys.argv, argparsing.OPTION_HELP.display(' or '))
+            err, argv, argparsing.OPTION_MODE_HELP.display(' or '))
         error(details, verbose)
         status = EXIT_STATUS_USAGE_ERROR
     except _common.Error, err:
@@ -189,6 +876,68 @@ Pass %s for the stack trace.""" % (err,
     return status
 
 
+def _main(argv=None, from_source=False):
+    if argv is None:
+        argv = sys.argv
+
+    start = metrics.timer()
+    # We parse the arguments only once, before configuring logging.  If
+    # there is a usage error, _main_inner() parses again to raise it.
+    ns = argparsing.preparse_args(argv)
+    parse_seconds = metrics.timer() - start
+    verbose = configure_logging(ns, stream=sys.stderr)
+    try:
+        return _run_main(argv, from_source, verbose, ns, start, parse_seconds)
+    finally:
+        stop_log_thread()
+
+
+def _run_main(argv, from_source, verbose, ns, start, parse_seconds):
+    """
+    Call _main_inner(), recording metrics if requested.
+
+    """
+    if ns is None or (ns.metrics_path is None and ns.statsd_address is None):
+        return _call_main_inner(argv, from_source, verbose, ns=ns,
+                                dump_log=True)
+
+    registry = metrics.Registry()
+    _pizza.metrics_registry = registry
+    try:
+        count_start = metrics.timer()
+        status = _call_main_inner(argv, from_source, verbose, ns=ns,
+                                  dump_log=True)
+        count_seconds = metrics.timer() - count_start
+    finally:
+        _pizza.metrics_registry = None
+    for name, help, seconds in (
+        (METRIC_PARSE_SECONDS, "Time spent parsing arguments.", parse_seconds),
+        (METRIC_COUNT_SECONDS, "Time spent running the command.",
+         count_seconds),
+        (METRIC_WALL_SECONDS, "Total time.", metrics.timer() - start)):
+        registry.histogram(name, help).observe(seconds)
+    _export_metrics(registry, ns.metrics_path, ns.statsd_address)
+    return status
+
+
+def _export_metrics(registry, path, statsd_address):
+    """
+    Write or send the metrics, logging rather than raising any error.
+
+    """
+    if path is not None:
+        try:
+            registry.write_textfile(path)
+        except EnvironmentError as err:
+            log.error("error writing metrics file: %r\n-->%s" % (path, err))
+    if statsd_address is not None:
+        try:
+            registry.send_statsd(statsd_address)
+        except (EnvironmentError, ValueError) as err:
+            log.error("error sending metrics to statsd: %r\n-->%s" %
+                      (statsd_address, err))
+
+
 # We follow most of Guido van Rossum's 2003 advice regarding main()
 # functions (though we choose _main() as the function that returns an exit
 # status rather than main()):
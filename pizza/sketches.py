@@ -0,0 +1,356 @@
+# encoding: utf-8
+
+"""
+Supports summarizing many values in bounded memory ("sketches").
+
+Every sketch has an update() method to add values and a merge() method to
+combine it with a sketch of the same kind built from other values (e.g. in
+another process or on another shard of the input).  Merging gives the same
+result as adding all of the values to one sketch.  Sketches can be pickled.
+
+Values can be bytes or text.  Text is encoded as UTF-8, so a text value
+and its UTF-8 encoding count as the same value.
+
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import heapq
+import math
+import struct
+
+import pizza.general.common as common
+
+PRECISION_DEFAULT = 12
+PRECISION_MIN = 4
+PRECISION_MAX = 16
+
+# The number of distinct values a DistinctCounter counts exactly by default
+# before switching to a HyperLogLog sketch.
+EXACT_LIMIT_DEFAULT = 1024
+
+# The number of values a SpaceSaving sketch tracks per value requested by
+# the --top option.  Tracking more values than are reported makes the
+# reported counts more accurate.
+TOP_CAPACITY_FACTOR = 10
+TOP_CAPACITY_MIN = 100
+
+_HASH_BITS = 64
+
+
+def _to_bytes(value):
+    if isinstance(value, common.TEXT_TYPE):
+        return value.encode('utf-8')
+    return value
+
+
+def hash64(value):
+    """
+    Return a 64-bit hash of a value that is the same in every process.
+
+    Python's built-in hash() cannot be used for this because it is
+    randomized per process for strings in Python 3.
+
+    """
+    digest = hashlib.sha1(_to_bytes(value)).digest()
+    return struct.unpack('>Q', digest[:8])[0]
+
+
+def _check_precision(precision):
+    if not PRECISION_MIN <= precision <= PRECISION_MAX:
+        raise ValueError("precision must be between %d and %d: %r" %
+                         (PRECISION_MIN, PRECISION_MAX, precision))
+
+
+def _alpha(register_count):
+    """
+    Return the HyperLogLog bias correction constant.
+
+    """
+    return {16: 0.673, 32: 0.697, 64: 0.709}.get(
+        register_count, 0.7213 / (1 + 1.079 / register_count))
+
+
+class HyperLogLog(object):
+
+    """
+    Estimates the number of distinct values using a HyperLogLog sketch.
+
+    The sketch uses 2 ** precision bytes regardless of the number of values
+    added, and its estimates have a relative standard error of about
+    1.04 / sqrt(2 ** precision) (e.g. 1.6% for the default precision of 12,
+    which uses 4 KiB).
+
+    """
+
+    def __init__(self, precision=None):
+        if precision is None:
+            precision = PRECISION_DEFAULT
+        _check_precision(precision)
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def add_hash(self, value_hash):
+        """
+        Add a value given its hash64().
+
+        """
+        # The first bits choose a register, and the register keeps the
+        # largest position of the first 1 bit seen among the remaining bits.
+        rest_bits = _HASH_BITS - self.precision
+        index = value_hash >> rest_bits
+        rest = value_hash & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        add_hash = self.add_hash
+        for value in values:
+            add_hash(hash64(value))
+
+    def merge(self, other):
+        """
+        Add the values summarized by another HyperLogLog of equal precision.
+
+        """
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of precision %d and %d" %
+                             (self.precision, other.precision))
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """
+        Return the estimated number of distinct values.
+
+        """
+        registers = self.registers
+        register_count = len(registers)
+        total = sum(math.ldexp(1.0, -rank) for rank in registers)
+        estimate = _alpha(register_count) * register_count ** 2 / total
+        zero_count = registers.count(b'\x00')
+        if estimate <= 2.5 * register_count and zero_count:
+            # Then use linear counting, which is more accurate for small
+            # numbers of values.
+            estimate = register_count * math.log(float(register_count) /
+                                                 zero_count)
+        return int(round(estimate))
+
+
+class DistinctCounter(object):
+
+    """
+    Counts distinct values, exactly at first and then approximately.
+
+    Up to exact_limit distinct values are counted exactly by keeping a set
+    of their hashes.  Beyond that, the hashes are moved into a HyperLogLog
+    sketch, so memory use stops growing.
+
+    """
+
+    def __init__(self, precision=None, exact_limit=EXACT_LIMIT_DEFAULT):
+        """
+        Arguments:
+
+          precision: the precision of the HyperLogLog sketch.
+          exact_limit: the most distinct values to count exactly, or None
+            to always count exactly (with memory proportional to the
+            number of distinct values).
+
+        """
+        if precision is None:
+            precision = PRECISION_DEFAULT
+        _check_precision(precision)
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self.hashes = set()
+        # The HyperLogLog sketch, once the exact limit is exceeded.
+        self.sketch = None
+
+    def is_exact(self):
+        return self.sketch is None
+
+    def _to_sketch(self):
+        """
+        Move the hashes counted so far into a HyperLogLog sketch.
+
+        """
+        self.sketch = HyperLogLog(self.precision)
+        add_hash = self.sketch.add_hash
+        for value_hash in self.hashes:
+            add_hash(value_hash)
+        self.hashes = None
+
+    def _is_over_limit(self):
+        return (self.exact_limit is not None and
+                len(self.hashes) > self.exact_limit)
+
+    def update(self, values):
+        values = iter(values)
+        if self.sketch is None:
+            hashes = self.hashes
+            add = hashes.add
+            limit = self.exact_limit
+            for value in values:
+                add(hash64(value))
+                if limit is not None and len(hashes) > limit:
+                    self._to_sketch()
+                    break
+            else:
+                return
+        # Add the remaining values to the sketch.
+        self.sketch.update(values)
+
+    def merge(self, other):
+        """
+        Add the values summarized by another DistinctCounter.
+
+        """
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of precision %d and %d" %
+                             (self.precision, other.precision))
+        if self.sketch is None and other.sketch is None:
+            self.hashes.update(other.hashes)
+            if self._is_over_limit():
+                self._to_sketch()
+            return
+        if self.sketch is None:
+            self._to_sketch()
+        if other.sketch is None:
+            add_hash = self.sketch.add_hash
+            for value_hash in other.hashes:
+                add_hash(value_hash)
+        else:
+            self.sketch.merge(other.sketch)
+
+    def count(self):
+        """
+        Return the (possibly estimated) number of distinct values.
+
+        """
+        if self.sketch is None:
+            return len(self.hashes)
+        return self.sketch.count()
+
+
+class SpaceSaving(object):
+
+    """
+    Estimates the most frequent values using the Space-Saving algorithm.
+
+    The sketch tracks at most capacity values.  When a new value arrives
+    and the sketch is full, the value with the smallest count is replaced,
+    and the new value inherits that count plus one.  Counts can therefore
+    be overestimated but never underestimated, and any value occurring
+    more than N / capacity times among N values is tracked.  The amount of
+    overestimation of each count is bounded by its error().
+
+    Tracked values are stored as bytes (see _to_bytes()).
+
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1: %r" % capacity)
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # A heap of (count, value) pairs with one pair per tracked value.
+        # A pair's count can be lower than the value's current count, since
+        # counts are incremented without updating the heap.
+        self._heap = []
+
+    def _pop_min(self):
+        """
+        Remove the value with the smallest count, and return (count, value).
+
+        """
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, value = heap[0]
+            current = counts[value]
+            if current == count:
+                heapq.heappop(heap)
+                del counts[value]
+                del self.errors[value]
+                return count, value
+            heapq.heapreplace(heap, (current, value))
+
+    def update(self, values):
+        counts = self.counts
+        errors = self.errors
+        heap = self._heap
+        capacity = self.capacity
+        for value in values:
+            value = _to_bytes(value)
+            if value in counts:
+                counts[value] += 1
+                continue
+            if len(counts) < capacity:
+                count = 1
+                error = 0
+            else:
+                error = self._pop_min()[0]
+                count = error + 1
+            counts[value] = count
+            errors[value] = error
+            heapq.heappush(heap, (count, value))
+
+    def _min_count(self):
+        """
+        Return the count that any untracked value may have.
+
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """
+        Add the values summarized by another SpaceSaving sketch.
+
+        The merged sketch has this sketch's capacity.
+
+        """
+        min_count = self._min_count()
+        other_min_count = other._min_count()
+        counts = {}
+        errors = {}
+        for value in set(self.counts) | set(other.counts):
+            counts[value] = (self.counts.get(value, min_count) +
+                             other.counts.get(value, other_min_count))
+            errors[value] = (self.errors.get(value, min_count) +
+                             other.errors.get(value, other_min_count))
+        kept = heapq.nlargest(self.capacity, counts, key=counts.get)
+        self.counts = dict((value, counts[value]) for value in kept)
+        self.errors = dict((value, errors[value]) for value in kept)
+        self._heap = [(count, value) for value, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def error(self, value):
+        """
+        Return the most by which the count of a tracked value may be high.
+
+        """
+        return self.errors[_to_bytes(value)]
+
+    def top(self, count):
+        """
+        Return a list of the most frequent values as (value, count) pairs.
+
+        The list is sorted by decreasing count and then by value.
+
+        """
+        items = sorted(self.counts.items(), key=lambda item: (-item[1],
+                                                              item[0]))
+        return items[:count]
+
+
+def top_capacity(count):
+    """
+    Return the SpaceSaving capacity to use to report count values.
+
+    """
+    return max(count * TOP_CAPACITY_FACTOR, TOP_CAPACITY_MIN)
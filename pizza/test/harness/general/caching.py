@@ -0,0 +1,292 @@
+# encoding: utf-8
+
+"""
+Supports skipping tests that passed last time and whose code is unchanged,
+and running tests that failed last time first.
+
+A test's "hash" is a hash of the source of its module and of the modules
+it imports from given packages, recursively.  Imports are found by parsing
+the source, so imports inside functions count too.  The hashes of the tests
+that passed are kept in a JSON file, and a later run can skip the tests
+whose hash is unchanged.
+
+The hash does not cover code that a test runs in a child process (e.g.
+the console script), nor data files that it reads.  A test module whose
+tests depend on such things can set a module-level never_cached = True
+(see NEVER_CACHED_NAME), so that its tests are always run.
+
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import sys
+
+
+log = logging.getLogger(__name__)
+
+# The name of the module-level variable that, if true, makes a test
+# module's tests run even if they passed last time.
+NEVER_CACHED_NAME = 'never_cached'
+
+
+def read_dict(path, description):
+    """
+    Return the dict in a JSON file, or an empty dict if none.
+
+    Arguments:
+
+      description: what the file contains, for logging if unreadable.
+
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except IOError:
+        # Then the file does not exist yet.
+        return {}
+    except ValueError as err:
+        log.warning("ignoring unreadable %s: %r\n-->%s" %
+                    (description, path, err))
+        return {}
+    if not isinstance(data, dict):
+        log.warning("ignoring unreadable %s: %r" % (description, path))
+        return {}
+    return data
+
+
+def write_dict(path, data):
+    """
+    Write a dict to a JSON file, creating its directory if necessary.
+
+    """
+    dir_path = os.path.dirname(path)
+    if dir_path and not os.path.isdir(dir_path):
+        os.makedirs(dir_path)
+    # Write atomically, so a parallel or interrupted run cannot leave a
+    # partially written file.
+    temp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=0, sort_keys=True)
+    os.rename(temp_path, path)
+
+
+def _get_source_path(module):
+    path = getattr(module, '__file__', None)
+    if path is None:
+        return None
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return path if os.path.exists(path) else None
+
+
+def _find_source_path(name):
+    """
+    Return the path of the source of a module not yet imported, or None.
+
+    """
+    parts = name.split('.')
+    for dir_path in sys.path:
+        base_path = os.path.join(dir_path or os.curdir, *parts)
+        for path in (base_path + '.py',
+                     os.path.join(base_path, '__init__.py')):
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _find_imported_names(source):
+    """
+    Return the set of absolute module names that source may import.
+
+    For "from package import name", both the package and package.name are
+    included, since name may be a module or an attribute.
+
+    """
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level:
+            names.add(node.module)
+            names.update("%s.%s" % (node.module, alias.name) for alias in
+                         node.names)
+    return names
+
+
+class ModuleHasher(object):
+
+    """
+    Computes hashes of modules together with the modules they import.
+
+    The source of a module is found from sys.modules if it was imported,
+    and otherwise by searching sys.path.
+
+    """
+
+    def __init__(self, package_names):
+        """
+        Arguments:
+
+          package_names: the names of the top-level packages whose modules
+            to follow (e.g. ['pizza']).
+
+        """
+        self.package_names = set(package_names)
+        # Maps module name to (digest of source, set of imported names).
+        self._infos = {}
+        self._hashes = {}
+
+    def _is_followed(self, name):
+        return name.split('.')[0] in self.package_names
+
+    def _get_info(self, name):
+        try:
+            return self._infos[name]
+        except KeyError:
+            pass
+        info = None
+        module = sys.modules.get(name)
+        if module is None:
+            path = _find_source_path(name)
+        else:
+            path = _get_source_path(module)
+        if path is not None:
+            with open(path, 'rb') as f:
+                source = f.read()
+            try:
+                imported = _find_imported_names(source)
+            except SyntaxError:
+                imported = set()
+            info = (hashlib.sha1(source).hexdigest(),
+                    set(imported_name for imported_name in imported if
+                        self._is_followed(imported_name)))
+        self._infos[name] = info
+        return info
+
+    def get_closure(self, name):
+        """
+        Return the set of names of the modules that a module imports.
+
+        The set includes the module itself.
+
+        """
+        closure = set()
+        stack = [name]
+        while stack:
+            module_name = stack.pop()
+            if module_name in closure:
+                continue
+            info = self._get_info(module_name)
+            if info is None:
+                continue
+            closure.add(module_name)
+            stack.extend(info[1])
+        return closure
+
+    def hash_module(self, name):
+        """
+        Return a hash of a module and the modules it imports, or None.
+
+        Returns None if the module's source cannot be found.
+
+        """
+        try:
+            return self._hashes[name]
+        except KeyError:
+            pass
+        module_hash = None
+        closure = self.get_closure(name)
+        if name in closure:
+            digest = hashlib.sha1()
+            for module_name in sorted(closure):
+                digest.update(("%s %s\n" % (module_name,
+                                            self._infos[module_name][0]))
+                              .encode('utf-8'))
+            module_hash = digest.hexdigest()
+        self._hashes[name] = module_hash
+        return module_hash
+
+    def hash_test(self, test):
+        """
+        Return the hash of a test, or None if its module is never cached.
+
+        """
+        name = test.__class__.__module__
+        if getattr(sys.modules.get(name), NEVER_CACHED_NAME, False):
+            return None
+        return self.hash_module(name)
+
+
+def get_failed_ids(result):
+    """
+    Return the set of ids of the tests that did not pass in a result.
+
+    The ids include those of failed subtests and fixtures (e.g.
+    "test_foo (i=1)" or "setUpClass (module.Class)").
+
+    """
+    tests = [test for test, text in result.failures + result.errors +
+             result.skipped]
+    tests.extend(result.unexpectedSuccesses)
+    return set(test.id() for test in tests)
+
+
+def get_passed_ids(run_ids, failed_ids):
+    """
+    Return the ids in run_ids of the tests that passed.
+
+    A test did not pass if its id or that of one of its subtests is in
+    failed_ids.
+
+    """
+    # A subtest id is the test id followed by a space and parameters.
+    failed_test_ids = set(test_id.split(' ')[0] for test_id in failed_ids)
+    return set(test_id for test_id in run_ids if
+               test_id not in failed_test_ids)
+
+
+def update_failed_ids(failed_ids, result):
+    """
+    Return the ids of the failing tests after a run, as a set.
+
+    A test is failing if it failed in the run, or if it was not run and
+    its id is in failed_ids.  Errors in fixtures are left out, since their
+    ids are not those of tests.
+
+    Arguments:
+
+      failed_ids: the ids of the tests failing before the run.
+      result: a result with a durations attribute (see
+        timing.TimingMixin).
+
+    """
+    run_ids = result.durations
+    tests = [test for test, text in result.failures + result.errors]
+    tests.extend(result.unexpectedSuccesses)
+    # A subtest id is the test id followed by a space and parameters.
+    new_ids = set(test.id().split(' ')[0] for test in tests)
+    new_ids.intersection_update(run_ids)
+    new_ids.update(test_id for test_id in failed_ids if
+                   test_id not in run_ids)
+    return new_ids
+
+
+def put_failed_first(groups, failed_ids):
+    """
+    Move the groups of tests with an id in failed_ids first.
+
+    Groups rather than tests are moved, so module fixtures still run once
+    per group.  Returns (groups, number of groups moved).
+
+    """
+    failed_groups = []
+    other_groups = []
+    for group in groups:
+        if any(test.id() in failed_ids for test in group):
+            failed_groups.append(group)
+        else:
+            other_groups.append(group)
+    return failed_groups + other_groups, len(failed_groups)
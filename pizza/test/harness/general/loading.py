@@ -5,8 +5,19 @@ Exposes a config_load_test() function and TestLoader subclass.
 
 """
 
+import fnmatch
+import logging
+import os
+import sys
+import traceback
 import unittest
 
+import pizza.test.harness.general.caching as caching
+
+
+log = logging.getLogger(__name__)
+
+
 def _test_gen(tests):
     """
     Return a generator over all TestCase instances recursively in tests.
@@ -28,13 +39,19 @@ def _test_gen(tests):
         TestCase and TestSuite instances.
 
     """
-    if isinstance(tests, unittest.TestCase):
-        yield tests
-        return
-    # Otherwise, we have an iterable or a TestSuite instance.
-    for test in tests:
-        for test2 in _test_gen(test):
-            yield test2
+    # We use a stack of iterators rather than recursive generators, so the
+    # cost per test does not grow with the depth of nesting.
+    stack = [iter([tests])]
+    while stack:
+        for test in stack[-1]:
+            if isinstance(test, unittest.TestCase):
+                yield test
+            else:
+                # Then we have an iterable or a TestSuite instance.
+                stack.append(iter(test))
+                break
+        else:
+            stack.pop()
 
 def config_load_tests(loader, tests, pattern):
     """
@@ -79,12 +96,82 @@ def config_load_tests(loader, tests, pattern):
 
     return unittest.TestSuite(tests)
 
+class StreamingSuite(unittest.TestSuite):
+
+    """
+    A TestSuite that takes its tests from an iterator as it runs them.
+
+    This lets tests run while later tests are still being loaded, and lets
+    the tests that have run be freed.  The suite can be iterated (and so
+    run) only once.
+
+    """
+
+    def __init__(self, tests=()):
+        super(StreamingSuite, self).__init__()
+        self._iterator = iter(tests)
+
+    def __iter__(self):
+        return self._iterator
+
+    def addTest(self, test):
+        raise TypeError("cannot add tests to a StreamingSuite")
+
+    # Python 3.4 and later call this to free each test after running it.
+    def _removeTestAtIndex(self, index):
+        pass
+
+
+def _make_failed_import_test(name):
+    """
+    Return a suite with a test that fails with the current import error.
+
+    """
+    message = 'Failed to import test module: %s\n%s' % (
+        name, traceback.format_exc())
+
+    def test_import(self):
+        raise ImportError(message)
+
+    test_class = type(str('ModuleImportFailure'), (unittest.TestCase, ),
+                      {str(name): test_import, '__module__': str(name)})
+    return unittest.TestSuite([test_class(str(name))])
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _get_package_dirs(start_dir):
+    """
+    Return a dict mapping the directories discovery searches to mtime.
+
+    """
+    dirs = {}
+    for dir_path, dir_names, file_names in os.walk(start_dir):
+        dirs[dir_path] = _get_mtime(dir_path)
+        # Discovery only searches packages.
+        dir_names[:] = [name for name in dir_names if os.path.isfile(
+                        os.path.join(dir_path, name, '__init__.py'))]
+    return dirs
+
+
+def _get_module_path(module):
+    path = getattr(module, '__file__', None)
+    if path is not None and path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return path
+
+
 class TestLoader(unittest.TestLoader):
 
     """
     This TestLoader differs from unittest's default TestLoader by providing
     additional diagnostic information when an AttributeError occurs while
-    loading a module.
+    loading a module.  It can also keep a discovery index (see below).
 
     Because of Python issue 7559 ( http://bugs.python.org/issue7559# ),
     the unittest module masks ImportErrors and the name of the offending
@@ -92,8 +179,33 @@ class TestLoader(unittest.TestLoader):
     along with a reminder that the AttributeError may be masking an
     ImportError.
 
+    If index_path is set, discover() keeps an index of the test modules it
+    finds, with their mtimes and test ids.  As long as the mtimes of the
+    searched directories are unchanged (so no files were added or removed),
+    later calls load the indexed modules directly instead of searching the
+    file system.  If is_skipped is also set, the indexed modules that have
+    not changed and for which is_skipped(module_name, test_ids) is true are
+    not even imported, and their test ids are added to skipped_ids.
+
+    Discovery is not indexed if a package defines load_tests() or if a
+    module's tests are defined in another module.
+
+    If is_streaming is true, discover() returns a suite containing a
+    StreamingSuite, which loads each test module only when the tests reach
+    it.
+
     """
 
+    index_path = None
+    is_skipped = None
+    is_streaming = False
+
+    def __init__(self):
+        super(TestLoader, self).__init__()
+        self.skipped_ids = []
+        # Whether _find_tests() is searching the file system.
+        self._is_searching = False
+
     def loadTestsFromNames(self, names, module=None):
         """
         Return a suite of all unit tests and doctests in the package.
@@ -117,3 +229,140 @@ an ImportError in the module being processed.
             suites.append(suite)
 
         return self.suiteClass(suites)
+
+    def _find_tests(self, start_dir, pattern, *args, **kwargs):
+        """
+        Return the test suites for discover() to combine.
+
+        This overrides a private unittest method called by discover().
+
+        """
+        find = super(TestLoader, self)._find_tests
+        if self._is_searching:
+            return find(start_dir, pattern, *args, **kwargs)
+        suites = self._iter_suites(
+            start_dir, pattern,
+            lambda: find(start_dir, pattern, *args, **kwargs))
+        if self.is_streaming:
+            return [StreamingSuite(suites)]
+        return list(suites)
+
+    def _search(self, search):
+        """
+        Yield the test suites found by searching the file system.
+
+        """
+        self._is_searching = True
+        try:
+            for suite in search():
+                yield suite
+        finally:
+            self._is_searching = False
+
+    def _iter_suites(self, start_dir, pattern, search):
+        """
+        Yield the test suites found, using and updating any index.
+
+        Arguments:
+
+          search: a function returning an iterator over the test suites
+            found by searching the file system.
+
+        """
+        if self.index_path is None:
+            for suite in self._search(search):
+                yield suite
+            return
+
+        key = "%s %s %s" % (start_dir, self._top_level_dir, pattern)
+        index = caching.read_dict(self.index_path, "test discovery index")
+        entry = index.get(key)
+        # The info of each module found, in order.
+        modules = []
+        if entry is not None and self._is_current(entry):
+            dirs = entry['dirs']
+            suites = self._iter_indexed(entry, modules)
+        else:
+            dirs = None
+            suites = self._search(search)
+
+        is_valid = True
+        for suite in suites:
+            module_info = self._get_module_info(suite, start_dir, pattern)
+            if module_info is False:
+                is_valid = False
+            elif module_info is not None:
+                modules.append(module_info)
+            yield suite
+
+        if not is_valid:
+            index.pop(key, None)
+        else:
+            if dirs is None:
+                dirs = _get_package_dirs(start_dir)
+            index[key] = {'dirs': dirs, 'modules': modules}
+        try:
+            caching.write_dict(self.index_path, index)
+        except EnvironmentError as err:
+            log.warning("error writing test discovery index: %r\n-->%s" %
+                        (self.index_path, err))
+
+    def _is_current(self, entry):
+        """
+        Return whether the searched directories are unchanged.
+
+        """
+        for dir_path, mtime in entry['dirs'].items():
+            if _get_mtime(dir_path) != mtime:
+                return False
+        return True
+
+    def _get_module_info(self, suite, start_dir, pattern):
+        """
+        Return the index info for a module's suite.
+
+        Returns None if the suite is empty, and False if the suite cannot be
+        indexed.
+
+        """
+        tests = list(_test_gen(suite))
+        if not tests:
+            return None
+        names = set(test.__class__.__module__ for test in tests)
+        if len(names) != 1:
+            return False
+        name = names.pop()
+        module = sys.modules.get(name)
+        path = _get_module_path(module)
+        # Check that the tests come from a test module in start_dir (rather
+        # than, e.g., a package's load_tests() or a failed import).
+        if (path is None or
+            not fnmatch.fnmatch(os.path.basename(path), pattern) or
+            not os.path.abspath(path).startswith(start_dir)):
+            return False
+        return [name, path, _get_mtime(path), [test.id() for test in tests]]
+
+    def _iter_indexed(self, entry, modules):
+        """
+        Yield the test suites of the modules in an index entry.
+
+        Arguments:
+
+          modules: a list to which to add the info of the modules skipped
+            (see is_skipped).
+
+        """
+        for module_info in entry['modules']:
+            name, path, mtime, test_ids = module_info
+            is_changed = _get_mtime(path) != mtime
+            if (not is_changed and self.is_skipped is not None and
+                self.is_skipped(name, test_ids)):
+                self.skipped_ids.extend(test_ids)
+                modules.append(module_info)
+                continue
+            try:
+                __import__(name)
+            except Exception:
+                yield _make_failed_import_test(name)
+                continue
+            yield self.loadTestsFromModule(sys.modules[name])
@@ -0,0 +1,379 @@
+# encoding: utf-8
+
+"""
+Exposes a TestRunner subclass that runs tests in worker processes.
+
+The tests are flattened into TestCase instances and grouped by module.
+Each module's tests run together in one worker process, so module and
+class fixtures (e.g. setUpClass()) run once per module as usual.  Each
+worker reports its outcomes as text, and the parent process replays them
+into a single result, so the report looks like that of a serial run.
+
+Workers are forked (where possible) so they share the already loaded
+tests rather than loading them again.  They are not daemonic processes
+(unlike those of a multiprocessing.Pool), so tests can start processes of
+their own.  Given a sandbox pool, each worker gets its own sandbox
+directory, so workers do not write to the same temporary files.
+
+"""
+
+import copy
+import multiprocessing
+import Queue
+import time
+import unittest
+
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+import pizza.test.harness.general.timing as timing
+
+# The kinds of test outcomes a worker reports.
+OUTCOME_ERROR = 'error'
+OUTCOME_EXPECTED_FAILURE = 'expected_failure'
+OUTCOME_FAILURE = 'failure'
+OUTCOME_SKIP = 'skip'
+OUTCOME_SUCCESS = 'success'
+OUTCOME_UNEXPECTED_SUCCESS = 'unexpected_success'
+
+# How often, in seconds, to check that the workers are still running while
+# waiting for a result.
+POLL_INTERVAL = 1
+
+# The groups of tests to run, set in the parent process before forking.
+_groups = None
+
+
+def group_tests(tests):
+    """
+    Return a list of lists of the TestCase instances in tests, by module.
+
+    The groups and the tests in each group keep the order of tests.
+
+    """
+    groups = []
+    indices = {}
+    for test in loading._test_gen(tests):
+        module = test.__class__.__module__
+        try:
+            index = indices[module]
+        except KeyError:
+            index = len(groups)
+            indices[module] = index
+            groups.append([])
+        groups[index].append(test)
+    return groups
+
+
+class _TestHolder(object):
+
+    """
+    Stands in for a test that a worker reports but the parent cannot find.
+
+    This is the case for errors in module and class fixtures, for example.
+
+    """
+
+    def __init__(self, test_id, description):
+        self.test_id = test_id
+        self.description = description
+
+    def id(self):
+        return self.test_id
+
+    def shortDescription(self):
+        return None
+
+    def __str__(self):
+        return self.description
+
+
+class _RecordingResult(sandbox.CleaningMixin, timing.TimingMixin,
+                       unittest.TestResult):
+
+    """
+    A test result that records outcomes as picklable tuples.
+
+    Each outcome is an (index, test_id, description, kind, text) tuple,
+    where index is the position of the test in its group (or None if not in
+    the group), and text is a formatted traceback or skip reason.
+
+    """
+
+    def __init__(self, group):
+        super(_RecordingResult, self).__init__()
+        self.indices = dict((id(test), index) for index, test in
+                            enumerate(group))
+        self.outcomes = []
+
+    def _record(self, test, kind, text=None):
+        self.outcomes.append((self.indices.get(id(test)), test.id(),
+                              str(test), kind, text))
+
+    def _format(self, err, test):
+        return self._exc_info_to_string(err, test)
+
+    def addError(self, test, err):
+        super(_RecordingResult, self).addError(test, err)
+        self._record(test, OUTCOME_ERROR, self._format(err, test))
+
+    def addFailure(self, test, err):
+        super(_RecordingResult, self).addFailure(test, err)
+        self._record(test, OUTCOME_FAILURE, self._format(err, test))
+
+    def addSuccess(self, test):
+        self._record(test, OUTCOME_SUCCESS)
+
+    def addSkip(self, test, reason):
+        super(_RecordingResult, self).addSkip(test, reason)
+        self._record(test, OUTCOME_SKIP, reason)
+
+    def addExpectedFailure(self, test, err):
+        super(_RecordingResult, self).addExpectedFailure(test, err)
+        self._record(test, OUTCOME_EXPECTED_FAILURE, self._format(err, test))
+
+    def addUnexpectedSuccess(self, test):
+        super(_RecordingResult, self).addUnexpectedSuccess(test)
+        self._record(test, OUTCOME_UNEXPECTED_SUCCESS)
+
+    # This is called only in Python 3.4 and later.
+    def addSubTest(self, test, subtest, err):
+        if err is None:
+            return
+        kind = (OUTCOME_FAILURE if issubclass(err[0], test.failureException)
+                else OUTCOME_ERROR)
+        self.outcomes.append((None, subtest.id(), str(subtest), kind,
+                              self._format(err, test)))
+
+
+def _run_group(group, test_config):
+    """
+    Run a group of tests, and return (tests_run, outcomes, durations).
+
+    """
+    for test in group:
+        # Pass test_config along to the tests that use it (see
+        # loading.config_load_tests()).
+        if hasattr(test, 'test_config'):
+            test.test_config = test_config
+    result = _RecordingResult(group)
+    unittest.TestSuite(group)(result)
+    return result.testsRun, result.outcomes, result.durations
+
+
+def _work(groups, test_config, tasks, results):
+    """
+    Run groups of tests from a task queue until getting None.
+
+    Arguments:
+
+      groups: the list of groups, or None to use the forked _groups.
+      tasks: a queue of indices into groups.
+      results: a queue on which to put the index and return value of
+        _run_group() for each group.
+
+    """
+    if groups is None:
+        groups = _groups
+    for index in iter(tasks.get, None):
+        results.put((index, ) + _run_group(groups[index], test_config))
+
+
+class _ReplayResult(unittest.TextTestResult):
+
+    """
+    A TextTestResult that accepts formatted tracebacks in place of exc_info.
+
+    The durations attribute is as for timing.TimingMixin, but is filled in
+    from the workers' durations.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_ReplayResult, self).__init__(*args, **kwargs)
+        self.durations = {}
+
+    def _exc_info_to_string(self, err, test):
+        return err
+
+
+def _get_context():
+    """
+    Return (context, is_forked) for creating worker processes.
+
+    """
+    try:
+        return multiprocessing.get_context('fork'), True
+    except AttributeError:
+        # Then the Python version is earlier than 3.4, where fork is the
+        # only start method on Unix.
+        return multiprocessing, True
+    except ValueError:
+        # Then the platform cannot fork.
+        return multiprocessing.get_context(), False
+
+
+class ParallelTestRunner(unittest.TextTestRunner):
+
+    """
+    A TextTestRunner that runs tests in a pool of worker processes.
+
+    """
+
+    resultclass = _ReplayResult
+
+    def __init__(self, jobs, test_config=None, sandbox_pool=None, **kwargs):
+        """
+        Arguments:
+
+          jobs: the number of worker processes.
+          test_config: the value to give the test_config attribute of tests
+            that have one (see loading.config_load_tests()) in each worker.
+          sandbox_pool: a sandbox.SandboxPool from which to give each worker
+            a copy of test_config with its own temp_dir, or None to give
+            every worker test_config itself.
+
+        """
+        super(ParallelTestRunner, self).__init__(**kwargs)
+        self.jobs = jobs
+        self.test_config = test_config
+        self.sandbox_pool = sandbox_pool
+        # The sandbox directories acquired for the running workers.
+        self._sandbox_paths = []
+
+    def _make_worker_config(self):
+        if (self.sandbox_pool is None or
+            not hasattr(self.test_config, 'temp_dir')):
+            return self.test_config
+        config = copy.copy(self.test_config)
+        config.temp_dir = self.sandbox_pool.acquire()
+        self._sandbox_paths.append(config.temp_dir)
+        return config
+
+    def _replay(self, result, group, tests_run, outcomes, durations):
+        # Outcomes of fixtures and subtests are not runs of tests, so we
+        # take the number of tests run from the worker.
+        total_run = result.testsRun + tests_run
+        for index, test_id, description, kind, text in outcomes:
+            test = (_TestHolder(test_id, description) if index is None else
+                    group[index])
+            result.startTest(test)
+            if kind == OUTCOME_SUCCESS:
+                result.addSuccess(test)
+            elif kind == OUTCOME_ERROR:
+                result.addError(test, text)
+            elif kind == OUTCOME_FAILURE:
+                result.addFailure(test, text)
+            elif kind == OUTCOME_SKIP:
+                result.addSkip(test, text)
+            elif kind == OUTCOME_EXPECTED_FAILURE:
+                result.addExpectedFailure(test, text)
+            else:
+                result.addUnexpectedSuccess(test)
+            result.stopTest(test)
+        result.testsRun = total_run
+        result.durations.update(durations)
+
+    def _start_workers(self, groups):
+        """
+        Start the worker processes, and return (workers, tasks, results).
+
+        """
+        context, is_forked = _get_context()
+        tasks = context.Queue()
+        results = context.Queue()
+        for index in range(len(groups)):
+            tasks.put(index)
+        workers = []
+        for i in range(min(self.jobs, len(groups))):
+            tasks.put(None)
+            # A forked worker inherits the groups, so they need not be
+            # pickled.
+            worker = context.Process(
+                target=_work, args=(None if is_forked else groups,
+                                    self._make_worker_config(), tasks,
+                                    results))
+            worker.start()
+            workers.append(worker)
+        return workers, tasks, results
+
+    def _get_result(self, workers, results):
+        while True:
+            try:
+                return results.get(timeout=POLL_INTERVAL)
+            except Queue.Empty:
+                for worker in workers:
+                    if worker.exitcode:
+                        raise Exception("test worker process %d exited with "
+                                        "status %d" % (worker.pid,
+                                                       worker.exitcode))
+
+    def _run_groups(self, result, groups):
+        global _groups
+        _groups = groups
+        try:
+            workers, tasks, results = self._start_workers(groups)
+        finally:
+            _groups = None
+        # Results that finished before earlier groups, by group index.
+        pending = {}
+        next_index = 0
+        try:
+            # We replay the results in group order, so the report does not
+            # depend on the order in which the groups finish.
+            while next_index < len(groups) and not result.shouldStop:
+                task_result = self._get_result(workers, results)
+                pending[task_result[0]] = task_result[1:]
+                while next_index in pending and not result.shouldStop:
+                    self._replay(result, groups[next_index],
+                                 *pending.pop(next_index))
+                    next_index += 1
+        finally:
+            if next_index < len(groups):
+                # Then stop early (e.g. for failfast or an exception).
+                for worker in workers:
+                    worker.terminate()
+            for worker in workers:
+                worker.join()
+            while self._sandbox_paths:
+                self.sandbox_pool.release(self._sandbox_paths.pop())
+
+    def run(self, test):
+        """
+        Run the tests, and return the result.
+
+        """
+        result = self._makeResult()
+        result.failfast = self.failfast
+        start_time = time.time()
+        result.startTestRun()
+        try:
+            self._run_groups(result, group_tests(test))
+        finally:
+            result.stopTestRun()
+        time_taken = time.time() - start_time
+
+        result.printErrors()
+        self.stream.writeln(result.separator2)
+        run = result.testsRun
+        self.stream.writeln("Ran %d test%s in %.3fs (%d processes)" %
+                            (run, run != 1 and "s" or "", time_taken,
+                             self.jobs))
+        self.stream.writeln()
+        self._write_summary(result)
+        return result
+
+    def _write_summary(self, result):
+        infos = []
+        for name, items in (('failures', result.failures),
+                            ('errors', result.errors),
+                            ('skipped', result.skipped),
+                            ('expected failures', result.expectedFailures),
+                            ('unexpected successes',
+                             result.unexpectedSuccesses)):
+            if items:
+                infos.append("%s=%d" % (name, len(items)))
+        self.stream.write("OK" if result.wasSuccessful() else "FAILED")
+        if infos:
+            self.stream.writeln(" (%s)" % ", ".join(infos))
+        else:
+            self.stream.write("\n")
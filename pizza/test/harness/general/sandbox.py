@@ -0,0 +1,170 @@
+# encoding: utf-8
+
+"""
+Supports giving tests sandbox directories for writing temporary files.
+
+Sandbox directories are made in a memory-backed file system (/dev/shm)
+where there is one, so tests that write many files do not wait on disk.
+A SandboxPool hands out directories and takes them back emptied, so a
+run makes one directory per process rather than one per test.  Tests find
+their directory as test_config.temp_dir (see loading.config_load_tests()),
+or as self.dir_path with SandboxTestMixin, and CleaningMixin empties it
+after each test.
+
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+
+log = logging.getLogger(__name__)
+
+# The directory in which to prefer making sandboxes.
+SHM_DIR = '/dev/shm'
+SANDBOX_PREFIX = 'pizza-test-'
+
+
+def get_sandbox_root():
+    """
+    Return the directory in which to make sandbox directories.
+
+    """
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK | os.X_OK):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+def clean_dir(path):
+    """
+    Remove the contents of a directory, leaving the directory empty.
+
+    """
+    for name in os.listdir(path):
+        child_path = os.path.join(path, name)
+        # We check for links first so we never follow them out of path.
+        if os.path.islink(child_path) or not os.path.isdir(child_path):
+            os.unlink(child_path)
+        else:
+            shutil.rmtree(child_path)
+
+
+class SandboxPool(object):
+
+    """
+    Hands out empty sandbox directories and reuses those given back.
+
+    """
+
+    def __init__(self, root=None):
+        """
+        Arguments:
+
+          root: the directory in which to make sandboxes, or None for
+            get_sandbox_root().
+
+        """
+        if root is None:
+            root = get_sandbox_root()
+        self.root = root
+        # The directories made, and those not handed out.
+        self._paths = []
+        self._free = []
+
+    def acquire(self):
+        """
+        Return the path of an empty sandbox directory.
+
+        """
+        if self._free:
+            return self._free.pop()
+        path = tempfile.mkdtemp(prefix=SANDBOX_PREFIX, dir=self.root)
+        self._paths.append(path)
+        return path
+
+    def release(self, path):
+        """
+        Empty a directory returned by acquire(), and make it available again.
+
+        """
+        try:
+            clean_dir(path)
+        except EnvironmentError as err:
+            # Then we stop using the directory (e.g. if a test made part of
+            # it read-only).
+            log.warning("error cleaning sandbox: %r\n-->%s" % (path, err))
+            self._remove(path)
+            return
+        self._free.append(path)
+
+    def _remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+        self._paths.remove(path)
+        if path in self._free:
+            self._free.remove(path)
+
+    def close(self):
+        """
+        Remove all the directories made.
+
+        """
+        for path in list(self._paths):
+            self._remove(path)
+
+
+def clean_test_dir(test):
+    """
+    Empty the sandbox directory of a test's test_config, if any.
+
+    """
+    config = getattr(test, 'test_config', None)
+    path = getattr(config, 'temp_dir', None)
+    if path is None:
+        return
+    try:
+        clean_dir(path)
+    except EnvironmentError as err:
+        log.warning("error cleaning sandbox after test %s: %r\n-->%s" %
+                    (test.id(), path, err))
+
+
+class CleaningMixin(object):
+
+    """
+    A TestResult mixin that empties each test's sandbox after it runs.
+
+    Only tests (and not class or module fixtures) have a test_config, so a
+    sandbox can be emptied after every test.
+
+    """
+
+    def stopTest(self, test):
+        super(CleaningMixin, self).stopTest(test)
+        clean_test_dir(test)
+
+
+class SandboxTestMixin(object):
+
+    """
+    A TestCase mixin that sets self.dir_path to the test's sandbox.
+
+    The test module must set load_tests = loading.config_load_tests so that
+    each test has a test_config.  The harness empties the directory after
+    each test, so tests need not remove what they write.
+
+    """
+
+    def setUp(self):
+        super(SandboxTestMixin, self).setUp()
+        self.dir_path = self.test_config.temp_dir
+
+    def write_file(self, name, data, mode='wb'):
+        """
+        Write data to a file in the sandbox, and return its path.
+
+        """
+        path = os.path.join(self.dir_path, name)
+        with open(path, mode) as f:
+            f.write(data)
+        return path
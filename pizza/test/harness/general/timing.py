@@ -0,0 +1,97 @@
+# encoding: utf-8
+
+"""
+Supports timing tests and scheduling them using past durations.
+
+The durations of a run are kept by test id in a JSON "history" file, and
+later runs use them to run the longest groups of tests first.  In a
+parallel run, this keeps a long group from starting last and leaving the
+other workers idle at the end.
+
+"""
+
+import time
+import unittest
+
+import pizza.test.harness.general.caching as caching
+
+
+class TimingMixin(object):
+
+    """
+    A TestResult mixin that records the wall time of each test.
+
+    The durations attribute is a dict mapping test id to seconds.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TimingMixin, self).__init__(*args, **kwargs)
+        self.durations = {}
+        self._test_start = None
+
+    def startTest(self, test):
+        self._test_start = time.time()
+        super(TimingMixin, self).startTest(test)
+
+    def stopTest(self, test):
+        super(TimingMixin, self).stopTest(test)
+        self.durations[test.id()] = time.time() - self._test_start
+
+
+class TimingTextTestResult(TimingMixin, unittest.TextTestResult):
+    pass
+
+
+def read_history(path):
+    """
+    Return the durations in a history file, or an empty dict if none.
+
+    """
+    return caching.read_dict(path, "test history")
+
+
+def write_history(path, durations):
+    """
+    Add durations to a history file, replacing any older durations.
+
+    """
+    history = read_history(path)
+    history.update(durations)
+    caching.write_dict(path, history)
+
+
+def order_groups(groups, durations):
+    """
+    Return a list of the groups of tests sorted by decreasing duration.
+
+    The duration of a group is the sum of its tests' past durations.  Tests
+    without a past duration count as taking the average past duration.
+    Groups of equal duration keep their order.
+
+    Arguments:
+
+      groups: a list of lists of TestCase instances.
+      durations: a dict mapping test id to seconds.
+
+    """
+    default = (sum(durations.values()) / len(durations) if durations
+               else 0)
+
+    def get_duration(group):
+        return sum(durations.get(test.id(), default) for test in group)
+
+    return sorted(groups, key=get_duration, reverse=True)
+
+
+def format_slowest(durations, count):
+    """
+    Return a report of the count slowest tests, as text.
+
+    """
+    slowest = sorted(durations.items(), key=lambda item: (-item[1],
+                                                          item[0]))[:count]
+    lines = ["Slowest %d tests:" % len(slowest)]
+    lines.extend("%8.3fs  %s" % (seconds, test_id) for test_id, seconds in
+                 slowest)
+    return "".join("%s\n" % line for line in lines)
@@ -0,0 +1,350 @@
+# encoding: utf-8
+
+"""
+Supports rerunning tests in a warm process when source files change.
+
+A watcher waits for changes to the Python source files in the package
+directories under a root directory.  It uses Linux inotify (through ctypes)
+where available and otherwise polls modification times.  After a change,
+reload_changed() reloads the changed modules and the modules that import
+them, so only the affected tests need to run again, and nothing else is
+imported again.
+
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+import pizza.test.harness.general.caching as caching
+import pizza.test.harness.general.loading as loading
+
+try:
+    from importlib import reload as _reload
+except ImportError:
+    # Then the Python version is 2, where reload() is a builtin.
+    _reload = reload
+
+
+log = logging.getLogger(__name__)
+
+SOURCE_EXTENSION = '.py'
+# How long, in seconds, to wait for further changes after a change, since
+# editors often save a file in several steps.
+SETTLE_DELAY = 0.1
+# How often, in seconds, the polling watcher checks for changes.
+POLL_INTERVAL = 1
+# The number of bytes of inotify events to read at once.
+READ_SIZE = 65536
+
+# Constants from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE)
+# The header of an inotify event: wd, mask, cookie and the name's length.
+_EVENT_HEADER = struct.Struct('iIII')
+# The names of the test classes with which unittest and loading report
+# modules that fail to import.
+IMPORT_FAILURE_CLASS_NAMES = ('ModuleImportFailure', '_FailedTest')
+
+
+def _is_source(path):
+    # Editors' lock and backup files start with a period (e.g. ".#name.py").
+    return (path.endswith(SOURCE_EXTENSION) and
+            not os.path.basename(path).startswith('.'))
+
+
+def _get_watched_dirs(root):
+    """
+    Return the root directory and the package directories under it.
+
+    """
+    return sorted(loading._get_package_dirs(root))
+
+
+def _find_sources(dir_path):
+    try:
+        names = os.listdir(dir_path)
+    except OSError:
+        # Then the directory was removed.
+        return []
+    return [path for path in (os.path.join(dir_path, name) for name in
+                              names) if _is_source(path)]
+
+
+class PollingWatcher(object):
+
+    """
+    Waits for changes to source files by polling their mtimes.
+
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._mtimes = self._scan()
+
+    def _scan(self):
+        mtimes = {}
+        for dir_path in _get_watched_dirs(self.root):
+            for path in _find_sources(dir_path):
+                mtimes[path] = loading._get_mtime(path)
+        return mtimes
+
+    def wait(self):
+        """
+        Wait for source files to change, and return their paths as a set.
+
+        """
+        while True:
+            time.sleep(POLL_INTERVAL)
+            old_mtimes = self._mtimes
+            self._mtimes = self._scan()
+            changed = set(path for path in
+                          set(old_mtimes) | set(self._mtimes) if
+                          old_mtimes.get(path) != self._mtimes.get(path))
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+def _load_libc():
+    return ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+
+def _raise_errno(path=None):
+    number = ctypes.get_errno()
+    raise OSError(number, os.strerror(number), path)
+
+
+def _encode_path(path):
+    if isinstance(path, bytes):
+        return path
+    return path.encode(sys.getfilesystemencoding())
+
+
+def _decode_name(name):
+    if isinstance(name, str):
+        return name
+    return name.decode(sys.getfilesystemencoding())
+
+
+class InotifyWatcher(object):
+
+    """
+    Waits for changes to source files using Linux inotify.
+
+    Raises EnvironmentError or AttributeError if inotify is not available.
+
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            _raise_errno()
+        # Maps watch descriptor to directory path.
+        self._dirs = {}
+        try:
+            for dir_path in _get_watched_dirs(self.root):
+                self._add_watch(dir_path)
+        except EnvironmentError:
+            # For example, the limit on the number of watches was reached.
+            self.close()
+            raise
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, _encode_path(dir_path),
+                                          WATCH_MASK)
+        if wd < 0:
+            _raise_errno(dir_path)
+        self._dirs[wd] = dir_path
+
+    def _read_changes(self, timeout):
+        """
+        Return the source paths changed within timeout seconds, as a set.
+
+        Arguments:
+
+          timeout: the number of seconds to wait, or None to wait until
+            there are events.
+
+        """
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        data = os.read(self._fd, READ_SIZE)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            dir_path = self._dirs.get(wd)
+            if dir_path is None:
+                continue
+            path = os.path.join(dir_path, _decode_name(name))
+            if not mask & IN_ISDIR:
+                if _is_source(path):
+                    changed.add(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may have been added before we watch the directory.
+                try:
+                    self._add_watch(path)
+                except EnvironmentError:
+                    continue
+                changed.update(_find_sources(path))
+        return changed
+
+    def wait(self):
+        """
+        Wait for source files to change, and return their paths as a set.
+
+        """
+        changed = set()
+        while not changed:
+            changed = self._read_changes(None)
+        while True:
+            more = self._read_changes(SETTLE_DELAY)
+            if not more:
+                return changed
+            changed.update(more)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(root):
+    """
+    Return an InotifyWatcher for root, or else a PollingWatcher.
+
+    """
+    try:
+        return InotifyWatcher(root)
+    except (AttributeError, EnvironmentError) as err:
+        log.info("polling for changes since inotify is not available: %s" %
+                 err)
+        return PollingWatcher(root)
+
+
+def _get_running_names():
+    """
+    Return the names of the modules whose code is running.
+
+    """
+    names = set()
+    frame = sys._getframe()
+    while frame is not None:
+        names.add(frame.f_globals.get('__name__'))
+        frame = frame.f_back
+    return names
+
+
+def _get_changed_names(paths):
+    """
+    Return the names of the loaded modules with source in paths, as a set.
+
+    """
+    paths = set(os.path.abspath(path) for path in paths)
+    names = set()
+    for name, module in list(sys.modules.items()):
+        path = caching._get_source_path(module)
+        if path is not None and os.path.abspath(path) in paths:
+            names.add(name)
+    return names
+
+
+def reload_changed(paths, test_module_names, package_names):
+    """
+    Reload the changed modules and the modules that import them.
+
+    The modules reloaded are those in the given packages that import a
+    changed module, directly or through other modules, so that none keeps
+    references to the old version of a changed module.  Modules outside
+    the packages are not reloaded, and neither are modules that are running
+    (e.g. the test harness).  A module that fails to reload is removed from
+    sys.modules, so that loading the tests imports it again and reports the
+    error.  Returns the set of names of the test modules affected by the
+    changes.
+
+    Arguments:
+
+      paths: the paths of the changed source files.
+      test_module_names: the names of the loaded test modules.
+      package_names: the names of the top-level packages whose imports to
+        follow (see caching.ModuleHasher).
+
+    """
+    changed = _get_changed_names(paths)
+    # The hasher reads the sources again, so it sees changed imports.
+    hasher = caching.ModuleHasher(package_names)
+    affected = set(name for name in test_module_names if
+                   hasher.get_closure(name) & changed)
+    package_names = set(package_names)
+    importing = set(name for name, module in list(sys.modules.items()) if
+                    module is not None and
+                    name.split('.')[0] in package_names and
+                    hasher.get_closure(name) & changed)
+    running = _get_running_names()
+    for name in sorted(changed & running):
+        log.warning("restart to use the changes to running module: %s" %
+                    name)
+    names = (changed | importing | affected) - running
+
+    # Reload each module after the modules it imports.
+    def get_import_count(name):
+        return len(hasher.get_closure(name) & names)
+
+    for name in sorted(names, key=lambda name: (get_import_count(name),
+                                                name)):
+        module = sys.modules.get(name)
+        if module is None:
+            continue
+        log.info("reloading: %s" % name)
+        try:
+            _reload(module)
+        except Exception as err:
+            log.warning("error reloading %s: %s" % (name, err))
+            sys.modules.pop(name, None)
+    return affected
+
+
+def make_test_filter(module_names):
+    """
+    Return a function returning whether a test is affected by changes.
+
+    Call this after reload_changed() and before loading the tests.  Tests
+    in modules not loaded until then (e.g. new test modules and those that
+    failed to reload) count as affected, as do import failures.
+
+    Arguments:
+
+      module_names: the names of the test modules affected (see
+        reload_changed()).
+
+    """
+    loaded_names = set(sys.modules)
+
+    def is_affected(test):
+        if test.__class__.__name__ in IMPORT_FAILURE_CLASS_NAMES:
+            return True
+        name = test.__class__.__module__
+        return name in module_names or name not in loaded_names
+
+    return is_affected
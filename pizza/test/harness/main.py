@@ -5,14 +5,37 @@ Exposes the function that the run_test command-line option should call.
 
 import logging
 import os
+import sys
 import unittest
 
+import pizza.cache as cache
 import pizza.test
+import pizza.test.harness.general.caching as caching
 import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.parallel as parallel
+import pizza.test.harness.general.sandbox as sandbox
+import pizza.test.harness.general.timing as timing
 
 
 log = logging.getLogger("pizza.test")
 
+# The name of the file in the cache directory that keeps test durations.
+HISTORY_FILE_NAME = 'test-durations.json'
+# The name of the file that keeps the ids of the tests that failed.
+FAILURES_FILE_NAME = 'test-failures.json'
+# The name of the file that keeps the test discovery index.
+INDEX_FILE_NAME = 'test-index.json'
+# The name of the file that keeps the hashes of the tests that passed.
+RESULTS_FILE_NAME = 'test-results.json'
+# The directory in a project directory in which to keep FAILURES_FILE_NAME,
+# INDEX_FILE_NAME and RESULTS_FILE_NAME (the directory setup.py uses for
+# temporary files).
+PROJECT_TEMP_DIR = 'temp'
+# The packages whose modules count towards a test's hash.
+HASHED_PACKAGES = ('pizza', )
+# The default number of slowest tests to report.
+SLOWEST_DEFAULT = 10
+
 class TestConfig(object):
 
     def __init__(self, temp_dir):
@@ -20,24 +43,339 @@ class TestConfig(object):
         Arguments:
 
           temp_dir: the sandbox directory that test cases can use for writing
-            temporary files to the file system.
+            temporary files to the file system.  The directory is emptied
+            after each test, and is not shared with tests running at the
+            same time.
 
         """
         self.temp_dir = temp_dir
 
 
-def run_tests(argv):
+def get_history_path():
+    """
+    Return the path of the file that keeps test durations between runs.
+
+    """
+    return os.path.join(cache.get_cache_dir(), HISTORY_FILE_NAME)
+
+
+def _get_state_path(file_name, project_dir):
+    if project_dir is None:
+        return os.path.join(cache.get_cache_dir(), file_name)
+    return os.path.normpath(os.path.join(project_dir, PROJECT_TEMP_DIR,
+                                         file_name))
+
+
+def get_index_path(project_dir=None):
+    """
+    Return the path of the file that keeps the test discovery index.
+
+    Arguments:
+
+      project_dir: the project directory when running from source, or None
+        to use the cache directory.
+
+    """
+    return _get_state_path(INDEX_FILE_NAME, project_dir)
+
+
+def get_failures_path(project_dir=None):
+    """
+    Return the path of the file that keeps the ids of the failing tests.
+
+    See get_index_path() for the arguments.
+
+    """
+    return _get_state_path(FAILURES_FILE_NAME, project_dir)
+
+
+def get_results_path(project_dir=None):
+    """
+    Return the path of the file that keeps the hashes of passed tests.
+
+    See get_index_path() for the arguments.
+
+    """
+    return _get_state_path(RESULTS_FILE_NAME, project_dir)
+
+
+def run_tests(argv, jobs=1, slowest=SLOWEST_DEFAULT, history_path=None,
+              results_path=None, index_path=None, stream=False,
+              failures_path=None, failed_first=False, exitfirst=False,
+              watch_dir=None):
+    """
+    Discover and run tests, and exit.
+
+    Arguments:
+
+      argv: the unittest command-line arguments.
+      jobs: the number of processes in which to run tests.
+      slowest: the number of slowest tests to report.
+      history_path: the path of the file from which to read and to which
+        to add test durations, or None for get_history_path().
+      results_path: the path of the file that keeps the hashes of passed
+        tests (see get_results_path()), or None to run every test.  Tests
+        that passed last time and whose hash is unchanged are not run.
+      index_path: the path of the file that keeps the test discovery index
+        (see get_index_path()), or None to search for tests every time.
+      stream: whether to run each test module as soon as it is loaded,
+        rather than loading all tests first.  This does not support
+        running tests in more than one process, or running the longest
+        tests first.
+      failures_path: the path of the file to which to write the ids of the
+        tests that fail (see get_failures_path()), or None not to keep them.
+      failed_first: whether to run first the test modules with tests that
+        failed last time, according to failures_path.
+      exitfirst: whether to stop at the first failing test.
+      watch_dir: a directory whose source files to watch after running the
+        tests, or None not to watch.  After each change, the tests affected
+        are run again in this process, until interrupted.
+
+    """
+    if history_path is None:
+        history_path = get_history_path()
     log.info("run_tests argv: %r" % argv)
     log.info("PYTHONHASHSEED: %r" % os.getenv('PYTHONHASHSEED'))
-    # XXX: pass the correct directory.
-    config = TestConfig(temp_dir="TODO")
-    loader = loading.TestLoader()
-    loader.test_config = config
-    TestPizza(argv=argv, testLoader=loader)
+    sandbox_pool = sandbox.SandboxPool()
+    try:
+        config = TestConfig(temp_dir=sandbox_pool.acquire())
+        log.info("test sandbox directory: %s" % config.temp_dir)
+
+        def run(**kwargs):
+            loader = loading.TestLoader()
+            loader.test_config = config
+            loader.index_path = index_path
+            loader.is_streaming = stream
+            return TestPizza(argv=argv, testLoader=loader, jobs=jobs,
+                             slowest=slowest, history_path=history_path,
+                             results_path=results_path, stream=stream,
+                             sandbox_pool=sandbox_pool,
+                             failures_path=failures_path,
+                             failed_first=failed_first, exitfirst=exitfirst,
+                             **kwargs)
+
+        if watch_dir is None:
+            run()
+        else:
+            _watch(run, watch_dir)
+    finally:
+        sandbox_pool.close()
+
+
+def _watch(run, watch_dir):
+    """
+    Run the tests, and run the affected tests again after each change.
+
+    Arguments:
+
+      run: a function that runs tests, accepting TestPizza keyword
+        arguments and returning the TestPizza instance.
+
+    """
+    import pizza.test.harness.general.watching as watching
+
+    watcher = watching.make_watcher(watch_dir)
+    try:
+        program = run(exit=False)
+        while True:
+            log.info("watching for changes (press Ctrl-C to stop): %s" %
+                     watcher.root)
+            paths = watcher.wait()
+            log.info("changed: %s" % ", ".join(sorted(paths)))
+            module_names = watching.reload_changed(
+                paths, program.test_module_names, HASHED_PACKAGES)
+            program = run(exit=False, test_filter=watching.make_test_filter(
+                module_names))
+    except KeyboardInterrupt:
+        log.info("stopping watching")
+    finally:
+        watcher.close()
+
+
+class _TextTestResult(sandbox.CleaningMixin, timing.TimingTextTestResult):
+    pass
 
 
 class TestPizza(unittest.TestProgram):
 
+    def __init__(self, jobs=1, slowest=0, history_path=None,
+                 results_path=None, stream=False, sandbox_pool=None,
+                 failures_path=None, failed_first=False, exitfirst=False,
+                 test_filter=None, **kwargs):
+        # We set these first because the base class runs the tests.
+        self.jobs = jobs
+        self.slowest = slowest
+        self.history_path = history_path
+        self.results_path = results_path
+        self.stream = stream
+        self.sandbox_pool = sandbox_pool
+        self.failures_path = failures_path
+        self.failed_first = failed_first
+        self.exitfirst = exitfirst
+        # A function returning whether to run a test, or None to run all.
+        self.test_filter = test_filter
+        # The names of the modules of the tests loaded.
+        self.test_module_names = set()
+        self._skipped_count = 0
+        if results_path is not None:
+            self._passed = caching.read_dict(results_path, "test results")
+            self._hasher = caching.ModuleHasher(HASHED_PACKAGES)
+            # This lets the loader skip importing unchanged modules.
+            kwargs['testLoader'].is_skipped = self._is_module_passed
+        super(TestPizza, self).__init__(**kwargs)
+
+    def _is_module_passed(self, name, test_ids):
+        """
+        Return whether all of a module's tests passed and are unchanged.
+
+        The tests of a module that sets never_cached have no hash (see
+        caching.ModuleHasher.hash_test()), so they are never recorded as
+        passed, and this returns false for them.
+
+        """
+        module_hash = self._hasher.hash_module(name)
+        return module_hash is not None and all(
+            self._passed.get(test_id) == module_hash for test_id in test_ids)
+
+    def _make_runner(self):
+        kwargs = {'verbosity': self.verbosity, 'failfast': self.failfast,
+                  'buffer': self.buffer}
+        if self.jobs > 1:
+            return parallel.ParallelTestRunner(
+                self.jobs, test_config=self.testLoader.test_config,
+                sandbox_pool=self.sandbox_pool, **kwargs)
+        return unittest.TextTestRunner(resultclass=_TextTestResult, **kwargs)
+
+    def runTests(self):
+        if self.stream:
+            # Then the tests are loaded as they run, so we cannot order
+            # them by duration.
+            tests = loading._test_gen(self.test)
+        else:
+            durations = ({} if self.history_path is None else
+                         timing.read_history(self.history_path))
+            # Run the longest groups first.  The tests in a group keep their
+            # order, so fixtures still run once per group.
+            groups = timing.order_groups(parallel.group_tests(self.test),
+                                         durations)
+            if self.failed_first:
+                groups = self._put_failed_first(groups)
+            tests = [test for group in groups for test in group]
+        tests = self._filter_tests(tests)
+        # A dict mapping test id to hash (or None if unknown).
+        hashes = {}
+        if self.results_path is not None:
+            tests = self._skip_passed(tests, hashes)
+        if self.stream:
+            self.test = loading.StreamingSuite(tests)
+        else:
+            self.test = unittest.TestSuite(tests)
+            if self.results_path is not None:
+                self._log_skipped()
+        if self.exitfirst:
+            self.failfast = True
+        if self.testRunner is None:
+            self.testRunner = self._make_runner()
+
+        # We exit ourselves after reporting the durations.
+        should_exit, self.exit = self.exit, False
+        super(TestPizza, self).runTests()
+        self._report_durations(self.result.durations)
+        if self.failures_path is not None:
+            self._save_failures()
+        if self.results_path is not None:
+            if self.stream:
+                self._log_skipped()
+            self._save_passed(hashes)
+        if should_exit:
+            sys.exit(not self.result.wasSuccessful())
+
+    def _filter_tests(self, tests):
+        """
+        Yield the tests to run, and note the names of their modules.
+
+        """
+        test_filter = self.test_filter
+        for test in tests:
+            self.test_module_names.add(test.__class__.__module__)
+            if test_filter is None or test_filter(test):
+                yield test
+
+    def _read_failures(self):
+        data = caching.read_dict(self.failures_path, "test failures")
+        return set(data.get('failed_ids', []))
+
+    def _put_failed_first(self, groups):
+        groups, failed_count = caching.put_failed_first(
+            groups, self._read_failures())
+        log.info("running %d test modules with failures first (%s)" %
+                 (failed_count, self.failures_path))
+        return groups
+
+    def _save_failures(self):
+        failed_ids = caching.update_failed_ids(self._read_failures(),
+                                               self.result)
+        try:
+            caching.write_dict(self.failures_path,
+                               {'failed_ids': sorted(failed_ids)})
+        except EnvironmentError as err:
+            log.warning("error writing test failures: %r\n-->%s" %
+                        (self.failures_path, err))
+
+    def _skip_passed(self, tests, hashes):
+        """
+        Yield the tests that did not pass last time or whose hash changed.
+
+        Arguments:
+
+          hashes: a dict to which to add the hash of each test.
+
+        """
+        passed = self._passed
+        for test in tests:
+            test_hash = self._hasher.hash_test(test)
+            hashes[test.id()] = test_hash
+            if test_hash is None or passed.get(test.id()) != test_hash:
+                yield test
+            else:
+                self._skipped_count += 1
+
+    def _log_skipped(self):
+        # The loader does not load some of the skipped tests at all.
+        skipped_count = (self._skipped_count +
+                         len(self.testLoader.skipped_ids))
+        log.info("skipping %d unchanged tests that passed last time (%s)" %
+                 (skipped_count, self.results_path))
+
+    def _save_passed(self, hashes):
+        passed = self._passed
+        run_ids = self.result.durations
+        failed_ids = caching.get_failed_ids(self.result)
+        passed_ids = caching.get_passed_ids(run_ids, failed_ids)
+        for test_id in run_ids:
+            test_hash = hashes.get(test_id)
+            if test_id in passed_ids and test_hash is not None:
+                passed[test_id] = test_hash
+            else:
+                passed.pop(test_id, None)
+        try:
+            caching.write_dict(self.results_path, passed)
+        except EnvironmentError as err:
+            log.warning("error writing test results: %r\n-->%s" %
+                        (self.results_path, err))
+
+    def _report_durations(self, durations):
+        if self.slowest > 0 and durations:
+            self.testRunner.stream.write(
+                timing.format_slowest(durations, self.slowest))
+        if self.history_path is None:
+            return
+        try:
+            timing.write_history(self.history_path, durations)
+        except EnvironmentError as err:
+            log.warning("error writing test history: %r\n-->%s" %
+                        (self.history_path, err))
+
     # We need to override this method because of CPython issue #17052:
     # http://bugs.python.org/issue17052
     def _do_discovery(self, argv, Loader=None):
@@ -0,0 +1,97 @@
+"""
+Tests of pizza.aio.
+
+"""
+
+import io
+import unittest
+
+try:
+    import asyncio
+except ImportError:
+    # Then asyncio is not available (e.g. Python 2).
+    asyncio = None
+else:
+    # We import this outside the try block so that an error importing it
+    # fails the tests rather than skipping them.
+    import pizza.aio as aio
+
+
+class _AsyncIterable(object):
+
+    """An asynchronous iterable over the items of a list."""
+
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = asyncio.get_event_loop().create_future()
+        if self.items:
+            future.set_result(self.items.pop(0))
+        else:
+            future.set_exception(StopAsyncIteration())
+        return future
+
+
+@unittest.skipIf(asyncio is None, "asyncio is not available")
+class RunPizzaAsyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def _make_reader(self, data):
+        reader = asyncio.StreamReader(loop=self.loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return reader
+
+    def _run(self, future):
+        return self.loop.run_until_complete(future)
+
+    def test_stream_reader(self):
+        reader = self._make_reader(b'a\nb\nc')
+        self.assertEqual(self._run(aio.run_pizza_async(reader)), 3)
+
+    def test_stream_reader__chunks(self):
+        reader = self._make_reader(b'a\n' * 10)
+        future = aio.count_records_async(reader, chunk_size=3)
+        self.assertEqual(self._run(future), 10)
+
+    def test_async_iterable(self):
+        values = _AsyncIterable(['a', 'b'])
+        self.assertEqual(self._run(aio.run_pizza_async(values)), 2)
+
+    def test_sync_values(self):
+        self.assertEqual(self._run(aio.run_pizza_async(['a', 'b'])), 2)
+        stream = io.BytesIO(b'a\nb\n')
+        self.assertEqual(self._run(aio.run_pizza_async(stream)), 2)
+
+    def test_many(self):
+        sources = [self._make_reader(b'a\nb\n'), _AsyncIterable('abc'), []]
+        future = aio.run_pizza_many_async(sources)
+        self.assertEqual(self._run(future), [2, 3, 0])
+        self.assertEqual(self._run(aio.run_pizza_many_async([])), [])
+
+    def test_many__concurrent(self):
+        """Check that sources are read concurrently."""
+        readers = [asyncio.StreamReader(loop=self.loop) for i in range(2)]
+        future = aio.run_pizza_many_async(readers)
+        # Data arriving on the second reader first is still counted.
+        for data, reader in [(b'a\n', readers[1]), (b'b\nc\n', readers[0])]:
+            self.loop.call_soon(reader.feed_data, data)
+            self.loop.call_soon(reader.feed_eof)
+        self.assertEqual(self._run(future), [2, 1])
+
+    def test_error(self):
+        reader = asyncio.StreamReader(loop=self.loop)
+        reader.set_exception(ValueError("foo"))
+        future = aio.run_pizza_many_async([reader, self._make_reader(b'a')])
+        self.assertRaises(ValueError, self._run, future)
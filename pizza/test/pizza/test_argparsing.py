@@ -0,0 +1,69 @@
+"""
+Tests of pizza.scripts.pizza.argparsing.
+
+"""
+
+import sys
+import unittest
+
+import pizza.cache as cache_mod
+import pizza.general.optionparser as _parsing
+import pizza.scripts.pizza.argparsing as argparsing
+import pizza.scripts.pizza.helptext as helptext
+
+
+class ParseArgsTestCase(unittest.TestCase):
+
+    def _check_fast_parse(self, args):
+        """Check that the fast path agrees with the parser."""
+        ns = argparsing._fast_parse_args(args)
+        self.assertTrue(ns is not None, args)
+        expected = argparsing.get_parser().parse_args(args)
+        self.assertEqual(vars(ns), vars(expected))
+
+    def test_fast_parse(self):
+        self._check_fast_parse([])
+        self._check_fast_parse(['a', 'b'])
+        for option_string in argparsing._SINGLE_OPTION_MODES:
+            self._check_fast_parse([option_string])
+
+    def test_fast_parse__options(self):
+        self.assertTrue(argparsing._fast_parse_args(['a', '-v']) is None)
+        self.assertTrue(argparsing._fast_parse_args(['-h', '-v']) is None)
+
+    def test_parse_args(self):
+        ns = argparsing.parse_args(['pizza', '-j', '2', '-i', 'x'])
+        self.assertEqual(ns.jobs, 2)
+        self.assertEqual(ns.input_paths, ['x'])
+        self.assertRaises(_parsing.UsageError, argparsing.parse_args,
+                          ['pizza', '--foo'])
+
+    def test_parse_args__no_parser(self):
+        """Check that a values-only command line does not build a parser."""
+        saved_parser = argparsing._parser
+        argparsing._parser = None
+        try:
+            ns = argparsing.parse_args(['pizza', 'a'])
+            self.assertTrue(argparsing._parser is None)
+        finally:
+            argparsing._parser = saved_parser
+        self.assertEqual(ns.args, ['a'])
+
+    def test_get_parser(self):
+        self.assertTrue(argparsing.get_parser() is argparsing.get_parser())
+
+
+class HelpTextTestCase(unittest.TestCase):
+
+    def test_current(self):
+        """Check that the helptext module is up to date."""
+        if sys.version_info[:2] != helptext.PYTHON_VERSION:
+            self.skipTest("help text was generated with Python %d.%d" %
+                          helptext.PYTHON_VERSION)
+        self.assertEqual(helptext.HELP_TEXT, argparsing.format_help(),
+                         "the helptext module is out of date: run "
+                         "`python -m pizza.scripts.pizza.argparsing`")
+
+    def test_cache_size_default(self):
+        ns = argparsing.parse_args(['pizza', '-v'])
+        self.assertEqual(ns.cache_size, cache_mod.MAX_ENTRIES_DEFAULT)
@@ -0,0 +1,80 @@
+"""
+Tests of pizza.benchmark.
+
+"""
+
+import unittest
+
+import pizza.benchmark as benchmark
+
+# The tests run the console script in child processes, whose imports the
+# --cached test hash does not follow.
+never_cached = True
+
+
+class BenchBatchTestCase(unittest.TestCase):
+
+    def test(self):
+        result = benchmark.bench_batch(group_count=10, group_size=2, repeat=1)
+        self.assertEqual(result['group_count'], 10)
+        self.assertTrue(result['batch_seconds'] >= 0)
+
+
+class RunSuiteTestCase(unittest.TestCase):
+
+    def test(self):
+        cases = ['api-sequence', 'api-stream', 'cli-argv', 'cli-stdin',
+                 'cli-file']
+        results = benchmark.run_suite(sizes=[10], repeat=1, cases=cases)
+        self.assertEqual(results['format'], benchmark.RESULTS_FORMAT)
+        self.assertEqual([result['case'] for result in results['results']],
+                         cases)
+        for result in results['results']:
+            self.assertEqual(result['size'], 10)
+            self.assertEqual(result['bytes'], 70)
+            self.assertTrue(result['seconds'] > 0)
+
+    def test_more_cases(self):
+        cases = ['api-async-stream', 'cli-file-distinct', 'cli-file-top',
+                 'cli-file-incremental', 'client-file']
+        results = benchmark.run_suite(sizes=[10], repeat=1, cases=cases)
+        names = [result['case'] for result in results['results']]
+        try:
+            import asyncio
+        except ImportError:
+            # Then the asyncio case is skipped.
+            cases = cases[1:]
+        self.assertEqual(names, cases)
+
+    def test_argv_size_max(self):
+        size = benchmark.ARGV_SIZE_MAX + 1
+        results = benchmark.run_suite(sizes=[size], repeat=1,
+                                      cases=['cli-argv'])
+        self.assertEqual(results['results'], [])
+
+
+class CompareTestCase(unittest.TestCase):
+
+    def _make_results(self, seconds, peak_memory_kib):
+        return {'results': [{'case': 'cli-file', 'size': 10,
+                             'seconds': seconds,
+                             'peak_memory_kib': peak_memory_kib}]}
+
+    def _compare(self, old, new):
+        return benchmark.compare(self._make_results(*old),
+                                 self._make_results(*new), threshold=0.2)
+
+    def test_no_regression(self):
+        lines, regressions = self._compare((1.0, 100), (1.1, 90))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(regressions, [])
+
+    def test_regression(self):
+        lines, regressions = self._compare((1.0, 100), (1.5, 130))
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('cli-file size=10 seconds'))
+
+    def test_noisy_times(self):
+        lines, regressions = self._compare((0.001, None), (0.002, None))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(regressions, [])
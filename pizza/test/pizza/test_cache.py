@@ -0,0 +1,144 @@
+"""
+Tests of pizza.cache.
+
+"""
+
+import logging
+import os
+import unittest
+
+import pizza.cache as cache_mod
+import pizza.scripts.pizza.argparsing as argparsing
+import pizza.scripts.pizza.main as main_mod
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+
+load_tests = loading.config_load_tests
+
+
+class ResultCacheTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(ResultCacheTestCase, self).setUp()
+        self.db_path = os.path.join(self.dir_path, 'cache', 'test.sqlite')
+
+    def _make_cache(self, **kwargs):
+        cache = cache_mod.ResultCache(self.db_path, min_file_size=0, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_get_and_put(self):
+        cache = self._make_cache()
+        self.assertTrue(cache.get('a') is None)
+        cache.put('a', 5)
+        self.assertEqual(cache.get('a'), 5)
+        # Check that the value is visible to another connection.
+        self.assertEqual(self._make_cache().get('a'), 5)
+
+    def test_eviction(self):
+        cache = self._make_cache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        # Using "a" makes "b" the least recently used entry.
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.info()['results'], 2)
+        self.assertTrue(cache.get('b') is None)
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_clear(self):
+        cache = self._make_cache()
+        cache.put('a', 1)
+        cache.clear()
+        self.assertEqual(cache.info()['results'], 0)
+
+    def test_make_key(self):
+        path = self.write_file('input', b'a\n')
+        cache = self._make_cache()
+        key = cache.make_key(path)
+        self.assertTrue(key.startswith('count:stat:'))
+        self.assertEqual(cache.make_key(path), key)
+        self.assertNotEqual(cache.make_key(path, kind='other'), key)
+        # Changing the file changes the key.
+        with open(path, 'ab') as f:
+            f.write(b'b\n')
+        self.assertNotEqual(cache.make_key(path), key)
+
+    def test_make_key__content_hash(self):
+        path1 = self.write_file('input1', b'a\n')
+        path2 = self.write_file('input2', b'a\n')
+        cache = self._make_cache(use_content_hash=True)
+        self.assertEqual(cache.make_key(path1), cache.make_key(path2))
+
+    def test_make_key__small_file(self):
+        path = self.write_file('input', b'a\n')
+        cache = cache_mod.ResultCache(self.db_path, min_file_size=10)
+        self.assertTrue(cache.make_key(path) is None)
+
+    def test_database_error(self):
+        """Check that a database error disables the cache."""
+        not_dir = self.write_file('not_dir', b'')
+        db_path = os.path.join(not_dir, 'test.sqlite')
+        cache = cache_mod.ResultCache(db_path)
+        # Prevent the warning from displaying during the test run.
+        cache_mod.log.disabled = True
+        try:
+            self.assertTrue(cache.get('a') is None)
+            cache.put('a', 1)
+        finally:
+            cache_mod.log.disabled = False
+        self.assertTrue(cache._is_disabled)
+
+    def test_count_inputs(self):
+        path = self.write_file('input', b'a\nb\n')
+        cache = self._make_cache()
+        self.assertEqual(main_mod._count_inputs([path, path], cache=cache), 4)
+        self.assertEqual(cache.info()['results'], 1)
+        # Change the cached value to check that it is used.
+        cache.put(cache.make_key(path), 10)
+        self.assertEqual(main_mod._count_inputs([path], cache=cache), 10)
+
+    def test_env_cache_dir(self):
+        self.assertTrue(cache_mod.ENV_CACHE_DIR in
+                        argparsing.HELP_STRINGS[argparsing.OPTION_NO_CACHE])
+
+
+class OffsetStoreTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(OffsetStoreTestCase, self).setUp()
+        self.db_path = os.path.join(self.dir_path, 'test.sqlite')
+
+    def _put(self, store, path):
+        store.put(path, device=1, inode=2, offset=3, newline_count=4,
+                  tail_digest='')
+
+    def test_eviction(self):
+        store = cache_mod.OffsetStore(self.db_path, max_entries=2)
+        self.addCleanup(store.close)
+        for path in ('a', 'b', 'c'):
+            self._put(store, path)
+        self.assertEqual(store.info()['offsets'], 2)
+        self.assertTrue(store.get('a') is None)
+        self.assertEqual(store.get('c')['offset'], 3)
+
+    def test_database_error(self):
+        """Check that the warning names the offset store."""
+        not_dir = os.path.join(self.dir_path, 'not_dir')
+        with open(not_dir, 'wb'):
+            pass
+        store = cache_mod.OffsetStore(os.path.join(not_dir, 'test.sqlite'))
+        messages = []
+        handler = logging.Handler()
+        handler.emit = lambda record: messages.append(record.getMessage())
+        cache_mod.log.addHandler(handler)
+        # Prevent the warning from displaying during the test run.
+        propagate = cache_mod.log.propagate
+        cache_mod.log.propagate = False
+        try:
+            self.assertTrue(store.get('a') is None)
+        finally:
+            cache_mod.log.propagate = propagate
+            cache_mod.log.removeHandler(handler)
+        self.assertTrue(messages[0].startswith("disabling offset store"),
+                        messages)
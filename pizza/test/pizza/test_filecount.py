@@ -0,0 +1,72 @@
+"""
+Tests of pizza.filecount.
+
+"""
+
+import io
+import os
+import unittest
+
+import pizza.filecount as filecount
+import pizza.pizza as _pizza
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+
+load_tests = loading.config_load_tests
+
+
+SAMPLES = [
+    b'',
+    b'\n',
+    b'a',
+    b'a\n',
+    b'a\nb',
+    b'a\nb\n',
+    b'\n\n\nlast',
+]
+
+
+class CountFileTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def _write(self, data):
+        return self.write_file('input.txt', data)
+
+    def test_matches_count_records(self):
+        for data in SAMPLES:
+            path = self._write(data)
+            expected = _pizza.count_records(io.BytesIO(data))
+            self.assertEqual(filecount.count_file(path), expected, data)
+
+    def test_small_chunks(self):
+        path = self._write(b'ab\ncd\n\nef')
+        for chunk_size in range(1, 10):
+            actual = filecount.count_file(path, chunk_size=chunk_size)
+            self.assertEqual(actual, 4)
+
+    def test_iter_file_records(self):
+        for data in SAMPLES:
+            path = self._write(data)
+            records = list(filecount.iter_file_records(path))
+            self.assertEqual(len(records), filecount.count_file(path), data)
+            self.assertEqual(records, list(_pizza.iter_records(
+                io.BytesIO(data))), data)
+
+    def test_iter_file_records__range(self):
+        path = self._write(b'a\nbb\nccc\n')
+        records = list(filecount.iter_file_records(path, 2, 5))
+        self.assertEqual(records, [b'bb'])
+
+    def test_is_regular_file(self):
+        path = self._write(b'a')
+        self.assertTrue(filecount.is_regular_file(path))
+        self.assertFalse(filecount.is_regular_file(self.dir_path))
+        missing = os.path.join(self.dir_path, 'missing')
+        self.assertFalse(filecount.is_regular_file(missing))
+
+
+class CountNewlinesTestCase(unittest.TestCase):
+
+    def test_range(self):
+        data = b'a\nb\nc\nd\n'
+        self.assertEqual(filecount.count_newlines(data, 2, 6), 2)
+        self.assertEqual(filecount.count_newlines(data, 2, 6, chunk_size=1), 2)
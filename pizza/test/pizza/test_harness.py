@@ -0,0 +1,487 @@
+"""
+Tests of pizza.test.harness.
+
+"""
+
+import logging
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import types
+import unittest
+
+# Imported so that ModuleHasher finds it in sys.modules.
+import pizza.parallel
+import pizza.test.harness.general.caching as caching
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.parallel as parallel
+import pizza.test.harness.general.sandbox as sandbox
+import pizza.test.harness.general.timing as timing
+import pizza.test.harness.general.watching as watching
+
+
+def _make_suite():
+    """
+    Return a suite of sample tests (defined here so discovery skips them).
+
+    """
+    class SampleTestCase(unittest.TestCase):
+
+        def test_success(self):
+            pass
+
+        def test_failure(self):
+            self.assertEqual(1, 2)
+
+        def test_error(self):
+            raise ValueError("oops")
+
+        def test_uses_config(self):
+            self.assertEqual(self.test_config, "config")
+
+    loader = unittest.TestLoader()
+    suite = loader.loadTestsFromTestCase(SampleTestCase)
+    for test in suite:
+        if test.id().endswith('test_uses_config'):
+            test.test_config = None
+    return suite
+
+
+class GroupTestsTestCase(unittest.TestCase):
+
+    def test_by_module(self):
+        suite = unittest.TestSuite([_make_suite(), unittest.TestSuite([
+            unittest.FunctionTestCase(lambda: None)])])
+        groups = parallel.group_tests(suite)
+        self.assertEqual([len(group) for group in groups], [4, 1])
+
+
+class LoadingTestCase(unittest.TestCase):
+
+    def test_test_gen(self):
+        suite = _make_suite()
+        # Nest more deeply than the recursion limit allows recursing.
+        for i in range(sys.getrecursionlimit() + 100):
+            suite = unittest.TestSuite([suite])
+        suite = unittest.TestSuite([suite, _make_suite()])
+        test_ids = [test.id() for test in loading._test_gen(suite)]
+        self.assertEqual(len(test_ids), 8)
+        self.assertEqual(test_ids[:4], test_ids[4:])
+
+    def test_streaming_suite(self):
+        loaded = []
+        def iter_suites():
+            for test in _make_suite():
+                loaded.append(test.id())
+                yield test
+        suite = loading.StreamingSuite(iter_suites())
+        self.assertEqual(loaded, [])
+        stream = StringIO.StringIO()
+        runner = unittest.TextTestRunner(stream=stream)
+        result = runner.run(suite)
+        self.assertEqual(result.testsRun, 4)
+        self.assertEqual(len(loaded), 4)
+
+
+class ParallelTestRunnerTestCase(unittest.TestCase):
+
+    def test_run(self):
+        stream = StringIO.StringIO()
+        runner = parallel.ParallelTestRunner(2, test_config="config",
+                                             stream=stream)
+        result = runner.run(_make_suite())
+        self.assertEqual(result.testsRun, 4)
+        self.assertEqual([test.id().split('.')[-1] for test, text in
+                          result.failures], ['test_failure'])
+        self.assertEqual(len(result.errors), 1)
+        test, text = result.errors[0]
+        self.assertTrue("ValueError: oops" in text, text)
+        self.assertTrue("FAILED (failures=1, errors=1)" in stream.getvalue())
+        self.assertEqual(len(result.durations), 4)
+
+
+class SandboxTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = sandbox.SandboxPool(root=tempfile.gettempdir())
+
+    def tearDown(self):
+        self.pool.close()
+
+    def _write(self, path, text="text"):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def test_clean_dir(self):
+        path = self.pool.acquire()
+        other_path = self.pool.acquire()
+        self._write(os.path.join(other_path, 'kept.txt'))
+        os.makedirs(os.path.join(path, 'a', 'b'))
+        self._write(os.path.join(path, 'a', 'b', 'file.txt'))
+        self._write(os.path.join(path, 'file.txt'))
+        os.symlink(other_path, os.path.join(path, 'link'))
+        sandbox.clean_dir(path)
+        self.assertEqual(os.listdir(path), [])
+        # Check that the link was not followed.
+        self.assertEqual(os.listdir(other_path), ['kept.txt'])
+
+    def test_pool(self):
+        path = self.pool.acquire()
+        self.assertTrue(os.path.isdir(path))
+        self.assertNotEqual(self.pool.acquire(), path)
+        self._write(os.path.join(path, 'file.txt'))
+        self.pool.release(path)
+        # Check that released directories are emptied and reused.
+        self.assertEqual(self.pool.acquire(), path)
+        self.assertEqual(os.listdir(path), [])
+        self.pool.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_cleaning_result(self):
+        test_case = self
+
+        class Config(object):
+            temp_dir = self.pool.acquire()
+
+        class WritingTestCase(unittest.TestCase):
+            test_config = Config()
+
+            def test_write(self):
+                test_case._write(os.path.join(self.test_config.temp_dir,
+                                              'file.txt'))
+
+        class Result(sandbox.CleaningMixin, unittest.TestResult):
+            pass
+
+        result = Result()
+        WritingTestCase('test_write').run(result)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(os.listdir(Config.temp_dir), [])
+
+
+class _Test(object):
+
+    def __init__(self, test_id):
+        self.test_id = test_id
+
+    def id(self):
+        return self.test_id
+
+
+class CachingTestCase(unittest.TestCase):
+
+    def test_find_imported_names(self):
+        source = """\
+import os
+import pizza.general.common as common
+from pizza.general import metrics
+
+def f():
+    import pizza.cache
+"""
+        self.assertEqual(caching._find_imported_names(source),
+                         set(['os', 'pizza.general.common', 'pizza.general',
+                              'pizza.general.metrics', 'pizza.cache']))
+
+    def test_hash_module(self):
+        hasher = caching.ModuleHasher(['pizza'])
+        self.assertTrue('pizza.filecount' in
+                        hasher.get_closure('pizza.parallel'))
+        self.assertFalse('multiprocessing' in
+                         hasher.get_closure('pizza.parallel'))
+        module_hash = hasher.hash_module('pizza.parallel')
+        self.assertNotEqual(module_hash, None)
+        self.assertEqual(caching.ModuleHasher(['pizza']).hash_module(
+            'pizza.parallel'), module_hash)
+        self.assertNotEqual(hasher.hash_module('pizza.filecount'),
+                            module_hash)
+        self.assertEqual(hasher.hash_module('not.a.module'), None)
+
+    def test_hash_test__never_cached(self):
+        tests = list(_make_suite())
+        name = 'pizza_never_cached_sample'
+        module = types.ModuleType(name)
+        module.never_cached = True
+        hasher = caching.ModuleHasher(['pizza'])
+        test = tests[0]
+        original_name = test.__class__.__module__
+        sys.modules[name] = module
+        test.__class__.__module__ = name
+        try:
+            self.assertTrue(hasher.hash_test(test) is None)
+        finally:
+            test.__class__.__module__ = original_name
+            del sys.modules[name]
+        self.assertNotEqual(hasher.hash_test(test), None)
+
+    def test_get_passed_ids(self):
+        passed = caching.get_passed_ids(
+            ['a.A.test_x', 'a.A.test_y', 'a.A.test_z'],
+            set(['a.A.test_x', 'a.A.test_y (i=1)', 'setUpClass (b.B)']))
+        self.assertEqual(passed, set(['a.A.test_z']))
+
+
+    def test_update_failed_ids(self):
+        result = timing.TimingTextTestResult(StringIO.StringIO(), True, 0)
+        tests = dict((test.id().split('.')[-1], test) for test in
+                     _make_suite())
+        # Run all but test_error.
+        unittest.TestSuite([tests['test_success'],
+                            tests['test_failure']])(result)
+        failed_ids = caching.update_failed_ids(
+            set([tests['test_success'].id(), tests['test_error'].id()]),
+            result)
+        self.assertEqual(failed_ids, set([tests['test_failure'].id(),
+                                          tests['test_error'].id()]))
+
+    def test_put_failed_first(self):
+        groups = [[_Test('a'), _Test('b')], [_Test('c')], [_Test('d')]]
+        ordered, count = caching.put_failed_first(groups, set(['d', 'b']))
+        self.assertEqual(count, 2)
+        self.assertEqual([[test.id() for test in group] for group in ordered],
+                         [['a', 'b'], ['d'], ['c']])
+
+
+class TimingTestCase(unittest.TestCase):
+
+    def test_order_groups(self):
+        groups = [[_Test('a'), _Test('b')], [_Test('c')], [_Test('d')]]
+        durations = {'a': 1, 'b': 1, 'c': 3}
+        ordered = timing.order_groups(groups, durations)
+        # The unknown test d counts as taking the average, 5 / 3 seconds.
+        self.assertEqual([[test.id() for test in group] for group in ordered],
+                         [['c'], ['a', 'b'], ['d']])
+
+    def test_format_slowest(self):
+        text = timing.format_slowest({'a': 1.0, 'b': 3.0, 'c': 2.0}, 2)
+        self.assertEqual(text, "Slowest 2 tests:\n"
+                               "   3.000s  b\n"
+                               "   2.000s  c\n")
+
+    def test_history(self):
+        dir_path = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir_path, 'sub', 'history.json')
+            self.assertEqual(timing.read_history(path), {})
+            timing.write_history(path, {'a': 1.0, 'b': 2.0})
+            timing.write_history(path, {'b': 3.0})
+            self.assertEqual(timing.read_history(path), {'a': 1.0, 'b': 3.0})
+        finally:
+            shutil.rmtree(dir_path)
+
+    def test_timing_result(self):
+        result = timing.TimingTextTestResult(StringIO.StringIO(), True, 0)
+        _make_suite()(result)
+        self.assertEqual(len(result.durations), 4)
+
+
+class DiscoveryIndexTestCase(unittest.TestCase):
+
+    package_name = 'pizza_index_sample'
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.package_dir = os.path.join(self.dir_path, self.package_name)
+        os.mkdir(self.package_dir)
+        self._write('__init__.py', "")
+        self._write('test_one.py', """\
+import unittest
+
+class OneTestCase(unittest.TestCase):
+    def test_a(self):
+        pass
+    def test_b(self):
+        pass
+""")
+        self.index_path = os.path.join(self.dir_path, 'index.json')
+
+    def tearDown(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] == self.package_name:
+                del sys.modules[name]
+        if self.dir_path in sys.path:
+            sys.path.remove(self.dir_path)
+        shutil.rmtree(self.dir_path)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.package_dir, name), 'w') as f:
+            f.write(text)
+
+    def _discover(self, is_skipped=None, is_streaming=False):
+        loader = loading.TestLoader()
+        loader.index_path = self.index_path
+        loader.is_skipped = is_skipped
+        loader.is_streaming = is_streaming
+        suite = loader.discover(self.package_dir,
+                                top_level_dir=self.dir_path)
+        return loader, sorted(test.id().split('.', 1)[1] for test in
+                              loading._test_gen(suite))
+
+    def test_index(self):
+        expected = ['test_one.OneTestCase.test_a',
+                    'test_one.OneTestCase.test_b']
+        self.assertEqual(self._discover()[1], expected)
+        self.assertTrue(os.path.exists(self.index_path))
+        # Check that the index is used instead of searching.
+        find_tests = unittest.TestLoader._find_tests
+        def fail(*args, **kwargs):
+            raise AssertionError("searched for tests")
+        unittest.TestLoader._find_tests = fail
+        try:
+            self.assertEqual(self._discover()[1], expected)
+        finally:
+            unittest.TestLoader._find_tests = find_tests
+
+    def test_unwritable_index(self):
+        # A path under a regular file cannot be created.
+        self.index_path = os.path.join(self.package_dir, '__init__.py',
+                                       'index.json')
+        logger = logging.getLogger(loading.__name__)
+        logger.disabled = True
+        try:
+            self.assertEqual(len(self._discover()[1]), 2)
+        finally:
+            logger.disabled = False
+
+    def test_new_module(self):
+        self._discover()
+        self._write('test_two.py', """\
+import unittest
+
+class TwoTestCase(unittest.TestCase):
+    def test_c(self):
+        pass
+""")
+        # Make sure the directory's mtime changes.
+        os.utime(self.package_dir, (0, 0))
+        self.assertEqual(self._discover()[1],
+                         ['test_one.OneTestCase.test_a',
+                          'test_one.OneTestCase.test_b',
+                          'test_two.TwoTestCase.test_c'])
+
+    def test_is_skipped(self):
+        self._discover()
+        module_name = '%s.test_one' % self.package_name
+        del sys.modules[module_name]
+        skipped = []
+        def is_skipped(name, test_ids):
+            skipped.append(name)
+            return True
+        loader, test_ids = self._discover(is_skipped=is_skipped)
+        self.assertEqual(test_ids, [])
+        self.assertEqual(skipped, [module_name])
+        self.assertEqual(len(loader.skipped_ids), 2)
+        self.assertFalse(module_name in sys.modules)
+
+    def test_streaming(self):
+        module_name = '%s.test_one' % self.package_name
+        loader = loading.TestLoader()
+        loader.index_path = self.index_path
+        loader.is_streaming = True
+        suite = loader.discover(self.package_dir,
+                                top_level_dir=self.dir_path)
+        # Check that modules are loaded only as the tests reach them.
+        self.assertFalse(module_name in sys.modules)
+        self.assertFalse(os.path.exists(self.index_path))
+        tests = list(loading._test_gen(suite))
+        self.assertEqual(len(tests), 2)
+        self.assertTrue(module_name in sys.modules)
+        self.assertTrue(os.path.exists(self.index_path))
+        # Check that the index written is usable.
+        loader, test_ids = self._discover(is_streaming=True)
+        self.assertEqual(test_ids, ['test_one.OneTestCase.test_a',
+                                    'test_one.OneTestCase.test_b'])
+
+
+class WatchingTestCase(unittest.TestCase):
+
+    package_name = 'pizza_watch_sample'
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.package_dir = os.path.join(self.dir_path, self.package_name)
+        os.mkdir(self.package_dir)
+        self._write('__init__.py', "")
+        self._write('base.py', "VALUE = 1\n")
+        self._write('test_base.py', "from %s import base\n" %
+                    self.package_name)
+        self._write('test_other.py', "")
+        self._write('helper.py', "from %s.base import VALUE\n" %
+                    self.package_name)
+        self._write('test_helper.py', "from %s import helper\n" %
+                    self.package_name)
+        sys.path.insert(0, self.dir_path)
+        # Keep the "reloading" messages out of the test output.
+        watching.log.disabled = True
+
+    def tearDown(self):
+        watching.log.disabled = False
+        for name in list(sys.modules):
+            if name.split('.')[0] == self.package_name:
+                del sys.modules[name]
+        sys.path.remove(self.dir_path)
+        shutil.rmtree(self.dir_path)
+
+    def _write(self, name, text):
+        path = os.path.join(self.package_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def _check_watcher(self, watcher):
+        try:
+            path = self._write('test_new.py', "")
+            self.assertEqual(watcher.wait(), set([path]))
+        finally:
+            watcher.close()
+
+    def test_polling_watcher(self):
+        poll_interval = watching.POLL_INTERVAL
+        watching.POLL_INTERVAL = 0.01
+        try:
+            self._check_watcher(watching.PollingWatcher(self.dir_path))
+        finally:
+            watching.POLL_INTERVAL = poll_interval
+
+    def test_inotify_watcher(self):
+        try:
+            watcher = watching.InotifyWatcher(self.dir_path)
+        except (AttributeError, EnvironmentError):
+            self.skipTest("inotify is not available")
+        self._check_watcher(watcher)
+
+    def test_reload_changed(self):
+        names = ['%s.%s' % (self.package_name, name) for name in
+                 ('test_base', 'test_other')]
+        for name in names:
+            __import__(name)
+        base = sys.modules['%s.base' % self.package_name]
+        path = self._write('base.py', "VALUE = 2\n")
+        # Make sure Python 2 does not use the old bytecode.
+        os.utime(path, (0, 0))
+        affected = watching.reload_changed([path], names,
+                                           [self.package_name])
+        self.assertEqual(affected, set(names[:1]))
+        self.assertEqual(base.VALUE, 2)
+
+    def test_reload_changed__indirect(self):
+        name = '%s.test_helper' % self.package_name
+        __import__(name)
+        path = self._write('base.py', "VALUE = 2\n")
+        os.utime(path, (0, 0))
+        affected = watching.reload_changed([path], [name],
+                                           [self.package_name])
+        self.assertEqual(affected, set([name]))
+        # Check that the module between the two was reloaded.
+        helper = sys.modules['%s.helper' % self.package_name]
+        self.assertEqual(helper.VALUE, 2)
+
+    def test_make_test_filter(self):
+        class SampleTestCase(unittest.TestCase):
+            def test(self):
+                pass
+        test = SampleTestCase('test')
+        self.assertTrue(watching.make_test_filter([__name__])(test))
+        self.assertFalse(watching.make_test_filter([])(test))
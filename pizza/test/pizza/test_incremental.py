@@ -0,0 +1,90 @@
+"""
+Tests of pizza.incremental.
+
+"""
+
+import os
+import unittest
+
+import pizza.cache as cache_mod
+import pizza.incremental as incremental
+import pizza.scripts.pizza.main as main_mod
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+
+load_tests = loading.config_load_tests
+
+
+class CountFileTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(CountFileTestCase, self).setUp()
+        self.path = os.path.join(self.dir_path, 'input.log')
+        db_path = os.path.join(self.dir_path, 'test.sqlite')
+        self.store = cache_mod.OffsetStore(db_path)
+
+    def tearDown(self):
+        self.store.close()
+
+    def _write(self, data, mode='wb'):
+        self.write_file('input.log', data, mode=mode)
+
+    def _count(self):
+        return incremental.count_file(self.path, self.store)
+
+    def test_first_count(self):
+        self._write(b'a\nb\n')
+        self.assertEqual(self._count(), (2, 4))
+        state = self.store.get(os.path.abspath(self.path))
+        self.assertEqual(state['offset'], 4)
+        self.assertEqual(state['newline_count'], 2)
+
+    def test_empty_file(self):
+        self._write(b'')
+        self.assertEqual(self._count(), (0, 0))
+
+    def test_append(self):
+        self._write(b'a\nb\n')
+        self._count()
+        self._write(b'c\n', mode='ab')
+        # Only the appended bytes are read.
+        self.assertEqual(self._count(), (3, 2))
+        self.assertEqual(self._count(), (3, 0))
+
+    def test_append__unterminated(self):
+        """Check completing a final record without a trailing newline."""
+        self._write(b'a\nb')
+        self.assertEqual(self._count(), (2, 3))
+        self._write(b'c\n', mode='ab')
+        self.assertEqual(self._count(), (2, 2))
+        self._write(b'd', mode='ab')
+        self.assertEqual(self._count(), (3, 1))
+
+    def test_truncate(self):
+        self._write(b'a\nb\nc\n')
+        self._count()
+        self._write(b'x\n')
+        self.assertEqual(self._count(), (1, 2))
+
+    def test_rotate(self):
+        self._write(b'a\nb\n')
+        self._count()
+        # Replace the file with a new one at least as large.
+        new_path = self.write_file('new.log', b'x\ny\nz\n')
+        os.rename(new_path, self.path)
+        self.assertEqual(self._count(), (3, 6))
+
+    def test_rewrite(self):
+        """Check rewriting a file in place with different contents."""
+        self._write(b'a\nb\n')
+        self._count()
+        # Keep the inode but change the bytes before the stored offset.
+        self._write(b'xxxxxx\n')
+        self.assertEqual(self._count(), (1, 7))
+
+    def test_count_inputs(self):
+        self._write(b'a\nb\n')
+        counts = [main_mod._count_inputs([self.path], offset_store=self.store)
+                  for index in range(2)]
+        self.assertEqual(counts, [2, 2])
+        self.assertEqual(self.store.info()['offsets'], 1)
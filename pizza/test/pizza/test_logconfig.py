@@ -0,0 +1,117 @@
+"""
+Tests of pizza.general.logconfig.
+
+"""
+
+import logging
+import StringIO
+import sys
+import unittest
+
+import pizza.general.logconfig as logconfig
+import pizza.scripts.pizza.main as main_mod
+
+
+class QueueLoggingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = StringIO.StringIO()
+        remembering = logconfig.RememberingStream(self.stream, last_text="\n")
+        handler = logconfig.NewlineStreamHandler(remembering)
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        self.listener, queue_handler = logconfig.start_queue_logging(handler)
+        self.logger = logging.getLogger('pizza.test.queue')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(queue_handler)
+        self.queue_handler = queue_handler
+        self.remembering = remembering
+
+    def tearDown(self):
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        self.logger.propagate = True
+
+    def test_order(self):
+        for i in range(100):
+            self.logger.info("message %d", i)
+        self.listener.stop()
+        expected = "".join("INFO: message %d\n" % i for i in range(100))
+        self.assertEqual(self.stream.getvalue(), expected)
+
+    def test_newline(self):
+        """Check that a message still starts at the beginning of a line."""
+        self.remembering.write("...")
+        self.logger.warning("foo")
+        self.listener.stop()
+        self.assertEqual(self.stream.getvalue(), "...\nWARNING: foo\n")
+
+    def test_prepare(self):
+        """Check that arguments are rendered when the record is logged."""
+        items = ['a']
+        self.logger.info("items: %r", items)
+        items.append('b')
+        try:
+            raise ValueError("oops")
+        except ValueError:
+            self.logger.error("failed", exc_info=sys.exc_info())
+        self.listener.stop()
+        text = self.stream.getvalue()
+        self.assertTrue(text.startswith("INFO: items: ['a']\n"), text)
+        self.assertTrue("ValueError: oops" in text, text)
+
+    def test_stop__twice(self):
+        self.listener.stop()
+        self.listener.stop()
+
+
+class RingBufferHandlerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = StringIO.StringIO()
+        target = logging.StreamHandler(self.stream)
+        target.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        self.handler = logconfig.RingBufferHandler(2, target)
+        self.logger = logging.getLogger('pizza.test.ring')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+
+    def test_dump(self):
+        for i in range(3):
+            self.logger.debug("message %d", i)
+        self.assertEqual(self.stream.getvalue(), "")
+        self.assertEqual(self.handler.dump(), 2)
+        self.assertEqual(self.stream.getvalue(),
+                         "DEBUG: message 1\nDEBUG: message 2\n")
+
+    def test_dump__empty(self):
+        self.logger.debug("message")
+        self.handler.dump()
+        self.assertEqual(self.handler.dump(), 0)
+        self.assertEqual(self.stream.getvalue(), "DEBUG: message\n")
+
+
+    def test_unbuffered(self):
+        self.logger.debug("long message", extra=logconfig.EXTRA_UNBUFFERED)
+        self.logger.debug("message")
+        self.handler.dump()
+        self.assertEqual(self.stream.getvalue(), "DEBUG: message\n")
+
+
+class TruncateNameTestCase(unittest.TestCase):
+
+    def test_truncate_name(self):
+        self.assertEqual(main_mod._truncate_name('pizza.general.logconfig'),
+                         'pizza.general.logconfig')
+        self.assertEqual(main_mod._truncate_name('pizza.test.harness.main'),
+                         'pizza.test...main')
+
+    def test_memoized(self):
+        name = 'pizza.test.harness.main'
+        main_mod._truncate_name(name)
+        self.assertTrue(name in main_mod._truncated_names)
@@ -0,0 +1,142 @@
+"""
+Tests of pizza.scripts.pizza.main.
+
+"""
+
+import logging
+import os
+import StringIO
+import unittest
+
+import pizza.general.logconfig as logconfig
+import pizza.scripts.pizza.argparsing as argparsing
+import pizza.scripts.pizza.main as main_mod
+
+
+class RespondTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Keep the messages of failing commands out of the test output.
+        # _respond() adds its own handler to capture them.
+        root = logging.getLogger()
+        self.root_handlers = list(root.handlers)
+        root.handlers[:] = []
+
+    def tearDown(self):
+        logging.getLogger().handlers[:] = self.root_handlers
+
+    def _respond(self, args):
+        request = {'argv': ['pizza'] + args, 'cwd': os.getcwd()}
+        return main_mod._respond(request, from_source=False)
+
+    def test_values(self):
+        response = self._respond(['a', 'b'])
+        self.assertEqual(response, {'status': main_mod.EXIT_STATUS_SUCCESS,
+                                    'stdout': '2\n', 'stderr': ''})
+
+    def test_distinct(self):
+        response = self._respond(['--distinct', 'a', 'b', 'a'])
+        self.assertEqual(response['stdout'], '2\n')
+
+    def test_top(self):
+        response = self._respond(['--top', '2', 'a', 'b', 'a', 'c', 'c', 'a'])
+        self.assertEqual(response['stdout'], '3\ta\n2\tc\n')
+
+    def test_local(self):
+        for args in (['--run-tests'], ['--version'], ['--serve'], ['-i', '-']):
+            self.assertEqual(self._respond(args), {'local': True}, args)
+
+    def test_usage_error(self):
+        request = {'argv': [u'pizza', u'--bogus'], 'cwd': os.getcwd()}
+        response = main_mod._respond(request, from_source=False)
+        self.assertEqual(response['status'],
+                         main_mod.EXIT_STATUS_USAGE_ERROR)
+        # Check that the argv is shown as in a local run.
+        self.assertTrue("['pizza', '--bogus']" in response['stderr'],
+                        response['stderr'])
+
+    def test_input_path_error(self):
+        response = self._respond(['-i', 'missing.txt'])
+        self.assertEqual(response['status'], main_mod.EXIT_STATUS_FAIL)
+        stderr = response['stderr']
+        self.assertTrue("'missing.txt'" in stderr, stderr)
+        self.assertFalse(os.getcwd() in stderr, stderr)
+
+    def test_bad_request(self):
+        main_mod.log.disabled = True
+        try:
+            response = main_mod._handle_request({'argv': ['pizza']},
+                                                from_source=False)
+        finally:
+            main_mod.log.disabled = False
+        self.assertEqual(response['status'], main_mod.EXIT_STATUS_FAIL)
+        self.assertTrue("'cwd'" in response['stderr'], response['stderr'])
+
+
+class TestLoggerNamesTestCase(unittest.TestCase):
+
+    def test_harness_logger(self):
+        """Check the hard-coded name of the test harness logger."""
+        import pizza.test.harness.main as harness
+        self.assertTrue(harness.log.name in main_mod.test_logger_names)
+
+
+class ConfigureLoggingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.root_level = root.level
+        self.root_handlers = list(root.handlers)
+        # Keep the messages logged by the tests out of the test output.
+        root.handlers[:] = []
+
+    def tearDown(self):
+        main_mod.stop_log_thread()
+        main_mod._log_buffer = None
+        root = logging.getLogger()
+        root.setLevel(self.root_level)
+        root.handlers[:] = self.root_handlers
+
+    def _configure(self, args):
+        ns = argparsing.preparse_args(['pizza'] + args)
+        stream = StringIO.StringIO()
+        main_mod.configure_logging(ns, stream=stream)
+        return stream
+
+    def test_async_logging(self):
+        self._configure(['--async-logging'])
+        self.assertTrue(main_mod._log_listener is not None)
+
+    def test_log_buffer(self):
+        self._configure([])
+        self.assertTrue(isinstance(main_mod._log_buffer,
+                                   logconfig.RingBufferHandler))
+        self.assertEqual(logging.getLogger().level, logging.DEBUG)
+
+    def _check_dump(self, args, expected_status):
+        stream = self._configure([])
+        status = main_mod._call_main_inner(['pizza'] + args, False, False,
+                                           dump_log=True)
+        self.assertEqual(status, expected_status)
+        self.assertTrue("debug log messages:" in stream.getvalue())
+
+    def test_log_buffer__usage_error(self):
+        self._check_dump(['--bogus'], main_mod.EXIT_STATUS_USAGE_ERROR)
+
+    def test_log_buffer__error(self):
+        """Check that an error reading a file dumps the buffer."""
+        self._check_dump(['-i', 'missing.txt'], main_mod.EXIT_STATUS_FAIL)
+
+    def test_log_buffer__run_tests(self):
+        """Check that --run-tests keeps no buffer and no debug level."""
+        self._configure(['--run-tests'])
+        root = logging.getLogger()
+        self.assertTrue(main_mod._log_buffer is None)
+        self.assertEqual(root.level, main_mod.LOGGING_LEVEL_DEFAULT)
+        self.assertFalse(any(isinstance(handler, logconfig.RingBufferHandler)
+                             for handler in root.handlers))
+
+    def test_async_logging__run_tests(self):
+        """Check a bare --run-tests, whose value is an empty list."""
+        self._configure(['--async-logging', '--run-tests'])
+        self.assertTrue(main_mod._log_listener is None)
@@ -0,0 +1,129 @@
+"""
+Tests of pizza.general.metrics.
+
+"""
+
+import io
+import os
+import socket
+import unittest
+
+import pizza.cache as cache_mod
+import pizza.general.metrics as metrics
+import pizza.pizza as _pizza
+import pizza.scripts.pizza.main as main_mod
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+
+load_tests = loading.config_load_tests
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def _make_registry(self):
+        registry = metrics.Registry()
+        registry.counter('records_total', "Records.").inc(3)
+        histogram = registry.histogram('run_seconds', "Run time.",
+                                       buckets=[0.1, 1])
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        return registry
+
+    def test_format_prometheus(self):
+        expected = """\
+# HELP records_total Records.
+# TYPE records_total counter
+records_total 3
+# HELP run_seconds Run time.
+# TYPE run_seconds histogram
+run_seconds_bucket{le="0.1"} 1
+run_seconds_bucket{le="1.0"} 2
+run_seconds_bucket{le="+Inf"} 2
+run_seconds_sum 0.55
+run_seconds_count 2
+"""
+        self.assertEqual(self._make_registry().format_prometheus(), expected)
+
+    def test_format_statsd(self):
+        self.assertEqual(self._make_registry().format_statsd(),
+                         ['records_total:3|c', 'run_seconds_sum:0.55|g',
+                          'run_seconds_count:2|c'])
+
+    def test_get_existing(self):
+        registry = metrics.Registry()
+        counter = registry.counter('a', "A.")
+        self.assertTrue(registry.counter('a', "A.") is counter)
+        self.assertRaises(ValueError, registry.histogram, 'a', "A.")
+
+    def test_write_textfile(self):
+        dir_path = self.test_config.temp_dir
+        path = os.path.join(dir_path, 'pizza.prom')
+        registry = self._make_registry()
+        registry.write_textfile(path)
+        with open(path) as f:
+            self.assertEqual(f.read(), registry.format_prometheus())
+        self.assertEqual(os.listdir(dir_path), ['pizza.prom'])
+
+    def test_send_statsd(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind(('127.0.0.1', 0))
+            address = '127.0.0.1:%d' % sock.getsockname()[1]
+            self._make_registry().send_statsd(address)
+            data = sock.recv(4096)
+        finally:
+            sock.close()
+        self.assertEqual(data.decode('utf-8').split('\n')[0],
+                         'records_total:3|c')
+
+
+class RunPizzaMetricsTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        _pizza.metrics_registry = None
+
+    def test(self):
+        registry = metrics.Registry()
+        _pizza.metrics_registry = registry
+        self.assertEqual(_pizza.run_pizza(['a', 'b']), 2)
+        self.assertEqual(_pizza.run_pizza(io.BytesIO(b'a\nb\nc\n')), 3)
+        self.assertEqual(registry.counter(_pizza.METRIC_RECORDS, "").value, 5)
+        self.assertEqual(registry.counter(_pizza.METRIC_BYTES, "").value, 6)
+        histogram = registry.histogram(_pizza.METRIC_RUN_PIZZA_SECONDS, "")
+        self.assertEqual(histogram.count, 2)
+
+
+class FileMetricsTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(FileMetricsTestCase, self).setUp()
+        self.path = self.write_file('input.txt', b'a\nb\n')
+        self.registry = metrics.Registry()
+        _pizza.metrics_registry = self.registry
+
+    def tearDown(self):
+        _pizza.metrics_registry = None
+
+    def _count_twice(self, **kwargs):
+        """Return the bytes counted by the second of two counts."""
+        main_mod._count_inputs([self.path], **kwargs)
+        counter = self.registry.counter(_pizza.METRIC_BYTES, "")
+        before = counter.value
+        main_mod._count_inputs([self.path, self.path], **kwargs)
+        return counter.value - before
+
+    def test_uncached(self):
+        # The file is read once even though it is given twice.
+        self.assertEqual(self._count_twice(), 4)
+
+    def test_cached(self):
+        db_path = os.path.join(self.dir_path, 'test.sqlite')
+        cache = cache_mod.ResultCache(db_path, min_file_size=0)
+        self.addCleanup(cache.close)
+        self.assertEqual(self._count_twice(cache=cache), 0)
+
+    def test_incremental(self):
+        store = cache_mod.OffsetStore(os.path.join(self.dir_path,
+                                                   'test.sqlite'))
+        self.addCleanup(store.close)
+        self.assertEqual(self._count_twice(offset_store=store), 0)
@@ -0,0 +1,73 @@
+"""
+Tests of pizza.parallel.
+
+"""
+
+import os
+import unittest
+
+import pizza.filecount as filecount
+import pizza.parallel as parallel
+import pizza.sketches as sketches
+import pizza.test.harness.general.loading as loading
+import pizza.test.harness.general.sandbox as sandbox
+
+load_tests = loading.config_load_tests
+
+
+class FindShardRangesTestCase(unittest.TestCase):
+
+    def _check(self, data, shard_count):
+        ranges = filecount.find_shard_ranges(data, shard_count)
+        # The ranges cover the data in order.
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (start1, end1), (start2, end2) in zip(ranges, ranges[1:]):
+            self.assertEqual(end1, start2)
+        # Every range but the last ends with a newline.
+        for start, end in ranges[:-1]:
+            self.assertTrue(start < end)
+            self.assertEqual(data[end - 1:end], b'\n')
+        self.assertTrue(len(ranges) <= shard_count)
+        return ranges
+
+    def test_aligned(self):
+        data = b'aaa\nbbb\nccc\nddd\n'
+        for shard_count in range(1, 20):
+            self._check(data, shard_count)
+        self.assertEqual(len(self._check(data, 4)), 4)
+
+    def test_no_newlines(self):
+        self.assertEqual(self._check(b'abcdef', 3), [(0, 6)])
+
+    def test_empty(self):
+        self.assertEqual(self._check(b'', 3), [(0, 0)])
+
+
+class CountFilesTestCase(sandbox.SandboxTestMixin, unittest.TestCase):
+
+    def test_matches_serial(self):
+        paths = [self.write_file('empty', b''),
+                 self.write_file('one', b'a'),
+                 self.write_file('many', b'line\n' * 100 + b'last')]
+        expected = [filecount.count_file(path) for path in paths]
+        for shard_size in (1, 7, 1000):
+            counts = parallel.count_files(paths, jobs=3, shard_size=shard_size)
+            self.assertEqual(counts, expected)
+
+    def test_sharding(self):
+        path = self.write_file('many', b'line\n' * 100)
+        tasks = parallel.make_tasks([path], jobs=4, shard_size=100)
+        self.assertEqual(len(tasks), 4)
+
+
+class SketchFilesTestCase(CountFilesTestCase):
+
+    def test_distinct(self):
+        paths = [self.write_file('one', b'a\nb\n'),
+                 self.write_file('two', b''.join(b'%d\n' % (i % 50)
+                                             for i in range(200)))]
+        sketch = parallel.sketch_files(paths, jobs=3,
+                                       sketch_class=sketches.DistinctCounter,
+                                       shard_size=100, exact_limit=None)
+        self.assertEqual(sketch.count(), 52)
@@ -3,7 +3,11 @@ Tests of pizza.pizza.
 
 """
 
+import io
+import os
 import unittest
+
+import pizza.pizza as _pizza
 import pizza.test.harness.general.loading as loading
 
 # XXX: use this only where it makes sense.
@@ -12,5 +16,92 @@ load_tests = loading.config_load_tests
 class MainTestCase(unittest.TestCase):
 
     def test(self):
-        self.assertEqual(self.test_config.temp_dir, "TODO")
-        self.assertEqual(1, 1)
+        temp_dir = self.test_config.temp_dir
+        self.assertEqual(os.listdir(temp_dir), [])
+        # The harness empties the directory after the test.
+        with open(os.path.join(temp_dir, 'test.txt'), 'w') as f:
+            f.write('test')
+
+
+class CountRecordsTestCase(unittest.TestCase):
+
+    def _count(self, data, chunk_size=None):
+        return _pizza.count_records(io.BytesIO(data), chunk_size=chunk_size)
+
+    def test_empty(self):
+        self.assertEqual(self._count(b''), 0)
+
+    def test_trailing_newline(self):
+        self.assertEqual(self._count(b'a\nb\n'), 2)
+
+    def test_no_trailing_newline(self):
+        self.assertEqual(self._count(b'a\nb'), 2)
+
+    def test_blank_lines(self):
+        self.assertEqual(self._count(b'\n\n'), 2)
+
+    def test_small_chunks(self):
+        """Check that records spanning chunk boundaries count once."""
+        data = b'abc\ndefgh\nij'
+        for chunk_size in range(1, len(data) + 1):
+            self.assertEqual(self._count(data, chunk_size=chunk_size), 3)
+
+    def test_text_stream(self):
+        stream = io.StringIO(u'a\nb')
+        self.assertEqual(_pizza.count_records(stream), 2)
+
+    def test_record_counter(self):
+        counter = _pizza.RecordCounter()
+        for chunk in [b'a\nb', b'', b'c\n', b'd']:
+            counter.feed(chunk)
+        self.assertEqual(counter.total(), 3)
+
+
+class RunPizzaTestCase(unittest.TestCase):
+
+    def test_sequence(self):
+        self.assertEqual(_pizza.run_pizza(['a', 'b', 'c']), 3)
+
+    def test_iterator(self):
+        values = (str(i) for i in range(5))
+        self.assertEqual(_pizza.run_pizza(values), 5)
+
+    def test_empty_iterator(self):
+        self.assertEqual(_pizza.run_pizza(iter([])), 0)
+
+    def test_stream(self):
+        self.assertEqual(_pizza.run_pizza(io.BytesIO(b'a\nb\nc')), 3)
+
+
+class RunPizzaBatchTestCase(unittest.TestCase):
+
+    def _batch(self, groups, **kwargs):
+        counts = _pizza.run_pizza_batch(groups, use_numpy=False, **kwargs)
+        self.assertEqual(counts.typecode, _pizza.COUNT_TYPECODE)
+        return list(counts)
+
+    def test_sequences(self):
+        groups = [['a', 'b'], [], ('c',)]
+        self.assertEqual(self._batch(groups), [2, 0, 1])
+
+    def test_mixed(self):
+        """Check groups that do not support len()."""
+        groups = [['a'], iter(['a', 'b']), io.BytesIO(b'a\nb\nc')]
+        self.assertEqual(self._batch(groups), [1, 2, 3])
+
+    def test_iterator(self):
+        groups = (['a'] * n for n in range(4))
+        self.assertEqual(self._batch(groups), [0, 1, 2, 3])
+
+    def test_delimited(self):
+        groups = [b'', b'a', b'a\n', b'a\nb', bytearray(b'a\nb\n')]
+        self.assertEqual(self._batch(groups, delimited=True), [0, 1, 1, 2, 2])
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        counts = _pizza.run_pizza_batch([['a'], []], use_numpy=True)
+        self.assertEqual(counts.dtype, numpy.int64)
+        self.assertEqual(counts.tolist(), [1, 0])
@@ -0,0 +1,84 @@
+"""
+Tests of pizza.general.profiling.
+
+"""
+
+import logging
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import pizza.general.common as common
+import pizza.general.profiling as profiling
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class ProfilingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.log = logging.getLogger('pizza.test.profiling')
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.handler = _ListHandler()
+        self.log.addHandler(self.handler)
+
+    def tearDown(self):
+        self.log.removeHandler(self.handler)
+        shutil.rmtree(self.dir_path)
+
+    def _work(self):
+        return sum(range(1000))
+
+    def test_profile(self):
+        path = os.path.join(self.dir_path, 'profile.out')
+        result = profiling.call_with_profile(self._work, self.log, path=path)
+        self.assertEqual(result, 499500)
+        stats = pstats.Stats(path)
+        self.assertTrue(stats.total_calls > 0)
+        self.assertTrue('_work' in self.handler.messages[-1])
+
+    def test_profile__no_file(self):
+        profiling.call_with_profile(self._work, self.log, path='')
+        self.assertEqual(os.listdir(self.dir_path), [])
+        self.assertEqual(len(self.handler.messages), 1)
+
+    def test_profile__unwritable(self):
+        path = os.path.join(self.dir_path, 'missing', 'profile.out')
+
+        def fail():
+            raise ValueError("work failed")
+
+        # Check that the original exception is the one raised.
+        self.assertRaises(ValueError, profiling.call_with_profile, fail,
+                          self.log, path=path)
+        self.assertTrue(self.handler.messages[0].startswith(
+            "error writing profile: "))
+        result = profiling.call_with_profile(self._work, self.log, path=path)
+        self.assertEqual(result, 499500)
+
+    def test_trace_malloc(self):
+        path = os.path.join(self.dir_path, 'snapshot')
+        try:
+            import tracemalloc
+        except ImportError:
+            self.assertRaises(common.Error, profiling.call_with_trace_malloc,
+                              self._work, self.log, path=path)
+            return
+        result = profiling.call_with_trace_malloc(self._work, self.log,
+                                                  path=path)
+        self.assertEqual(result, 499500)
+        self.assertTrue(tracemalloc.Snapshot.load(path) is not None)
+        self.assertTrue('peak' in self.handler.messages[-1])
+        self.assertFalse(tracemalloc.is_tracing())
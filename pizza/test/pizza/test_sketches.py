@@ -0,0 +1,139 @@
+"""
+Tests of pizza.sketches.
+
+"""
+
+import pickle
+import unittest
+
+import pizza.sketches as sketches
+
+
+def _values(start, stop):
+    return ['value%d' % index for index in range(start, stop)]
+
+
+class HyperLogLogTestCase(unittest.TestCase):
+
+    def _check_estimate(self, sketch, expected):
+        # Allow about four standard errors.
+        error = 4 * 1.04 / (len(sketch.registers) ** 0.5)
+        actual = sketch.count()
+        self.assertTrue(abs(actual - expected) <= error * expected,
+                        "%d != %d" % (actual, expected))
+
+    def test_count(self):
+        sketch = sketches.HyperLogLog()
+        self.assertEqual(sketch.count(), 0)
+        for count in (10, 1000, 20000):
+            sketch = sketches.HyperLogLog()
+            sketch.update(_values(0, count))
+            # Adding values again does not change the estimate.
+            sketch.update(_values(0, count))
+            self._check_estimate(sketch, count)
+
+    def test_merge(self):
+        sketch1 = sketches.HyperLogLog(precision=10)
+        sketch1.update(_values(0, 3000))
+        sketch2 = sketches.HyperLogLog(precision=10)
+        sketch2.update(_values(2000, 5000))
+        expected = sketches.HyperLogLog(precision=10)
+        expected.update(_values(0, 5000))
+        sketch1.merge(sketch2)
+        self.assertEqual(sketch1.registers, expected.registers)
+
+    def test_merge__precision(self):
+        sketch = sketches.HyperLogLog(precision=10)
+        self.assertRaises(ValueError, sketch.merge, sketches.HyperLogLog(11))
+
+    def test_precision(self):
+        self.assertEqual(len(sketches.HyperLogLog(precision=4).registers), 16)
+        self.assertRaises(ValueError, sketches.HyperLogLog, 3)
+        self.assertRaises(ValueError, sketches.HyperLogLog, 17)
+
+
+class DistinctCounterTestCase(unittest.TestCase):
+
+    def test_exact(self):
+        counter = sketches.DistinctCounter(exact_limit=100)
+        counter.update(['a', b'a', u'\xe9', u'\xe9'.encode('utf-8'), ''])
+        self.assertTrue(counter.is_exact())
+        self.assertEqual(counter.count(), 3)
+
+    def test_switch_to_sketch(self):
+        counter = sketches.DistinctCounter(exact_limit=100)
+        counter.update(_values(0, 150))
+        self.assertFalse(counter.is_exact())
+        self.assertTrue(abs(counter.count() - 150) < 15)
+
+    def test_no_limit(self):
+        counter = sketches.DistinctCounter(exact_limit=None)
+        counter.update(_values(0, 5000))
+        self.assertEqual(counter.count(), 5000)
+
+    def test_merge(self):
+        for limit in (10, 100, 1000):
+            counters = []
+            for start, stop in ((0, 50), (25, 200)):
+                counter = sketches.DistinctCounter(exact_limit=limit)
+                counter.update(_values(start, stop))
+                counters.append(counter)
+            expected = sketches.DistinctCounter(exact_limit=limit)
+            expected.update(_values(0, 200))
+            counters[0].merge(counters[1])
+            self.assertEqual(counters[0].is_exact(), expected.is_exact())
+            self.assertEqual(counters[0].count(), expected.count(), limit)
+
+    def test_pickle(self):
+        counter = sketches.DistinctCounter()
+        counter.update(['a', 'b'])
+        self.assertEqual(pickle.loads(pickle.dumps(counter)).count(), 2)
+
+
+class SpaceSavingTestCase(unittest.TestCase):
+
+    def _make_values(self):
+        # Value i occurs 2 ** (10 - i) times, among many rare values.
+        values = []
+        for index in range(10):
+            values.extend(['hot%d' % index] * 2 ** (10 - index))
+        values.extend(_values(0, 2000))
+        return values
+
+    def test_exact(self):
+        sketch = sketches.SpaceSaving(capacity=10)
+        sketch.update(['a', 'b', b'a', 'c', 'a', 'b'])
+        self.assertEqual(sketch.top(2), [(b'a', 3), (b'b', 2)])
+        self.assertEqual(sketch.error('a'), 0)
+
+    def test_heavy_hitters(self):
+        sketch = sketches.SpaceSaving(capacity=50)
+        sketch.update(self._make_values())
+        self.assertEqual(len(sketch.counts), 50)
+        top = sketch.top(3)
+        self.assertEqual([value for value, count in top],
+                         [b'hot0', b'hot1', b'hot2'])
+        for value, count in top:
+            actual = 2 ** (10 - int(value[3:]))
+            # Counts are never too low and are high by at most error().
+            self.assertTrue(actual <= count <= actual + sketch.error(value))
+
+    def test_merge(self):
+        values = self._make_values()
+        sketches_ = []
+        for part in (values[::2], values[1::2]):
+            sketch = sketches.SpaceSaving(capacity=50)
+            sketch.update(part)
+            sketches_.append(sketch)
+        sketches_[0].merge(sketches_[1])
+        merged = sketches_[0]
+        self.assertEqual(len(merged.counts), 50)
+        top = merged.top(3)
+        self.assertEqual([value for value, count in top],
+                         [b'hot0', b'hot1', b'hot2'])
+        for value, count in top:
+            actual = 2 ** (10 - int(value[3:]))
+            self.assertTrue(actual <= count <= actual + merged.error(value))
+        # The merged sketch can still be updated.
+        merged.update(['new'] * 2000)
+        self.assertEqual(merged.top(1)[0][0], b'new')
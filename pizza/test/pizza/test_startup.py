@@ -0,0 +1,133 @@
+"""
+Tests and benchmarks of the console script's startup cost.
+
+The common path (counting values) is run in a fresh interpreter so that the
+modules imported by the test run itself do not hide extra imports.
+
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+import pizza
+
+# The tests run Python in child processes, whose imports the --cached test
+# hash does not follow.
+never_cached = True
+
+# The root of the pizza package's import path.
+SYS_PATH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(
+    pizza.__file__)))
+
+# Modules that the common path should not import.
+HEAVY_MODULES = (
+    'cProfile',
+    'json',
+    'multiprocessing',
+    'pizza.cache',
+    'pizza.general.unixserver',
+    'pizza.parallel',
+    'pizza.sketches',
+    'pizza.test.harness.main',
+    'pstats',
+    'socket',
+    'SocketServer',
+    'socketserver',
+    'sqlite3',
+    'unittest',
+)
+
+MAIN_MODULE = 'pizza.scripts.pizza.main'
+# The standard library modules that the main module needs in any case.
+# Timing their import gives a baseline for the machine and Python version.
+BASELINE_MODULES = ('argparse', 'logging')
+# The most times as long as the baseline that importing the main module may
+# take.  Typical ratios are 2 to 2.5, so only a real regression (e.g. new
+# eager imports of heavy modules) causes a failure.
+IMPORT_TIME_RATIO = 4
+# The number of fresh processes in which to time each import.  We take the
+# fastest time, which is the least affected by other load.
+IMPORT_TIME_RUNS = 5
+
+# Writes the names of the modules imported by the common path to stderr.
+# We exclude modules imported before the main module because some Python
+# versions import modules like traceback at interpreter startup.
+COMMON_PATH_CODE = """\
+import sys
+before = set(sys.modules)
+import %s as main_mod
+main_mod._main(['pizza', 'a', 'b'])
+sys.stderr.write('\\n'.join(sorted(set(sys.modules) - before)))
+""" % MAIN_MODULE
+
+# Like COMMON_PATH_CODE, but for building the full argument parser, which
+# commands with options other than the common ones need.
+PARSER_CODE = """\
+import sys
+before = set(sys.modules)
+import pizza.scripts.pizza.argparsing as argparsing
+argparsing.get_parser()
+sys.stderr.write('\\n'.join(sorted(set(sys.modules) - before)))
+"""
+
+
+# Writes the seconds taken to import modules (without the interpreter's
+# startup) to stdout.
+IMPORT_TIME_CODE = """\
+import sys
+import time
+start = time.time()
+import %s
+sys.stdout.write(repr(time.time() - start))
+"""
+
+
+def _run_python(args):
+    """
+    Run Python in a fresh process, and return its (stdout, stderr).
+
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SYS_PATH_DIR
+    process = subprocess.Popen([sys.executable] + args, env=env,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise Exception("python exited with status %d:\n%s" %
+                        (process.returncode, stderr))
+    return stdout, stderr
+
+
+def time_import(names):
+    """
+    Return the fewest seconds that importing modules took in fresh processes.
+
+    """
+    code = IMPORT_TIME_CODE % ", ".join(names)
+    return min(float(_run_python(['-c', code])[0]) for i in
+               range(IMPORT_TIME_RUNS))
+
+
+class StartupTestCase(unittest.TestCase):
+
+    def test_common_path_imports(self):
+        stdout, stderr = _run_python(['-c', COMMON_PATH_CODE])
+        self.assertEqual(stdout, "2\n")
+        modules = set(stderr.splitlines())
+        self.assertEqual(sorted(modules.intersection(HEAVY_MODULES)), [])
+
+    def test_parser_imports(self):
+        stdout, stderr = _run_python(['-c', PARSER_CODE])
+        modules = set(stderr.splitlines())
+        self.assertEqual(sorted(modules.intersection(HEAVY_MODULES)), [])
+
+    def test_import_time_budget(self):
+        seconds = time_import([MAIN_MODULE])
+        baseline = time_import(BASELINE_MODULES)
+        self.assertTrue(seconds < IMPORT_TIME_RATIO * baseline,
+                        "import time over budget: %.1f ms > %d * %.1f ms" %
+                        (seconds * 1000, IMPORT_TIME_RATIO, baseline * 1000))
@@ -0,0 +1,111 @@
+"""
+Tests of pizza.general.unixserver and pizza.scripts.pizza.client.
+
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+
+import pizza.general.common as common
+import pizza.general.unixserver as unixserver
+import pizza.scripts.pizza.client as client
+
+
+class JsonServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.dir_path, 'test.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path)
+
+    def _start(self, respond, max_clients=2):
+        server = unixserver.JsonServer(self.socket_path, respond,
+                                       max_clients=max_clients)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.addCleanup(stop)
+        return server
+
+    def test_round_trip(self):
+        def respond(request):
+            return {'argv': request['argv'], 'cwd': request['cwd']}
+        self._start(respond)
+        response = client.send_request(['pizza', 'a'],
+                                       socket_path=self.socket_path)
+        self.assertEqual(response, {'argv': ['pizza', 'a'],
+                                    'cwd': os.getcwd()})
+
+    def test_failed_response(self):
+        def respond(request):
+            raise ValueError("bad request")
+        self._start(respond)
+        unixserver.log.disabled = True
+        try:
+            response = client.send_request(['pizza'],
+                                           socket_path=self.socket_path)
+        finally:
+            unixserver.log.disabled = False
+        # Then the client runs the command itself.
+        self.assertTrue(response is None)
+
+    def test_no_server(self):
+        response = client.send_request(['pizza'],
+                                       socket_path=self.socket_path)
+        self.assertTrue(response is None)
+
+    def test_already_listening(self):
+        self._start(lambda request: {})
+        self.assertRaises(common.Error, unixserver.JsonServer,
+                          self.socket_path, None, 1)
+
+    def test_not_socket(self):
+        with open(self.socket_path, 'w') as f:
+            f.write('data')
+        self.assertRaises(common.Error, unixserver.JsonServer,
+                          self.socket_path, None, 1)
+        # Check that the file was left alone.
+        with open(self.socket_path) as f:
+            self.assertEqual(f.read(), 'data')
+
+    def test_socket_mode(self):
+        server = unixserver.JsonServer(self.socket_path, None, 1)
+        try:
+            mode = stat.S_IMODE(os.stat(self.socket_path).st_mode)
+        finally:
+            server.server_close()
+        self.assertEqual(mode & 0o077, 0)
+
+    def test_stale_socket(self):
+        server = unixserver.JsonServer(self.socket_path, None, 1)
+        # Close the listening socket without removing the socket file.
+        server.socket.close()
+        self.assertTrue(os.path.exists(self.socket_path))
+        server = unixserver.JsonServer(self.socket_path, None, 1)
+        server.server_close()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+class FindSocketPathTestCase(unittest.TestCase):
+
+    def test_find_socket_path(self):
+        cases = [
+            (['pizza', 'a'], None),
+            (['pizza', '--socket', 'x.sock', 'a'], 'x.sock'),
+            (['pizza', '--socket=x.sock'], 'x.sock'),
+            (['pizza', '--socket'], None),
+            (['pizza', '--', '--socket', 'x.sock'], None),
+        ]
+        for argv, expected in cases:
+            self.assertEqual(client.find_socket_path(argv), expected, argv)
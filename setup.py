@@ -354,6 +354,7 @@ def main(sys_argv):
           entry_points = {
             'console_scripts': [
                 'pizza=pizza.scripts.pizza.main:main',
+                'pizza-client=pizza.scripts.pizza.client:main',
             ],
           },
           **extra_args